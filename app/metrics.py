@@ -0,0 +1,269 @@
+# app/metrics.py
+"""In-process metrics, served in the Prometheus text format at http://<host>:METRICS_PORT/metrics.
+
+Model methods and presenter handlers are timed by decorating their classes with instrumented();
+page updates are counted by TaskView.update(). Components with their own counters (store, write
+coalescer, write queues, sync engine) register a collector that is read at scrape time.
+"""
+import collections
+import contextvars
+import functools
+import inspect
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# port of the metrics endpoint; unset or 0 leaves it off (and skips counting controls sent)
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0") or 0)
+# latency samples kept per label set for the quantiles
+METRICS_WINDOW = int(os.getenv("METRICS_WINDOW", "1024"))
+QUANTILES = (0.5, 0.9, 0.99)
+# upper bounds (seconds) of the histogram buckets
+HISTOGRAM_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# presenter handler running in this thread / task, used to attribute page updates and errors
+current_handler = contextvars.ContextVar("current_handler", default="none")
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+class Counter:
+    def __init__(self, name, help):
+        self.name, self.help, self.type = name, help, "counter"
+        self.values = collections.defaultdict(float)
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        with self.lock:
+            self.values[tuple(labels.items())] += amount
+
+    def samples(self):
+        with self.lock:
+            return [(self.name, labels, value) for labels, value in self.values.items()]
+
+class Gauge(Counter):
+    def __init__(self, name, help):
+        super().__init__(name, help)
+        self.type = "gauge"
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+class Summary:
+    """Count, sum and quantiles over the most recent METRICS_WINDOW observations per label set."""
+
+    def __init__(self, name, help):
+        self.name, self.help, self.type = name, help, "summary"
+        self.windows = collections.defaultdict(lambda: collections.deque(maxlen=METRICS_WINDOW))
+        self.counts = collections.defaultdict(int)
+        self.sums = collections.defaultdict(float)
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.items())
+        with self.lock:
+            self.windows[key].append(value)
+            self.counts[key] += 1
+            self.sums[key] += value
+
+    def samples(self):
+        samples = []
+        with self.lock:
+            for key, window in self.windows.items():
+                ordered = sorted(window)
+                for q in QUANTILES:
+                    samples.append((self.name, key + (("quantile", q),), ordered[min(len(ordered) - 1, int(q * len(ordered)))]))
+                samples.append((self.name + "_sum", key, self.sums[key]))
+                samples.append((self.name + "_count", key, self.counts[key]))
+        return samples
+
+class Histogram:
+    """Cumulative bucket counts, sum and count per label set. Unlike a summary's quantiles, buckets
+    can be added up across processes and sessions."""
+
+    def __init__(self, name, help, buckets=HISTOGRAM_BUCKETS):
+        self.name, self.help, self.type = name, help, "histogram"
+        self.buckets = buckets
+        self.bucket_counts = collections.defaultdict(lambda: [0] * len(self.buckets))
+        self.counts = collections.defaultdict(int)
+        self.sums = collections.defaultdict(float)
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.items())
+        with self.lock:
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.bucket_counts[key][i] += 1
+                    break
+            self.counts[key] += 1
+            self.sums[key] += value
+
+    def samples(self):
+        samples = []
+        with self.lock:
+            for key, count in self.counts.items():
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, self.bucket_counts[key]):
+                    cumulative += bucket_count
+                    samples.append((self.name + "_bucket", key + (("le", bound),), cumulative))
+                samples.append((self.name + "_bucket", key + (("le", "+Inf"),), count))
+                samples.append((self.name + "_sum", key, self.sums[key]))
+                samples.append((self.name + "_count", key, count))
+        return samples
+
+model_seconds = Summary("task_model_call_seconds", "Duration of TaskModel method calls.")
+handler_seconds = Summary("presenter_handler_seconds", "Duration of presenter handlers.")
+page_updates = Counter("ui_page_updates_total", "page.update() calls, by the handler that issued them.")
+controls_sent = Counter("ui_controls_sent_total", "Controls passed to page.update() (the whole page tree for a full update).")
+active_sessions = Gauge("active_sessions", "Connected sessions.")
+errors = Counter("errors_total", "Exceptions raised by model methods and presenter handlers, by type.")
+request_queue_seconds = Summary("supabase_request_queue_seconds", "Time supabase requests waited for an in-flight slot (app/model/transport.py).")
+write_ack_seconds = Histogram("write_queue_ack_seconds", "Time from queueing a write to its ack, over every session's write queue (app/presenter/write_queue.py).")
+METRICS = [model_seconds, handler_seconds, page_updates, controls_sent, active_sessions, errors, request_queue_seconds, write_ack_seconds]
+
+_collectors = []
+_collectors_lock = threading.Lock()
+
+# collector() -> {metric name: value} (or {name: [(labels dict, value)]}), read at scrape time.
+# names ending in _total are reported as counters, everything else as gauges
+def register_collector(collector):
+    with _collectors_lock:
+        _collectors.append(collector)
+
+def unregister_collector(collector):
+    with _collectors_lock:
+        if collector in _collectors:
+            _collectors.remove(collector)
+
+def _timed(function, summary, label, kind):
+    name = function.__name__
+
+    def finish(start, ex):
+        summary.observe(time.perf_counter() - start, **{label: name})
+        if ex is not None:
+            errors.inc(source=f"{kind}.{name}", type=type(ex).__name__)
+
+    if inspect.iscoroutinefunction(function):
+        @functools.wraps(function)
+        async def wrapper(*args, **kwargs):
+            token = current_handler.set(name) if kind == "handler" and current_handler.get() == "none" else None
+            start, error = time.perf_counter(), None
+            try:
+                return await function(*args, **kwargs)
+            except Exception as ex:
+                error = ex
+                raise
+            finally:
+                finish(start, error)
+                if token is not None:
+                    current_handler.reset(token)
+    else:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            token = current_handler.set(name) if kind == "handler" and current_handler.get() == "none" else None
+            start, error = time.perf_counter(), None
+            try:
+                return function(*args, **kwargs)
+            except Exception as ex:
+                error = ex
+                raise
+            finally:
+                finish(start, error)
+                if token is not None:
+                    current_handler.reset(token)
+    return wrapper
+
+def instrumented(kind, only=None, skip=()):
+    """Class decorator timing the public methods defined on the class (or just those in `only`).
+    kind is "model" or "handler"; a handler also becomes the current handler for the page updates
+    it issues."""
+    summary, label = (model_seconds, "method") if kind == "model" else (handler_seconds, "handler")
+
+    def decorate(cls):
+        for name, member in list(vars(cls).items()):
+            if name.startswith("_") or name in skip or not inspect.isfunction(member):
+                continue
+            if only is not None and name not in only:
+                continue
+            setattr(cls, name, _timed(member, summary, label, kind))
+        return cls
+    return decorate
+
+# size of an update: the control and its subtree, stopping at isolated controls already on the page
+# (flet diffs only their own attributes); new controls are sent whole
+def count_controls(control):
+    total = 1
+    for child in control._get_children() if hasattr(control, "_get_children") else []:
+        if child is None:
+            continue
+        total += 1 if child.page is not None and child.is_isolated() else count_controls(child)
+    return total
+
+def record_page_update(page, controls):
+    handler = current_handler.get()
+    page_updates.inc(handler=handler)
+    if METRICS_PORT:
+        sent = sum(count_controls(control) for control in (controls or getattr(page, "controls", [])))
+        controls_sent.inc(sent, handler=handler)
+
+def record_error(ex):
+    errors.inc(source=f"handler.{current_handler.get()}", type=type(ex).__name__)
+
+def render():
+    lines = []
+    for metric in METRICS:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        for name, labels, value in metric.samples():
+            lines.append(f"{name}{_labels(labels)} {value}")
+    with _collectors_lock:
+        collectors = list(_collectors)
+    totals = collections.defaultdict(float)
+    for collector in collectors:
+        try:
+            for name, value in collector().items():
+                for labels, sample in (value if isinstance(value, list) else [({}, value)]):
+                    if sample is not None:
+                        totals[(name, tuple(labels.items()))] += sample
+        except Exception as ex:
+            print("Error collecting metrics:", ex)
+    for name in sorted({name for name, labels in totals}):
+        lines.append(f"# TYPE {name} {'counter' if name.endswith('_total') else 'gauge'}")
+        for (sample_name, labels), value in totals.items():
+            if sample_name == name:
+                lines.append(f"{name}{_labels(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass # scrapes would flood the console
+
+_server = None
+
+# serve /metrics on a daemon thread; no-op without METRICS_PORT or when already running
+def start_server(port=METRICS_PORT):
+    global _server
+    if not port or _server is not None:
+        return _server
+    _server = ThreadingHTTPServer(("0.0.0.0", port), _Handler)
+    threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+    print(f"Metrics at http://0.0.0.0:{port}/metrics")
+    return _server
@@ -0,0 +1,132 @@
+# app/model/async_model.py
+from app.model.model import TaskModel, TaskLimitError, PRIORITY_MAPPING, TASK_PAGE_SIZE, TASK_COLUMNS, SEARCH_LIMIT, MODEL_UNGUARDED, MODEL_READS, write_coalescer, chunked
+from app.model.backends import DuplicateTaskError
+from app.model.search import tokenize
+from app.model.breaker import guarded
+from app import metrics
+
+@metrics.instrumented("model")
+@guarded(skip=MODEL_UNGUARDED, reads=MODEL_READS)
+class AsyncTaskModel(TaskModel):
+    """TaskModel whose database calls are coroutines, so slow requests don't hold a worker thread.
+    Supabase is queried over its async client; other backends run on a worker thread per call
+    (TaskBackend.asynchronous)."""
+
+    def __init__(self, page_size=TASK_PAGE_SIZE, backend=None, user_id=None):
+        super().__init__(page_size, backend, user_id)
+        self.async_backend = self.backend.asynchronous()
+
+    async def load_tasks(self):
+        try:
+            tasks, self.has_more = await self.store.get_tasks_async(self.fetch_page, self.page_size, self.page_size, self._changes())
+            return self._set_tasks(tasks)
+        except Exception as ex:
+            raise Exception(f"Error loading tasks: {ex}")
+
+    async def load_more_tasks(self):
+        loaded = len(self.tasks)
+        try:
+            tasks, self.has_more = await self.store.get_tasks_async(self.fetch_page, loaded + self.page_size, self.page_size, self._changes())
+            return self._set_tasks(tasks)[loaded:]
+        except Exception as ex:
+            raise Exception(f"Error loading tasks: {ex}")
+
+    async def fetch_page(self, after=None, limit=TASK_PAGE_SIZE, columns=TASK_COLUMNS):
+        return await self.async_backend.fetch_page(after, limit, columns)
+
+    async def fetch_changes(self, since, limit=TASK_PAGE_SIZE, columns=TASK_COLUMNS):
+        return await self.async_backend.fetch_changes(since, limit, columns)
+
+    async def fetch_watermark(self):
+        return await self.async_backend.fetch_watermark()
+
+    async def search(self, query="", completed=None, priority=None, limit=SEARCH_LIMIT):
+        tokens, priority = tokenize(query), PRIORITY_MAPPING[priority] if priority is not None else None
+        if not self.has_more:
+            return self._search_loaded(tokens, completed, priority, limit)
+        try:
+            return await self.async_backend.search(tokens, completed, priority, limit, TASK_COLUMNS)
+        except Exception as ex:
+            raise Exception(f"Error searching tasks: {ex}")
+
+    async def add_task(self, text, priority):
+        text = self._clean_text(text)
+        await self._check_limit(1)
+        try:
+            task_priority = PRIORITY_MAPPING[priority]
+            saved = await self.async_backend.insert([{"text": text, "completed": False, "priority": task_priority}])
+        except Exception as ex:
+            self._raise_add_error(ex)
+        return self._task_added(saved[0])
+
+    async def update_task(self, task_id, text, priority, completed):
+        text = self._clean_text(text, task_id)
+        try:
+            new_priority = PRIORITY_MAPPING[priority]
+            saved = await self.async_backend.update([task_id], {"text": text, "priority": new_priority, "completed": completed})
+        except DuplicateTaskError:
+            raise
+        except Exception as ex:
+            raise Exception(f"Error updating task: {ex}")
+        return self._task_updated(task_id, saved)
+
+    async def delete_task(self, task_id):
+        write_coalescer.cancel(task_id)
+        try:
+            await self.async_backend.delete([task_id])
+        except Exception as ex:
+            raise Exception(f"Error deleting task: {ex}")
+        self._task_deleted(task_id)
+
+    async def add_tasks(self, items):
+        rows = self._new_task_rows(items)
+        await self._check_limit(len(rows))
+        try:
+            saved = await self.async_backend.insert(rows)
+        except Exception as ex:
+            self._raise_add_error(ex)
+        return [self._task_added(task) for task in saved]
+
+    async def update_tasks(self, task_ids, completed=None, priority=None):
+        fields = self._bulk_fields(completed, priority)
+        saved = []
+        try:
+            for chunk in chunked(task_ids):
+                saved.extend(await self.async_backend.update(chunk, fields))
+        except Exception as ex:
+            raise Exception(f"Error updating tasks: {ex}")
+        return self._tasks_updated(task_ids, saved)
+
+    async def delete_tasks(self, task_ids):
+        for task_id in task_ids:
+            write_coalescer.cancel(task_id)
+        try:
+            for chunk in chunked(task_ids):
+                await self.async_backend.delete(chunk)
+        except Exception as ex:
+            raise Exception(f"Error deleting tasks: {ex}")
+        return self._tasks_deleted(task_ids)
+
+    async def complete_all_tasks(self):
+        try:
+            saved = await self.async_backend.complete_all()
+        except Exception as ex:
+            raise Exception(f"Error updating tasks: {ex}")
+        return self._tasks_updated([task["id"] for task in saved], saved)
+
+    async def delete_completed_tasks(self):
+        try:
+            deleted = await self.async_backend.delete_completed()
+        except Exception as ex:
+            raise Exception(f"Error deleting tasks: {ex}")
+        return self._tasks_deleted([task["id"] for task in deleted])
+
+    async def _check_limit(self, adding):
+        if not self.task_limit:
+            return
+        size = len(self.tasks) if not self.has_more else self.store.known_size()
+        if size is None:
+            size = await self.async_backend.count()
+            self.store.set_size(size)
+        if size + adding > self.task_limit:
+            raise TaskLimitError()
@@ -0,0 +1,33 @@
+# app/model/backends/__init__.py
+import os
+import threading
+from app.model.backends.base import TaskBackend, DuplicateTaskError
+
+__all__ = ["TaskBackend", "DuplicateTaskError", "TASK_BACKEND", "create_backend", "get_backend"]
+
+# where tasks are stored: "supabase" (default), "memory" (in this process, nothing persisted) or
+# "sqlite" (local file at TASK_SQLITE_PATH). the local ones need no network or AWS credentials
+TASK_BACKEND = os.getenv("TASK_BACKEND", "supabase").lower()
+
+def create_backend(name=TASK_BACKEND):
+    if name == "supabase":
+        from app.model.backends.supabase import SupabaseBackend
+        return SupabaseBackend()
+    if name == "memory":
+        from app.model.backends.memory import MemoryBackend
+        return MemoryBackend()
+    if name == "sqlite":
+        from app.model.backends.sqlite import SQLiteBackend
+        return SQLiteBackend()
+    raise ValueError(f"Unknown task backend: {name}")
+
+_backend = None
+_backend_lock = threading.Lock()
+
+# backend shared by every session, created on first use
+def get_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = create_backend()
+    return _backend
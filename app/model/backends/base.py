@@ -0,0 +1,122 @@
+# app/model/backends/base.py
+import asyncio
+from app.model.changes import task_feed
+
+class DuplicateTaskError(ValueError):
+    """Another task already has this text (compared ignoring case)."""
+
+    def __init__(self, message="Task already exists"):
+        super().__init__(message)
+
+class TaskBackend:
+    """Where TaskModel keeps the tasks table.
+
+    Rows are dicts with id, text, priority (0 = high .. 2 = low) and completed. Every backend
+    returns pages in (completed, priority, id) order and raises DuplicateTaskError when an insert
+    or update would give two tasks the same text ignoring case.
+
+    A backend from for_user(user_id) reads and writes only that user's tasks (rows carry user_id);
+    duplicates are then checked within the user's list. Ids stay unique across users.
+    """
+
+    user_id = None # None: the shared task list
+    delta_sync = False # implements fetch_changes / fetch_watermark
+
+    # watermark of the earliest possible change, for a list that has never changed
+    EPOCH = "1970-01-01T00:00:00+00:00"
+
+    # a backend scoped to one user's tasks
+    def for_user(self, user_id):
+        raise NotImplementedError
+
+    # up to `limit` rows sorting after the row `after` (None for the first page)
+    def fetch_page(self, after, limit, columns):
+        raise NotImplementedError
+
+    # (rows whose updated_at is after `since`, each with updated_at, and {"id", "deleted_at"}
+    # tombstones of tasks deleted after it); up to `limit` of each, oldest first
+    def fetch_changes(self, since, limit, columns):
+        raise NotImplementedError
+
+    # latest updated_at / deleted_at in the list, EPOCH if there is none
+    def fetch_watermark(self):
+        raise NotImplementedError
+
+    # number of tasks in the list
+    def count(self):
+        raise NotImplementedError
+
+    # lower(text) of the given texts that a task in the list already has
+    def existing_texts(self, texts):
+        raise NotImplementedError
+
+    # insert rows without ids, returns them as saved (with ids), in the same order
+    def insert(self, rows):
+        raise NotImplementedError
+
+    # set fields on the given tasks, returns the updated rows (missing ids are skipped)
+    def update(self, task_ids, fields):
+        raise NotImplementedError
+
+    # set text, priority and completed of each task from its row (rows with ids, values may differ
+    # per row) in one request, returns the updated rows. a row whose task no longer exists is
+    # skipped, never inserted again
+    def update_rows(self, rows):
+        raise NotImplementedError
+
+    def delete(self, task_ids):
+        raise NotImplementedError
+
+    # mark every incomplete task done, returns the updated rows
+    def complete_all(self):
+        raise NotImplementedError
+
+    # delete every completed task, returns the deleted rows
+    def delete_completed(self):
+        raise NotImplementedError
+
+    # up to `limit` rows whose words start with every query word (app/model/search.py) and that
+    # match completed / priority (None for any), in display order
+    def search(self, query_tokens, completed, priority, limit, columns):
+        raise NotImplementedError
+
+    # start delivering changes made by other sessions/processes to task_feed
+    def start_feed(self):
+        pass
+
+    # the same reads and writes as coroutines, for AsyncTaskModel. backends without an async client
+    # run each call on a worker thread
+    def asynchronous(self):
+        return ThreadedBackend(self)
+
+class ThreadedBackend:
+    """A TaskBackend whose methods are awaited: each call runs on a worker thread (asyncio.to_thread,
+    which carries the caller's request deadline along)."""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def __getattr__(self, name):
+        method = getattr(self.backend, name)
+        async def call(*args):
+            return await asyncio.to_thread(method, *args)
+        return call
+
+class LocalBackend(TaskBackend):
+    """Backend living in this process. With no realtime service to echo writes back, each write is
+    published to task_feed directly so other sessions see it the same way."""
+
+    def __init__(self, publish=True, user_id=None):
+        self.publish = publish
+        self.user_id = user_id
+
+    def _published(self, event_type, rows):
+        if self.publish:
+            for row in rows:
+                if self.user_id is not None:
+                    row = dict(row, user_id=self.user_id) # lets other users' sessions skip it
+                if event_type == "DELETE":
+                    task_feed.publish("DELETE", None, row)
+                else:
+                    task_feed.publish(event_type, row, None)
+        return rows
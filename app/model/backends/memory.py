@@ -0,0 +1,171 @@
+# app/model/backends/memory.py
+import bisect
+import datetime
+import threading
+from app.model.backends.base import LocalBackend, DuplicateTaskError
+from app.model.store import task_sort_key, insert_position
+from app.model.search import matches
+
+class _Tables:
+    """State shared by a MemoryBackend and its per-user views: ids are unique across all users."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.by_id = {}
+        self.next_id = 1
+        self.partitions = {} # user id (None: shared list) -> (rows sorted by task_sort_key, lower(text) -> id)
+        self.changes = {} # user id -> [(time, id, deleted)] in time order, for fetch_changes
+        self.last_change = None
+
+    # change times strictly increase, so a watermark never skips a change made in the same microsecond
+    def stamp(self):
+        now = datetime.datetime.now(datetime.timezone.utc)
+        if self.last_change is not None and now <= self.last_change:
+            now = self.last_change + datetime.timedelta(microseconds=1)
+        self.last_change = now
+        return now
+
+class MemoryBackend(LocalBackend):
+    """Tasks held in sorted lists in this process, one per user. Nothing is persisted; for tests,
+    benchmarks and load tests that should not touch the network."""
+
+    delta_sync = True
+
+    def __init__(self, tasks=(), publish=True, user_id=None, tables=None):
+        super().__init__(publish, user_id)
+        self.tables = tables or _Tables()
+        self.lock = self.tables.lock
+        self.by_id = self.tables.by_id
+        self.rows, self.ids_by_text = self.tables.partitions.setdefault(user_id, ([], {}))
+        self.changes = self.tables.changes.setdefault(user_id, [])
+        with self.lock:
+            for task in tasks:
+                self._check_text(task["text"])
+                self._add(dict(task, id=task.get("id") or self.tables.next_id))
+
+    def for_user(self, user_id):
+        return MemoryBackend(publish=self.publish, user_id=user_id, tables=self.tables)
+
+    def fetch_page(self, after, limit, columns=None):
+        with self.lock:
+            start = 0
+            if after is not None:
+                key = task_sort_key(after)
+                start = insert_position(self.rows, key)
+                if start < len(self.rows) and task_sort_key(self.rows[start]) == key:
+                    start += 1
+            return [dict(row) for row in self.rows[start:start + limit]]
+
+    def fetch_changes(self, since, limit, columns=None):
+        since = datetime.datetime.fromisoformat(since)
+        rows, deleted = [], []
+        with self.lock:
+            for changed_at, task_id, removed in self.changes[bisect.bisect_right(self.changes, (since, float("inf"))):]:
+                if removed and len(deleted) < limit:
+                    deleted.append({"id": task_id, "deleted_at": changed_at.isoformat()})
+                elif not removed and len(rows) < limit and self.by_id.get(task_id, {}).get("updated_at") == changed_at.isoformat():
+                    rows.append(dict(self.by_id[task_id])) # its latest change only, as a query on updated_at returns it
+        return rows, deleted
+
+    def fetch_watermark(self):
+        with self.lock:
+            return self.changes[-1][0].isoformat() if self.changes else self.EPOCH
+
+    def count(self):
+        with self.lock:
+            return len(self.rows)
+
+    def existing_texts(self, texts):
+        with self.lock:
+            return {text.lower() for text in texts if text.lower() in self.ids_by_text}
+
+    def insert(self, rows):
+        with self.lock:
+            texts = set()
+            for row in rows:
+                self._check_text(row["text"])
+                if row["text"].lower() in texts:
+                    raise DuplicateTaskError()
+                texts.add(row["text"].lower())
+            saved = [dict(self._add(dict(row, id=self.tables.next_id))) for row in rows]
+        return self._published("INSERT", saved)
+
+    def update(self, task_ids, fields):
+        with self.lock:
+            tasks = [self.by_id[task_id] for task_id in task_ids if self._owns(task_id)]
+            if "text" in fields:
+                for task in tasks:
+                    self._check_text(fields["text"], task["id"])
+            saved = [dict(self._replace(dict(task, **fields))) for task in tasks]
+        return self._published("UPDATE", saved)
+
+    def update_rows(self, rows):
+        with self.lock:
+            rows = [row for row in rows if self._owns(row["id"])]
+            for row in rows:
+                self._check_text(row["text"], row["id"])
+            saved = [dict(self._replace(dict(self.by_id[row["id"]], **row))) for row in rows]
+        return self._published("UPDATE", saved)
+
+    def delete(self, task_ids):
+        with self.lock:
+            deleted = [dict(self._delete(task_id)) for task_id in task_ids if self._owns(task_id)]
+        self._published("DELETE", deleted)
+
+    def complete_all(self):
+        with self.lock:
+            task_ids = [row["id"] for row in self.rows if not row["completed"]]
+        return self.update(task_ids, {"completed": True})
+
+    def delete_completed(self):
+        with self.lock:
+            deleted = [dict(self._delete(row["id"])) for row in [row for row in self.rows if row["completed"]]]
+        return self._published("DELETE", deleted)
+
+    def search(self, query_tokens, completed, priority, limit, columns=None):
+        found = []
+        with self.lock:
+            for row in self.rows:
+                if len(found) == limit:
+                    break
+                if (completed is None or row["completed"] == completed) and (priority is None or row["priority"] == priority) and matches(row["text"], query_tokens):
+                    found.append(dict(row))
+        return found
+
+    # the task exists and is in this user's list
+    def _owns(self, task_id):
+        task = self.by_id.get(task_id)
+        return task is not None and task.get("user_id") == self.user_id
+
+    def _check_text(self, text, task_id=None):
+        owner = self.ids_by_text.get(text.lower())
+        if owner is not None and owner != task_id:
+            raise DuplicateTaskError()
+
+    def _add(self, task):
+        if self.user_id is not None:
+            task["user_id"] = self.user_id
+        changed_at = self.tables.stamp()
+        task["updated_at"] = changed_at.isoformat()
+        self.changes.append((changed_at, task["id"], False))
+        self.rows.insert(insert_position(self.rows, task_sort_key(task)), task)
+        self.by_id[task["id"]] = task
+        self.ids_by_text[task["text"].lower()] = task["id"]
+        self.tables.next_id = max(self.tables.next_id, task["id"] + 1)
+        return task
+
+    def _remove(self, task_id):
+        task = self.by_id.pop(task_id)
+        del self.rows[insert_position(self.rows, task_sort_key(task))]
+        del self.ids_by_text[task["text"].lower()]
+        return task
+
+    # remove a task and record its tombstone
+    def _delete(self, task_id):
+        task = self._remove(task_id)
+        self.changes.append((self.tables.stamp(), task_id, True))
+        return task
+
+    def _replace(self, task):
+        self._remove(task["id"])
+        return self._add(task)
@@ -0,0 +1,179 @@
+# app/model/backends/sqlite.py
+import contextlib
+import os
+import sqlite3
+import threading
+from app.model.backends.base import LocalBackend, DuplicateTaskError
+from app.model.search import matches
+
+# database file used by the sqlite backend
+TASK_SQLITE_PATH = os.getenv("TASK_SQLITE_PATH", "tasks.db")
+
+SCHEMA = """
+create table if not exists tasks (
+    id integer primary key autoincrement,
+    text text not null,
+    text_key text not null unique, -- lower(text), prefixed with the user id and a NUL for per-user tasks
+    priority integer not null,
+    completed integer not null default 0,
+    user_id text -- null for the shared task list
+);
+"""
+
+INDEXES = """
+create index if not exists tasks_order_idx on tasks (completed, priority, id);
+create index if not exists tasks_user_order_idx on tasks (user_id, completed, priority, id);
+"""
+
+COLUMNS = "id, text, priority, completed"
+
+def _to_task(row):
+    return {"id": row[0], "text": row[1], "priority": row[2], "completed": bool(row[3])}
+
+class SQLiteBackend(LocalBackend):
+    """Tasks in a local SQLite file, for running the app without supabase. Per-user backends
+    (for_user) share the file and connection; every statement is scoped by user_id."""
+
+    def __init__(self, path=TASK_SQLITE_PATH, publish=True, user_id=None, connection=None):
+        super().__init__(publish, user_id)
+        self.path = path
+        if connection is not None:
+            self.db, self.lock = connection
+            return
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.db:
+            if path != ":memory:":
+                self.db.execute("pragma journal_mode=wal")
+            self.db.executescript(SCHEMA)
+            # files created before per-user lists
+            if "user_id" not in [row[1] for row in self.db.execute("pragma table_info(tasks)")]:
+                self.db.execute("alter table tasks add column user_id text")
+            # files whose per-user keys used ":" as the separator, which a user id or text containing
+            # it could collide with
+            self.db.execute(
+                "update tasks set text_key = user_id || char(0) || substr(text_key, length(user_id) + 2) "
+                "where user_id is not null and substr(text_key, 1, length(user_id) + 1) = user_id || ':'")
+            self.db.executescript(INDEXES)
+
+    def for_user(self, user_id):
+        return SQLiteBackend(self.path, self.publish, user_id, (self.db, self.lock))
+
+    def fetch_page(self, after, limit, columns=None):
+        with self.lock:
+            if after is None:
+                rows = self.db.execute(f"select {COLUMNS} from tasks where user_id is ? order by completed, priority, id limit ?", (self.user_id, limit))
+            else:
+                rows = self.db.execute(
+                    f"select {COLUMNS} from tasks where user_id is ? and (completed, priority, id) > (?, ?, ?) "
+                    "order by completed, priority, id limit ?",
+                    (self.user_id, int(after["completed"]), after["priority"], after["id"], limit))
+            return [_to_task(row) for row in rows.fetchall()]
+
+    def count(self):
+        with self.lock:
+            return self.db.execute("select count(*) from tasks where user_id is ?", (self.user_id,)).fetchone()[0]
+
+    def existing_texts(self, texts):
+        keys = {self._text_key(text): text.lower() for text in texts}
+        chunks = list(keys)
+        found = set()
+        with self.lock:
+            for start in range(0, len(chunks), 500):
+                chunk = chunks[start:start + 500]
+                placeholders = ", ".join("?" * len(chunk))
+                found.update(keys[row[0]] for row in self.db.execute(f"select text_key from tasks where text_key in ({placeholders})", chunk))
+        return found
+
+    def insert(self, rows):
+        with self.lock, self._transaction():
+            task_ids = [
+                self.db.execute(
+                    "insert into tasks (text, text_key, priority, completed, user_id) values (?, ?, ?, ?, ?)",
+                    (row["text"], self._text_key(row["text"]), row["priority"], int(row.get("completed", False)), self.user_id)).lastrowid
+                for row in rows
+            ]
+            saved = self._select(task_ids)
+        return self._published("INSERT", saved)
+
+    def update(self, task_ids, fields):
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        values = [int(value) if column == "completed" else value for column, value in fields.items()]
+        if "text" in fields:
+            assignments += ", text_key = ?"
+            values.append(self._text_key(fields["text"]))
+        with self.lock, self._transaction():
+            self.db.executemany(f"update tasks set {assignments} where id = ? and user_id is ?", [values + [task_id, self.user_id] for task_id in task_ids])
+            saved = self._select(task_ids)
+        return self._published("UPDATE", saved)
+
+    # rows with the id of another user's task, or of no task, are skipped
+    def update_rows(self, rows):
+        with self.lock, self._transaction():
+            self.db.executemany(
+                "update tasks set text = ?, text_key = ?, priority = ?, completed = ? where id = ? and user_id is ?",
+                [(row["text"], self._text_key(row["text"]), row["priority"], int(row["completed"]), row["id"], self.user_id) for row in rows])
+            saved = self._select([row["id"] for row in rows])
+        return self._published("UPDATE", saved)
+
+    def delete(self, task_ids):
+        with self.lock, self.db:
+            deleted = self._select(task_ids)
+            self.db.executemany("delete from tasks where id = ? and user_id is ?", [(task["id"], self.user_id) for task in deleted])
+        self._published("DELETE", deleted)
+
+    def complete_all(self):
+        with self.lock:
+            task_ids = [row[0] for row in self.db.execute("select id from tasks where user_id is ? and completed = 0", (self.user_id,))]
+        return self.update(task_ids, {"completed": True})
+
+    def delete_completed(self):
+        with self.lock, self.db:
+            deleted = [_to_task(row) for row in self.db.execute(f"select {COLUMNS} from tasks where user_id is ? and completed = 1", (self.user_id,))]
+            self.db.execute("delete from tasks where user_id is ? and completed = 1", (self.user_id,))
+        return self._published("DELETE", deleted)
+
+    # completion / priority are filtered by the query, the words in python
+    def search(self, query_tokens, completed, priority, limit, columns=None):
+        conditions, values = ["user_id is ?"], [self.user_id]
+        if completed is not None:
+            conditions.append("completed = ?")
+            values.append(int(completed))
+        if priority is not None:
+            conditions.append("priority = ?")
+            values.append(priority)
+        found = []
+        with self.lock:
+            for row in self.db.execute(f"select {COLUMNS} from tasks where {' and '.join(conditions)} order by completed, priority, id", values):
+                if len(found) == limit:
+                    break
+                if matches(row[1], query_tokens):
+                    found.append(_to_task(row))
+        return found
+
+    # the text's unique key: the unique constraint covers the whole table, so per-user keys carry the
+    # user id. NUL separates them: unlike ":", it appears in neither a uuid user id nor a sanitized
+    # text, so two (user, text) pairs never share a key
+    def _text_key(self, text):
+        return text.lower() if self.user_id is None else f"{self.user_id}\0{text.lower()}"
+
+    # this user's tasks with the given ids, in the same order
+    def _select(self, task_ids):
+        rows = {}
+        for start in range(0, len(task_ids), 500):
+            chunk = task_ids[start:start + 500]
+            placeholders = ", ".join("?" * len(chunk))
+            for row in self.db.execute(f"select {COLUMNS} from tasks where user_id is ? and id in ({placeholders})", [self.user_id, *chunk]):
+                rows[row[0]] = _to_task(row)
+        return [rows[task_id] for task_id in task_ids if task_id in rows]
+
+    # a write transaction; a text_key conflict becomes DuplicateTaskError
+    @contextlib.contextmanager
+    def _transaction(self):
+        try:
+            with self.db:
+                yield
+        except sqlite3.IntegrityError as ex:
+            if "text_key" in str(ex):
+                raise DuplicateTaskError() from ex
+            raise
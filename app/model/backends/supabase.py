@@ -0,0 +1,275 @@
+# app/model/backends/supabase.py
+import asyncio
+import threading
+from supabase import AsyncClient, Client
+from app.model.backends.base import TaskBackend, DuplicateTaskError
+from app.model.changes import task_feed
+from app.model.config import get_supabase_settings
+from app.model.search import to_tsquery
+from app.model.store import later_time
+from app.model.transport import create_pooled_client, create_pooled_async_client
+
+# texts per existing_texts lookup; texts run longer than ids, so the in.(...) filter takes fewer
+TEXT_CHUNK_SIZE = 100
+
+# supabase client shared by every session. secrets are fetched (AWS SSM in deployment, .env
+# locally; see app/model/config.py) and the client created on first use, not at import, so the
+# app starts without waiting on the network. its http connections are pooled and capped across
+# sessions by app/model/transport.py
+_client: Client = None
+_client_settings = None
+_client_lock = threading.Lock()
+
+def get_client():
+    global _client, _client_settings
+    settings = get_supabase_settings()
+    if settings != _client_settings:
+        # first use, or the secrets were rotated by a background refresh
+        with _client_lock:
+            if settings != _client_settings:
+                _client = create_pooled_client(*settings)
+                _client_settings = settings
+    return _client
+
+# async supabase client shared by every session on the event loop, created on first use inside it
+_async_client: AsyncClient = None
+_async_client_settings = None
+_async_client_lock = asyncio.Lock()
+
+async def get_async_client():
+    global _async_client, _async_client_settings
+    if _async_client is None:
+        # the first call may read the disk cache or wait on SSM; keep that off the event loop.
+        # once loaded, get_supabase_settings answers from memory and refreshes in the background
+        settings = await asyncio.to_thread(get_supabase_settings)
+    else:
+        settings = get_supabase_settings()
+    if settings != _async_client_settings:
+        async with _async_client_lock:
+            if settings != _async_client_settings:
+                _async_client = await create_pooled_async_client(*settings)
+                _async_client_settings = settings
+    return _async_client
+
+# tasks in one user's list (user_id is null for the shared list). the (user_id, completed, priority, id)
+# index (sql/005_tasks_user_id.sql) keeps queries scoped to one user from touching other users' rows
+def scoped(query, user_id):
+    return query.is_("user_id", "null") if user_id is None else query.eq("user_id", user_id)
+
+# rows written to one user's list are stamped with the user. shared with the async model and the sync engine
+def owned(rows, user_id):
+    return rows if user_id is None else [dict(row, user_id=user_id) for row in rows]
+
+# the query builders below take the client to run on, so SupabaseBackend and AsyncSupabaseBackend
+# send the same queries
+
+# one page of tasks in display order, starting after the given task (keyset pagination backed by
+# the (user_id, completed, priority, id) index so each page is an index range scan regardless of
+# offset)
+def page_query(client, after, limit, columns, user_id=None):
+    query = scoped(client.table("tasks").select(columns), user_id).order("completed").order("priority").order("id").limit(limit)
+    if after is not None:
+        completed = str(after["completed"]).lower()
+        priority = after["priority"]
+        query = query.or_(
+            f"completed.gt.{completed},"
+            f"and(completed.eq.{completed},priority.gt.{priority}),"
+            f"and(completed.eq.{completed},priority.eq.{priority},id.gt.{after['id']})"
+        )
+    return query
+
+# search query over the generated tsvector column and its GIN index (sql/004_tasks_search.sql)
+def search_query(client, query_tokens, completed, priority, limit, columns, user_id=None):
+    query = scoped(client.table("tasks").select(columns), user_id)
+    if query_tokens:
+        query = query.filter("search", "fts(simple)", to_tsquery(query_tokens))
+    if completed is not None:
+        query = query.eq("completed", completed)
+    if priority is not None:
+        query = query.eq("priority", priority)
+    return query.order("completed").order("priority").order("id").limit(limit)
+
+# number of tasks in one user's list, counted by postgres without returning rows
+def count_query(client, user_id=None):
+    return scoped(client.table("tasks").select("id", count="exact", head=True), user_id)
+
+# rows of one user's list written after `since`, oldest first, and the tombstones the delete trigger
+# recorded after it (sql/006_task_tombstones.sql); both are index range scans on (user_id, time)
+def changes_query(client, since, limit, columns, user_id=None):
+    return scoped(client.table("tasks").select(f"{columns},updated_at"), user_id).gt("updated_at", since).order("updated_at").limit(limit)
+
+def tombstones_query(client, since, limit, user_id=None):
+    return scoped(client.table("task_tombstones").select("id,deleted_at"), user_id).gt("deleted_at", since).order("deleted_at").limit(limit)
+
+# tasks of one user's list whose lower(text) is one of `keys`, over the generated text_key column and
+# its index (sql/007_tasks_text_key.sql)
+def existing_texts_query(client, keys, user_id=None):
+    return scoped(client.table("tasks").select("text_key"), user_id).in_("text_key", keys)
+
+# lower(text) of the given texts, deduplicated, in chunks of TEXT_CHUNK_SIZE
+def text_key_chunks(texts):
+    keys = sorted({text.lower() for text in texts})
+    return [keys[start:start + TEXT_CHUNK_SIZE] for start in range(0, len(keys), TEXT_CHUNK_SIZE)]
+
+# the latest updated_at and the latest deleted_at of one user's list
+def watermark_queries(client, user_id=None):
+    return (
+        scoped(client.table("tasks").select("updated_at"), user_id).order("updated_at", desc=True).limit(1),
+        scoped(client.table("task_tombstones").select("deleted_at"), user_id).order("deleted_at", desc=True).limit(1),
+    )
+
+def latest_watermark(updated, deleted):
+    return later_time(updated[0]["updated_at"] if updated else None, deleted[0]["deleted_at"] if deleted else None) or TaskBackend.EPOCH
+
+def insert_query(client, rows, user_id=None):
+    return client.table("tasks").insert(owned(rows, user_id))
+
+def update_query(client, task_ids, fields, user_id=None):
+    query = scoped(client.table("tasks").update(fields), user_id)
+    return query.eq("id", task_ids[0]) if len(task_ids) == 1 else query.in_("id", task_ids)
+
+def delete_query(client, task_ids, user_id=None):
+    query = scoped(client.table("tasks").delete(), user_id)
+    return query.eq("id", task_ids[0]) if len(task_ids) == 1 else query.in_("id", task_ids)
+
+# per-row values for several tasks in one request, over the update_tasks function
+# (sql/009_update_tasks.sql). unlike an upsert on id, a task deleted in the meantime stays deleted
+def update_rows_query(client, rows, user_id=None):
+    task_rows = [{"id": row["id"], "text": row["text"], "priority": row["priority"], "completed": row["completed"]} for row in rows]
+    return client.rpc("update_tasks", {"task_rows": task_rows, "list_user_id": user_id})
+
+def complete_all_query(client, user_id=None):
+    return scoped(client.table("tasks").update({"completed": True}), user_id).eq("completed", False)
+
+def delete_completed_query(client, user_id=None):
+    return scoped(client.table("tasks").delete(), user_id).eq("completed", True)
+
+# the unique constraint on the tasks table surfaces as a postgres error message
+def raise_if_duplicate(ex):
+    if "duplicate key value" in str(ex):
+        raise DuplicateTaskError() from ex
+
+class SupabaseBackend(TaskBackend):
+    delta_sync = True
+
+    def __init__(self, user_id=None):
+        self.user_id = user_id
+
+    def for_user(self, user_id):
+        return SupabaseBackend(user_id)
+
+    def asynchronous(self):
+        return AsyncSupabaseBackend(self.user_id)
+
+    def fetch_page(self, after, limit, columns):
+        return page_query(get_client(), after, limit, columns, self.user_id).execute().data
+
+    def count(self):
+        return count_query(get_client(), self.user_id).execute().count
+
+    def existing_texts(self, texts):
+        found = set()
+        for keys in text_key_chunks(texts):
+            found.update(row["text_key"] for row in existing_texts_query(get_client(), keys, self.user_id).execute().data)
+        return found
+
+    def fetch_changes(self, since, limit, columns):
+        client = get_client()
+        rows = changes_query(client, since, limit, columns, self.user_id).execute().data
+        return rows, tombstones_query(client, since, limit, self.user_id).execute().data
+
+    def fetch_watermark(self):
+        updated, deleted = watermark_queries(get_client(), self.user_id)
+        return latest_watermark(updated.execute().data, deleted.execute().data)
+
+    def insert(self, rows):
+        try:
+            return insert_query(get_client(), rows, self.user_id).execute().data
+        except Exception as ex:
+            raise_if_duplicate(ex)
+            raise
+
+    def update(self, task_ids, fields):
+        try:
+            return update_query(get_client(), task_ids, fields, self.user_id).execute().data
+        except Exception as ex:
+            raise_if_duplicate(ex)
+            raise
+
+    def update_rows(self, rows):
+        try:
+            return update_rows_query(get_client(), rows, self.user_id).execute().data
+        except Exception as ex:
+            raise_if_duplicate(ex)
+            raise
+
+    def delete(self, task_ids):
+        delete_query(get_client(), task_ids, self.user_id).execute()
+
+    def complete_all(self):
+        return complete_all_query(get_client(), self.user_id).execute().data
+
+    def delete_completed(self):
+        return delete_completed_query(get_client(), self.user_id).execute().data
+
+    def search(self, query_tokens, completed, priority, limit, columns):
+        return search_query(get_client(), query_tokens, completed, priority, limit, columns, self.user_id).execute().data
+
+    # supabase realtime delivers every change, including this session's own writes
+    def start_feed(self):
+        task_feed.start(*get_supabase_settings())
+
+class AsyncSupabaseBackend:
+    """SupabaseBackend's reads and writes as coroutines over the async client, for AsyncTaskModel.
+    Builds the same queries and raises the same errors."""
+
+    def __init__(self, user_id=None):
+        self.user_id = user_id
+
+    async def fetch_page(self, after, limit, columns):
+        return (await page_query(await get_async_client(), after, limit, columns, self.user_id).execute()).data
+
+    async def count(self):
+        return (await count_query(await get_async_client(), self.user_id).execute()).count
+
+    async def existing_texts(self, texts):
+        client = await get_async_client()
+        found = set()
+        for keys in text_key_chunks(texts):
+            found.update(row["text_key"] for row in (await existing_texts_query(client, keys, self.user_id).execute()).data)
+        return found
+
+    async def fetch_changes(self, since, limit, columns):
+        client = await get_async_client()
+        rows = (await changes_query(client, since, limit, columns, self.user_id).execute()).data
+        return rows, (await tombstones_query(client, since, limit, self.user_id).execute()).data
+
+    async def fetch_watermark(self):
+        updated, deleted = watermark_queries(await get_async_client(), self.user_id)
+        return latest_watermark((await updated.execute()).data, (await deleted.execute()).data)
+
+    async def insert(self, rows):
+        try:
+            return (await insert_query(await get_async_client(), rows, self.user_id).execute()).data
+        except Exception as ex:
+            raise_if_duplicate(ex)
+            raise
+
+    async def update(self, task_ids, fields):
+        try:
+            return (await update_query(await get_async_client(), task_ids, fields, self.user_id).execute()).data
+        except Exception as ex:
+            raise_if_duplicate(ex)
+            raise
+
+    async def delete(self, task_ids):
+        await delete_query(await get_async_client(), task_ids, self.user_id).execute()
+
+    async def complete_all(self):
+        return (await complete_all_query(await get_async_client(), self.user_id).execute()).data
+
+    async def delete_completed(self):
+        return (await delete_completed_query(await get_async_client(), self.user_id).execute()).data
+
+    async def search(self, query_tokens, completed, priority, limit, columns):
+        return (await search_query(await get_async_client(), query_tokens, completed, priority, limit, columns, self.user_id).execute()).data
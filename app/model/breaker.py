@@ -0,0 +1,188 @@
+# app/model/breaker.py
+import contextvars
+import functools
+import inspect
+import os
+import threading
+import time
+from app.model.transport import request_deadline
+from app import metrics
+
+# consecutive failed model calls that open the circuit, and seconds it stays open before one call
+# is let through to probe whether the database has recovered
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))
+BREAKER_RESET = float(os.getenv("BREAKER_RESET", "10"))
+# seconds a model operation may wait on supabase in total (reads get less: a cached list can stand in)
+MODEL_DEADLINE = float(os.getenv("MODEL_DEADLINE", "5"))
+MODEL_READ_DEADLINE = float(os.getenv("MODEL_READ_DEADLINE", "2.5"))
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+
+class CircuitOpenError(Exception):
+    """The database failed repeatedly; calls fail fast until the breaker's next probe succeeds."""
+
+    def __init__(self, message="Task service unavailable"):
+        super().__init__(message)
+
+class CircuitBreaker:
+    """Shared by every session's model: when the database browns out, all sessions stop waiting on
+    it together.
+
+    Closed: calls go through; BREAKER_FAILURES failures in a row open the circuit. Open: calls fail
+    at once with CircuitOpenError. After BREAKER_RESET seconds it is half-open: a single call probes
+    the database while the others keep failing fast; its success closes the circuit, its failure
+    opens it again.
+    """
+
+    def __init__(self, failures=BREAKER_FAILURES, reset_after=BREAKER_RESET):
+        self.failures = failures
+        self.reset_after = reset_after
+        self.lock = threading.Lock()
+        self.state = CLOSED
+        self.failed = 0 # consecutive failures
+        self.opened_at = 0.0
+        self.probing = False
+        self.opened = 0
+        self.rejected = 0
+        self.fallbacks = 0
+
+    # whether a call may go through now (a half-open circuit admits one probe at a time)
+    def allow(self):
+        with self.lock:
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_after:
+                self.state = HALF_OPEN
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self.probing:
+                self.probing = True
+                return True
+            self.rejected += 1
+            return False
+
+    def succeeded(self):
+        with self.lock:
+            self.state = CLOSED
+            self.failed = 0
+            self.probing = False
+
+    def failed_call(self):
+        with self.lock:
+            self.failed += 1
+            if self.state == HALF_OPEN or self.failed >= self.failures:
+                if self.state != OPEN:
+                    self.opened += 1
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+            self.probing = False
+
+    # a probe that ended without telling anything about the database (e.g. a validation error)
+    def released(self):
+        with self.lock:
+            self.probing = False
+
+    def stats(self):
+        with self.lock:
+            return {"state": self.state, "opened": self.opened, "rejected": self.rejected, "fallbacks": self.fallbacks}
+
+# one breaker for the supabase-backed models of every session
+model_breaker = CircuitBreaker()
+
+# set while a guarded call runs, so the model calls it makes (e.g. fetch_page) are not guarded twice
+_in_guarded_call = contextvars.ContextVar("in_guarded_call", default=False)
+
+# validation errors (empty text, duplicates, the task limit) are answers from a healthy database
+def _is_failure(ex):
+    return not isinstance(ex, (ValueError, CircuitOpenError))
+
+def _guarded(function, deadline, fallback):
+    # a read that failed or was refused is answered from cached data if there is any
+    def fall_back(model, ex, args, kwargs):
+        if fallback is not None:
+            result = getattr(model, fallback)(*args, **kwargs)
+            if result is not None:
+                with model.breaker.lock:
+                    model.breaker.fallbacks += 1
+                model.serving_cached = True
+                return result
+        raise ex
+
+    def enter():
+        return _in_guarded_call.set(True), request_deadline.set(time.monotonic() + deadline)
+
+    def leave(tokens):
+        _in_guarded_call.reset(tokens[0])
+        request_deadline.reset(tokens[1])
+
+    def succeeded(model, result):
+        model.breaker.succeeded()
+        if fallback is not None:
+            model.serving_cached = False
+        return result
+
+    if inspect.iscoroutinefunction(function):
+        @functools.wraps(function)
+        async def wrapper(model, *args, **kwargs):
+            if model.breaker is None or _in_guarded_call.get():
+                return await function(model, *args, **kwargs)
+            if not model.breaker.allow():
+                return fall_back(model, CircuitOpenError(), args, kwargs)
+            tokens = enter()
+            try:
+                result = await function(model, *args, **kwargs)
+            except Exception as ex:
+                if not _is_failure(ex):
+                    model.breaker.released()
+                    raise
+                model.breaker.failed_call()
+                return fall_back(model, ex, args, kwargs)
+            finally:
+                leave(tokens)
+            return succeeded(model, result)
+    else:
+        @functools.wraps(function)
+        def wrapper(model, *args, **kwargs):
+            if model.breaker is None or _in_guarded_call.get():
+                return function(model, *args, **kwargs)
+            if not model.breaker.allow():
+                return fall_back(model, CircuitOpenError(), args, kwargs)
+            tokens = enter()
+            try:
+                result = function(model, *args, **kwargs)
+            except Exception as ex:
+                if not _is_failure(ex):
+                    model.breaker.released()
+                    raise
+                model.breaker.failed_call()
+                return fall_back(model, ex, args, kwargs)
+            finally:
+                leave(tokens)
+            return succeeded(model, result)
+    return wrapper
+
+def guarded(skip=(), reads=()):
+    """Class decorator running the public methods defined on the class through the model's breaker
+    (self.breaker; None turns it off) with a deadline of MODEL_DEADLINE seconds. Methods in `reads`
+    get MODEL_READ_DEADLINE and, when they fail or the circuit is open, return `_cached_<name>(...)`
+    instead if that returns anything but None."""
+
+    def decorate(cls):
+        for name, member in list(vars(cls).items()):
+            if name.startswith("_") or name in skip or not inspect.isfunction(member):
+                continue
+            read = name in reads
+            setattr(cls, name, _guarded(member, MODEL_READ_DEADLINE if read else MODEL_DEADLINE, f"_cached_{name}" if read else None))
+        return cls
+    return decorate
+
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+def _breaker_metrics():
+    stats = model_breaker.stats()
+    return {
+        "model_circuit_state": _STATE_VALUES[stats["state"]],
+        "model_circuit_opened_total": stats["opened"],
+        "model_circuit_rejected_total": stats["rejected"],
+        "model_cached_reads_total": stats["fallbacks"],
+    }
+
+metrics.register_collector(_breaker_metrics)
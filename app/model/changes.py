@@ -0,0 +1,82 @@
+# app/model/changes.py
+import asyncio
+import threading
+from realtime import AsyncRealtimeClient
+from app.model.store import stores_for_change
+
+# whether a change belongs to the list of user_id (None: the shared list). deletes from supabase
+# realtime carry only the id; removing a task a list does not have is a no-op, so they are let through
+def change_for_user(user_id, event_type, record, old_record):
+    if event_type == "DELETE":
+        return old_record.get("user_id", user_id) == user_id
+    return record.get("user_id") == user_id
+
+class TaskChangeFeed:
+    """Single Supabase Realtime subscription to the tasks table, fanned out to every session."""
+
+    def __init__(self, table="tasks", schema="public"):
+        self.table = table
+        self.schema = schema
+        self.listeners = []
+        self.lock = threading.Lock()
+        self.thread = None
+
+    # listener(event_type, record, old_record) is called for every insert/update/delete
+    def subscribe(self, listener):
+        with self.lock:
+            self.listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        with self.lock:
+            if listener in self.listeners:
+                self.listeners.remove(listener)
+
+    # open the realtime connection once per process; later calls are no-ops
+    def start(self, url, key):
+        with self.lock:
+            if self.thread is not None:
+                return
+            self.thread = threading.Thread(target=self._run, args=(url, key), name="task-change-feed", daemon=True)
+            self.thread.start()
+
+    def _run(self, url, key):
+        try:
+            asyncio.run(self._listen(url, key))
+        except Exception as ex:
+            # sessions keep working off the store's ttl; the next start() retries
+            print("Error in task change feed:", ex)
+            with self.lock:
+                self.thread = None
+
+    async def _listen(self, url, key):
+        client = AsyncRealtimeClient(f"{url}/realtime/v1", key)
+        await client.connect()
+        channel = client.channel(f"{self.table}-changes")
+        await channel.on_postgres_changes("*", schema=self.schema, table=self.table, callback=self._on_change).subscribe()
+        # the client listens and reconnects on its own tasks; keep the loop alive
+        await asyncio.Event().wait()
+
+    def _on_change(self, payload):
+        data = payload["data"]
+        event_type = str(data["type"]).upper()
+        self.publish(event_type, data.get("record"), data.get("old_record"))
+
+    # deliver a change to the store and every listener; also used for changes made while offline
+    def publish(self, event_type, record, old_record):
+        # keep the shared stores current so new sessions load without querying
+        if event_type == "DELETE":
+            for store in stores_for_change(old_record, deleted=True):
+                store.discard(old_record["id"])
+        else:
+            for store in stores_for_change(record):
+                store.put(record)
+        with self.lock:
+            listeners = list(self.listeners)
+        for listener in listeners:
+            try:
+                listener(event_type, record, old_record)
+            except Exception as ex:
+                print("Error delivering task change:", ex)
+
+# single feed shared by all sessions in this process
+task_feed = TaskChangeFeed()
@@ -0,0 +1,94 @@
+# app/model/coalescer.py
+import threading
+import time
+from concurrent.futures import Future
+
+# what an update's Future resolves to when its task no longer existed when the batch was sent
+# (deleted by another session or process). the row is not recreated
+MISSING = object()
+
+class WriteCoalescer:
+    """Collects task updates for a short window and sends them to the database as one bulk update.
+
+    Repeated updates to the same task inside the window are merged (the latest row wins) and share
+    one Future, which resolves to the row as saved, to MISSING if the task was gone by then, or to
+    None if the update was cancelled because the task is being deleted.
+    """
+
+    def __init__(self, send_batch, send_one, flush_interval=0.5, max_batch=100):
+        self.send_batch = send_batch # (rows) -> saved rows, one request; rows of missing tasks are left out
+        self.send_one = send_one # (row) -> saved row or None, used to isolate failures in a rejected batch
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.pending = {} # task id -> (row, future), in submission order
+        self.cond = threading.Condition()
+        self.thread = None
+        self.batches = 0
+        self.rows_sent = 0
+        self.merged = 0
+
+    def submit(self, row):
+        with self.cond:
+            if row["id"] in self.pending:
+                future = self.pending.pop(row["id"])[1]
+                self.merged += 1
+            else:
+                future = Future()
+            self.pending[row["id"]] = (row, future)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._worker, name="write-coalescer", daemon=True)
+                self.thread.start()
+            self.cond.notify()
+        return future
+
+    # drop a pending update (the task is being deleted) so no request is sent for it
+    def cancel(self, task_id):
+        with self.cond:
+            item = self.pending.pop(task_id, None)
+        if item is not None:
+            item[1].set_result(None)
+
+    def stats(self):
+        with self.cond:
+            return {
+                "pending": len(self.pending),
+                "batches": self.batches,
+                "rows_sent": self.rows_sent,
+                "merged": self.merged,
+            }
+
+    def _worker(self):
+        while True:
+            with self.cond:
+                while not self.pending:
+                    self.cond.wait()
+                # wait out the window unless a full batch is already waiting
+                deadline = time.monotonic() + self.flush_interval
+                while len(self.pending) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.cond.wait(remaining)
+                batch = [self.pending.pop(task_id) for task_id in list(self.pending)[:self.max_batch]]
+                self.batches += 1
+                self.rows_sent += len(batch)
+            self._send(batch)
+
+    def _send(self, batch):
+        try:
+            saved = {row["id"]: row for row in self.send_batch([row for row, future in batch])}
+        except Exception as ex:
+            if len(batch) == 1:
+                batch[0][1].set_exception(ex)
+                return
+            # one bad row (e.g. a duplicate text) rejects the whole update; retry the rows one by one
+            for row, future in batch:
+                try:
+                    saved_row = self.send_one(row)
+                except Exception as row_ex:
+                    future.set_exception(row_ex)
+                    continue
+                future.set_result(saved_row if saved_row is not None else MISSING)
+            return
+        for row, future in batch:
+            future.set_result(saved.get(row["id"], MISSING))
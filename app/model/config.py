@@ -0,0 +1,103 @@
+# app/model/config.py
+import json
+import os
+import threading
+import time
+
+# local development settings (.env) are optional; deployment sets the environment directly
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass
+
+# where supabase secrets come from: "ssm" (AWS SSM Parameter Store, used in deployment) or "env"
+# (SUPABASE_URL / SUPABASE_KEY from the environment or a .env file, for local development)
+CONFIG_SOURCE = os.getenv("TASK_MASTER_CONFIG_SOURCE", "ssm").lower()
+SSM_REGION = os.getenv("TASK_MASTER_SSM_REGION", "us-east-1")
+SSM_URL_PARAMETER = "/flettaskmaster/supabase-url"
+SSM_KEY_PARAMETER = "/flettaskmaster/supabase-key"
+
+# seconds before cached secrets are refreshed in the background, and where they are cached on disk
+# between restarts (empty to keep them in memory only)
+SECRETS_TTL = float(os.getenv("TASK_MASTER_SECRETS_TTL", "3600"))
+SECRETS_CACHE_PATH = os.getenv("TASK_MASTER_SECRETS_CACHE", os.path.expanduser("~/.cache/flettaskmaster/secrets.json"))
+
+_lock = threading.Lock()
+_ssm_client = None
+_secrets = None # {"url", "key", "fetched_at"}
+_refreshing = False
+
+def _get_ssm_client():
+    global _ssm_client
+    if _ssm_client is None:
+        import boto3
+        _ssm_client = boto3.client("ssm", region_name=SSM_REGION)
+    return _ssm_client
+
+# both supabase secrets in a single get_parameters call
+def _fetch_ssm_secrets():
+    response = _get_ssm_client().get_parameters(Names=[SSM_URL_PARAMETER, SSM_KEY_PARAMETER], WithDecryption=True)
+    if response.get("InvalidParameters"):
+        raise Exception(f"Missing SSM parameters: {response['InvalidParameters']}")
+    values = {p["Name"]: p["Value"] for p in response["Parameters"]}
+    return {"url": values[SSM_URL_PARAMETER], "key": values[SSM_KEY_PARAMETER], "fetched_at": time.time()}
+
+def _fetch_env_secrets():
+    url, key = os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY")
+    if not url or not key:
+        raise Exception("SUPABASE_URL and SUPABASE_KEY must be set")
+    return {"url": url, "key": key, "fetched_at": time.time()}
+
+def _read_disk_cache():
+    if not SECRETS_CACHE_PATH or not os.path.exists(SECRETS_CACHE_PATH):
+        return None
+    try:
+        with open(SECRETS_CACHE_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_disk_cache(secrets):
+    if not SECRETS_CACHE_PATH:
+        return
+    try:
+        os.makedirs(os.path.dirname(SECRETS_CACHE_PATH), exist_ok=True)
+        # readable by the app's user only
+        fd = os.open(SECRETS_CACHE_PATH, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump(secrets, f)
+    except OSError as ex:
+        print("Error caching secrets:", ex)
+
+def _refresh():
+    global _secrets, _refreshing
+    try:
+        secrets = _fetch_ssm_secrets()
+        _write_disk_cache(secrets)
+        _secrets = secrets
+    except Exception as ex:
+        # keep serving the cached secrets; the next call retries
+        print("Error refreshing secrets:", ex)
+    finally:
+        _refreshing = False
+
+def get_supabase_settings():
+    """(url, key) for supabase, fetched on first use and cached in memory and on disk."""
+    global _secrets, _refreshing
+    if CONFIG_SOURCE == "env":
+        if _secrets is None:
+            _secrets = _fetch_env_secrets()
+        return _secrets["url"], _secrets["key"]
+
+    with _lock:
+        if _secrets is None:
+            _secrets = _read_disk_cache()
+        if _secrets is None:
+            _secrets = _fetch_ssm_secrets()
+            _write_disk_cache(_secrets)
+        elif time.time() - _secrets["fetched_at"] > SECRETS_TTL and not _refreshing:
+            # serve the cached value and refresh it in the background
+            _refreshing = True
+            threading.Thread(target=_refresh, name="secrets-refresh", daemon=True).start()
+        return _secrets["url"], _secrets["key"]
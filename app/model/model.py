@@ -1,43 +1,17 @@
 # app/model/model.py
 import flet as ft
+import heapq
+import itertools
+import os
 import threading
-import bleach
-from supabase import create_client, Client
-
-# ==================================================================== #
-# FOR DEPLOYMENT
-
-# IMPORTS
-import boto3
-import json
-
-# GET SUPABASE SECRETS FROM AWS SSM. USED IN OFFICIAL DEPLOYMENT
-def get_ssm_parameter(name, with_decryption=True):
-    """Retrieve a parameter from AWS SSM Parameter Store."""
-    ssm = boto3.client('ssm', region_name="us-east-1")  # Change to your region
-    response = ssm.get_parameter(Name=name, WithDecryption=with_decryption)
-    return response['Parameter']['Value']
-
-# FETCH SECRETS FROM AWS SSM PARAMETER STORE
-SUPABASE_URL = get_ssm_parameter("/flettaskmaster/supabase-url", with_decryption=True)
-SUPABASE_KEY = get_ssm_parameter("/flettaskmaster/supabase-key", with_decryption=True)
-# ==================================================================== #
-# FOR TESTING
-
-# # IMPORTS FOR TESTING
-# import os
-# from dotenv import load_dotenv
-
-# # LOAD ENVIRONMENT VARIABLES
-# load_dotenv()
-
-# # GET SUPABASE SECRETS FROM ENV FILE
-# SUPABASE_URL = os.getenv("SUPABASE_URL")
-# SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-# ==================================================================== #
-
-# initialize supabase client
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+from app.model.store import store_for, all_stores, place_task, insert_position, task_sort_key, TASK_DELTA_SYNC
+from app.model.changes import task_feed, change_for_user
+from app.model.coalescer import WriteCoalescer, MISSING
+from app.model.backends import get_backend, DuplicateTaskError
+from app.model.sanitizer import sanitize, sanitize_many
+from app.model.search import TaskSearchIndex, tokenize
+from app.model.breaker import guarded, model_breaker
+from app import metrics
 
 # priority options
 PRIORITY_OPTIONS = ["high", "med", "low"]
@@ -58,49 +32,499 @@ PRIORITY_REVERSE_MAPPING = {
     2: "low"
 }
 
+# merge background updates made within WRITE_FLUSH_INTERVAL seconds into one bulk update of up to
+# WRITE_MAX_BATCH rows (used by optimistic updates)
+WRITE_COALESCING = os.getenv("WRITE_COALESCING", "false").lower() == "true"
+WRITE_FLUSH_INTERVAL = float(os.getenv("WRITE_FLUSH_INTERVAL", "0.5"))
+WRITE_MAX_BATCH = int(os.getenv("WRITE_MAX_BATCH", "100"))
+
+# most tasks one list may hold (0: no limit); adds past it raise TaskLimitError
+TASK_USER_LIMIT = int(os.getenv("TASK_USER_LIMIT", "0"))
+
+class TaskLimitError(ValueError):
+    """Adding the tasks would take the user's list past TASK_USER_LIMIT."""
+
+    def __init__(self, message="Task limit reached"):
+        super().__init__(message)
+
+def _backend_for(user_id):
+    return get_backend() if user_id is None else get_backend().for_user(user_id)
+
+# queued rows carry the user_id of the list they belong to; each user's rows go out in one update
+def _update_tasks(rows):
+    by_user = {}
+    for row in rows:
+        by_user.setdefault(row.get("user_id"), []).append(row)
+    saved = []
+    for user_id, user_rows in by_user.items():
+        saved.extend(_backend_for(user_id).update_rows(user_rows))
+    return saved
+
+def _update_task_row(row):
+    saved = _backend_for(row.get("user_id")).update([row["id"]], {"text": row["text"], "priority": row["priority"], "completed": row["completed"]})
+    return saved[0] if saved else None
+
+# shared by all sessions so updates from different sessions go out in the same batch
+write_coalescer = WriteCoalescer(_update_tasks, _update_task_row, WRITE_FLUSH_INTERVAL, WRITE_MAX_BATCH)
+
+def _store_metrics():
+    stores, coalescer = [store.stats() for store in all_stores()], write_coalescer.stats()
+    return {
+        "task_store_hits_total": sum(store["hits"] for store in stores),
+        "task_store_misses_total": sum(store["misses"] for store in stores),
+        "task_store_refreshes_total": sum(store["refreshes"] for store in stores),
+        "task_store_size": sum(store["size"] for store in stores),
+        "task_store_lists": len(stores),
+        "write_coalescer_pending": coalescer["pending"],
+        "write_coalescer_batches_total": coalescer["batches"],
+        "write_coalescer_rows_sent_total": coalescer["rows_sent"],
+        "write_coalescer_merged_total": coalescer["merged"],
+    }
+
+metrics.register_collector(_store_metrics)
+
+# ids sent per bulk request, keeps the in.(...) filter well under url length limits
+BULK_CHUNK_SIZE = 500
+
+def chunked(items, size=BULK_CHUNK_SIZE):
+    items = list(items)
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+# number of tasks fetched per page and the columns the app reads
+TASK_PAGE_SIZE = int(os.getenv("TASK_PAGE_SIZE", "100"))
+TASK_COLUMNS = "id,text,priority,completed"
+# most tasks returned by one search
+SEARCH_LIMIT = int(os.getenv("SEARCH_LIMIT", "200"))
+
+# cheap in-memory lookups are left untimed
+MODEL_UNTIMED = ("get_task", "position_of", "task_ids_where", "take_changed", "sanitize_input", "validate_text", "subscribe", "unsubscribe", "owns_change")
+# calls that never wait on the database run outside the circuit breaker (app/model/breaker.py);
+# reads fall back to the cached list while it is open
+MODEL_UNGUARDED = MODEL_UNTIMED + ("apply_change", "queue_update")
+MODEL_READS = ("load_tasks", "load_more_tasks", "search")
+
+@metrics.instrumented("model", skip=MODEL_UNTIMED)
+@guarded(skip=MODEL_UNGUARDED, reads=MODEL_READS)
 class TaskModel:
-    def __init__(self):
+    def __init__(self, page_size=TASK_PAGE_SIZE, backend=None, user_id=None):
+        self.backend = backend or get_backend() # see app/model/backends, selected by TASK_BACKEND
+        # whose list this model reads and writes (None: the shared list). queries, the cached store,
+        # duplicate checks and the task limit are all per user
+        self.user_id = user_id
+        if user_id is not None:
+            self.backend = self.backend.for_user(user_id)
+        self.store = store_for(user_id)
+        # refresh the stale store from the rows changed since its last load (see app/model/store.py)
+        self.delta_sync = TASK_DELTA_SYNC and self.backend.delta_sync
+        self.task_limit = TASK_USER_LIMIT
+        self.breaker = model_breaker # shared by every session; None to call the backend directly
+        self.serving_cached = False # the last read was answered from the cache, the database being unreachable
+        # guards the loaded tasks and their indexes: handlers, write queue callbacks and realtime
+        # changes run on different threads (page.run_thread uses a shared pool, not one per session)
+        self.lock = threading.RLock()
         self.tasks = []
+        self.changed_ids = set() # tasks placed or removed since the presenter last caught up (take_changed)
+        self.tasks_by_id = {} # id -> loaded task, kept in sync with self.tasks
+        self.buckets = {} # (completed, priority) -> ids of the loaded tasks in that group
+        self.ids_by_text = {} # lower(text) -> id of the loaded task with that text (the unique constraint's rule)
+        self.search_index = None # word index over the loaded tasks, built by the first search
+        self.page_size = page_size
+        self.has_more = True # more pages exist past the loaded tasks (unknown until the first load)
 
+    # load the first page of tasks
     def load_tasks(self):
         try:
-            response = supabase.table("tasks").select("*").execute()
-            # sort tasks by priority before adding to UI
-            sorted_tasks = sorted(response.data, key=lambda t: (t["completed"], t["priority"]))
-            self.tasks = sorted_tasks
-            return self.tasks
+            # served from the shared store; only queries supabase when the store is stale
+            tasks, self.has_more = self.store.get_tasks(self.fetch_page, self.page_size, self.page_size, self._changes())
+            return self._set_tasks(tasks)
         except Exception as ex:
             raise Exception(f"Error loading tasks: {ex}")
 
+    # load the next page of tasks, returns only the newly loaded tasks
+    def load_more_tasks(self):
+        loaded = len(self.tasks)
+        try:
+            tasks, self.has_more = self.store.get_tasks(self.fetch_page, loaded + self.page_size, self.page_size, self._changes())
+            return self._set_tasks(tasks)[loaded:]
+        except Exception as ex:
+            raise Exception(f"Error loading tasks: {ex}")
+
+    # reads answered from the store's last loaded list, however old, while the database is
+    # unreachable. None when there is nothing cached
+    def _cached_load_tasks(self):
+        cached = self.store.cached(self.page_size)
+        if cached is None:
+            return None
+        tasks, self.has_more = cached
+        return self._set_tasks(tasks)
+
+    def _cached_load_more_tasks(self):
+        loaded = len(self.tasks)
+        cached = self.store.cached(loaded + self.page_size)
+        if cached is None or len(cached[0]) < loaded:
+            return None
+        tasks, self.has_more = cached
+        return self._set_tasks(tasks)[loaded:]
+
+    # one page of tasks in display order, starting after the given task (keyset pagination, so each
+    # page is an index range scan regardless of offset)
+    def fetch_page(self, after=None, limit=TASK_PAGE_SIZE, columns=TASK_COLUMNS):
+        return self.backend.fetch_page(after, limit, columns)
+
+    # rows changed and tombstones of tasks deleted after `since` (an updated_at watermark), up to
+    # `limit` of each, oldest first
+    def fetch_changes(self, since, limit=TASK_PAGE_SIZE, columns=TASK_COLUMNS):
+        return self.backend.fetch_changes(since, limit, columns)
+
+    # latest updated_at / deleted_at in this list, read before a full load
+    def fetch_watermark(self):
+        return self.backend.fetch_watermark()
+
+    def _changes(self):
+        return self if self.delta_sync else None
+
     def add_task(self, text, priority):
-        text = self.sanitize_input(text)
-        if not text:
-            raise ValueError("Task cannot be empty")
+        text = self._clean_text(text)
+        self._check_limit(1)
         try:
             task_priority = PRIORITY_MAPPING[priority]
-            response = supabase.table("tasks").insert({"text": text, "completed": False, "priority": task_priority}).execute()
-            return response.data[0]
+            saved = self.backend.insert([{"text": text, "completed": False, "priority": task_priority}])
         except Exception as ex:
-            if "duplicate key value" in str(ex):  # catch unique constraint error
-                raise ValueError("Task already exists")
-            raise Exception(f"Error adding task: {ex}")
+            self._raise_add_error(ex)
+        return self._task_added(saved[0])
 
     def update_task(self, task_id, text, priority, completed):
-        text = self.sanitize_input(text)
-        if not text:
-            raise ValueError("Task cannot be empty")
+        text = self._clean_text(text, task_id)
         try:
             new_priority = PRIORITY_MAPPING[priority]
-            supabase.table("tasks").update({"text": text, "priority": new_priority, "completed": completed}).eq("id", task_id).execute()
+            saved = self.backend.update([task_id], {"text": text, "priority": new_priority, "completed": completed})
+        except DuplicateTaskError:
+            raise
         except Exception as ex:
             raise Exception(f"Error updating task: {ex}")
+        return self._task_updated(task_id, saved)
+
+    # queue an update to go out with other updates in one bulk update, returns a Future of the saved
+    # row (see WriteCoalescer)
+    def queue_update(self, task_id, text, priority, completed):
+        text = self._clean_text(text, task_id)
+        row = {"id": task_id, "text": text, "priority": PRIORITY_MAPPING[priority], "completed": completed}
+        if self.user_id is not None:
+            row["user_id"] = self.user_id # sent through this user's backend
+        future = write_coalescer.submit(row)
+        future.add_done_callback(lambda f: self._queued_update_done(task_id, f))
+        return future
+
+    def _queued_update_done(self, task_id, future):
+        if future.exception() is not None or future.result() is None:
+            return # failed (the caller rolls back) or cancelled by a delete of the task
+        # a task deleted elsewhere before the flush is dropped like any update that finds no row
+        self._task_updated(task_id, [] if future.result() is MISSING else [future.result()])
 
     def delete_task(self, task_id):
+        write_coalescer.cancel(task_id)
         try:
-            supabase.table("tasks").delete().eq("id", task_id).execute()
+            self.backend.delete([task_id])
         except Exception as ex:
             raise Exception(f"Error deleting task: {ex}")
+        self._task_deleted(task_id)
+
+    # insert several tasks in one request; items are (text, priority) or (text, priority, completed)
+    def add_tasks(self, items):
+        rows = self._new_task_rows(items)
+        self._check_limit(len(rows))
+        try:
+            saved = self.backend.insert(rows)
+        except Exception as ex:
+            self._raise_add_error(ex)
+        return [self._task_added(task) for task in saved]
+
+    # the items whose text no task in the list has yet, compared as add_tasks would save it. one
+    # lookup per chunk of texts, so a batch of duplicates costs no rejected inserts
+    def new_items(self, items):
+        items = list(items)
+        texts = sanitize_many([item[0] for item in items])
+        try:
+            taken = self._existing_texts([text for text in texts if text])
+        except Exception as ex:
+            raise Exception(f"Error checking tasks: {ex}")
+        return [item for item, text in zip(items, texts) if text.lower() not in taken]
+
+    # set completion and/or priority on several tasks, returns the ids of the updated tasks
+    def update_tasks(self, task_ids, completed=None, priority=None):
+        fields = self._bulk_fields(completed, priority)
+        saved = []
+        try:
+            for chunk in chunked(task_ids):
+                saved.extend(self.backend.update(chunk, fields))
+        except Exception as ex:
+            raise Exception(f"Error updating tasks: {ex}")
+        return self._tasks_updated(task_ids, saved)
+
+    def delete_tasks(self, task_ids):
+        for task_id in task_ids:
+            write_coalescer.cancel(task_id)
+        try:
+            for chunk in chunked(task_ids):
+                self.backend.delete(chunk)
+        except Exception as ex:
+            raise Exception(f"Error deleting tasks: {ex}")
+        return self._tasks_deleted(task_ids)
+
+    # mark every incomplete task as done in one request
+    def complete_all_tasks(self):
+        try:
+            saved = self.backend.complete_all()
+        except Exception as ex:
+            raise Exception(f"Error updating tasks: {ex}")
+        return self._tasks_updated([task["id"] for task in saved], saved)
+
+    # delete every completed task in one request
+    def delete_completed_tasks(self):
+        try:
+            deleted = self.backend.delete_completed()
+        except Exception as ex:
+            raise Exception(f"Error deleting tasks: {ex}")
+        return self._tasks_deleted([task["id"] for task in deleted])
+
+    # shared by the sync and async models: validation and local bookkeeping around each write
+    def _clean_text(self, text, task_id=None):
+        text = self.sanitize_input(text, task_id)
+        if not text:
+            raise ValueError("Task cannot be empty")
+        self._check_unique(text, task_id)
+        return text
+
+    # reject a text another loaded task already has without the round-trip. the index is only trusted
+    # while the store is fresh: once it is stale, another process may have renamed or deleted that
+    # task, so the write goes ahead and the database's unique constraint decides, as it does for
+    # tasks past the loaded pages
+    def _check_unique(self, text, task_id=None):
+        owner = self.ids_by_text.get(text.lower())
+        if owner is not None and owner != task_id and self.store.is_fresh():
+            raise DuplicateTaskError()
+
+    def _existing_texts(self, texts):
+        return self.backend.existing_texts(texts)
+
+    # the list size is known locally once every page is loaded, otherwise counted by the backend at
+    # most once per store ttl (see TaskStore.known_size). sessions in other processes may add in
+    # between; with supabase the database enforces the cap (sql/008_tasks_list_limit.sql)
+    def _check_limit(self, adding):
+        if not self.task_limit:
+            return
+        size = len(self.tasks) if not self.has_more else self.store.known_size()
+        if size is None:
+            size = self.backend.count()
+            self.store.set_size(size)
+        if size + adding > self.task_limit:
+            raise TaskLimitError()
+
+    def _raise_add_error(self, ex):
+        if isinstance(ex, DuplicateTaskError) or "duplicate key value" in str(ex):  # catch unique constraint error
+            raise DuplicateTaskError()
+        if "task limit reached" in str(ex):  # the list size trigger
+            raise TaskLimitError()
+        raise Exception(f"Error adding task: {ex}")
+
+    def _new_task_rows(self, items):
+        items = list(items)
+        rows, seen = [], set()
+        for text, (_, priority, *completed) in zip(sanitize_many([item[0] for item in items]), items):
+            if not text:
+                raise ValueError("Task cannot be empty")
+            if text.lower() in seen:  # would trip the unique constraint
+                raise DuplicateTaskError()
+            self._check_unique(text)
+            seen.add(text.lower())
+            rows.append({"text": text, "completed": bool(completed and completed[0]), "priority": PRIORITY_MAPPING[priority]})
+        return rows
+
+    def _bulk_fields(self, completed, priority):
+        fields = {}
+        if completed is not None:
+            fields["completed"] = completed
+        if priority is not None:
+            fields["priority"] = PRIORITY_MAPPING[priority]
+        if not fields:
+            raise ValueError("Nothing to update")
+        return fields
+
+    def _tasks_updated(self, task_ids, saved):
+        saved_by_id = {task["id"]: task for task in saved}
+        for task_id in task_ids:
+            self._task_updated(task_id, [saved_by_id[task_id]] if task_id in saved_by_id else [])
+        return list(task_ids)
+
+    def _tasks_deleted(self, task_ids):
+        for task_id in task_ids:
+            self._task_deleted(task_id)
+        return list(task_ids)
+
+    def _task_added(self, task):
+        self.store.put(task)
+        self.store.resize(1)
+        self._place_task(task)
+        return task
+
+    def _task_updated(self, task_id, rows):
+        if not rows:  # row no longer exists: deleted by another session or process
+            self._task_deleted(task_id)
+            return None
+        task = rows[0]
+        self.store.put(task)
+        with self.lock:
+            self._remove_task(task_id)
+            self._place_task(task)
+        return task
+
+    def _task_deleted(self, task_id):
+        self.store.discard(task_id)
+        self.store.resize(-1)
+        self._remove_task(task_id)
+
+    # subscribe to task changes made by any session; listener(event_type, record, old_record)
+    def subscribe(self, listener):
+        task_feed.subscribe(listener)
+        self.backend.start_feed()
+
+    def unsubscribe(self, listener):
+        task_feed.unsubscribe(listener)
+
+    # whether a change from the feed belongs to this model's list
+    def owns_change(self, event_type, record, old_record):
+        return change_for_user(self.user_id, event_type, record, old_record)
+
+    # apply a realtime change to this session's task list, returns the affected task id
+    def apply_change(self, event_type, record, old_record):
+        if event_type == "DELETE":
+            write_coalescer.cancel(old_record["id"])
+            self._remove_task(old_record["id"])
+            return old_record["id"]
+        with self.lock:
+            self._remove_task(record["id"])
+            self._place_task(record)
+        return record["id"]
+
+    # ids of the tasks placed or removed since the last call, plus task_ids. a caller that lays out
+    # its rows from the list under self.lock syncs these, so changes made on other threads since its
+    # last layout are not missed
+    def take_changed(self, task_ids=()):
+        with self.lock:
+            changed, self.changed_ids = self.changed_ids.union(task_ids), set()
+            return changed
+
+    # loaded task by id, or None
+    def get_task(self, task_id):
+        return self.tasks_by_id.get(task_id)
+
+    # position of a task in the sorted task list, or None if it is not loaded
+    def position_of(self, task_id):
+        with self.lock:
+            task = self.tasks_by_id.get(task_id)
+            if task is None:
+                return None
+            return insert_position(self.tasks, task_sort_key(task))
+
+    # ids of the loaded tasks with the given completion and/or priority (text, e.g. "high")
+    def task_ids_where(self, completed=None, priority=None):
+        return self._bucket_ids(completed, PRIORITY_MAPPING[priority] if priority is not None else None)
+
+    def _bucket_ids(self, completed, priority):
+        with self.lock:
+            return {
+                task_id
+                for (bucket_completed, bucket_priority), ids in self.buckets.items()
+                if (completed is None or bucket_completed == completed) and (priority is None or bucket_priority == priority)
+                for task_id in ids
+            }
+
+    # tasks whose words start with every word of the query (see app/model/search.py) and that have
+    # the given completion and/or priority (text), in display order. searched in memory once every
+    # page is loaded, otherwise by the backend (postgres full-text search for supabase)
+    def search(self, query="", completed=None, priority=None, limit=SEARCH_LIMIT):
+        tokens, priority = tokenize(query), PRIORITY_MAPPING[priority] if priority is not None else None
+        if not self.has_more:
+            return self._search_loaded(tokens, completed, priority, limit)
+        try:
+            return self.backend.search(tokens, completed, priority, limit, TASK_COLUMNS)
+        except Exception as ex:
+            raise Exception(f"Error searching tasks: {ex}")
+
+    # the loaded tasks only: results past the loaded pages are missing until the database is back
+    def _cached_search(self, query="", completed=None, priority=None, limit=SEARCH_LIMIT):
+        return self._search_loaded(tokenize(query), completed, PRIORITY_MAPPING[priority] if priority is not None else None, limit)
+
+    def _search_loaded(self, tokens, completed, priority, limit):
+        with self.lock:
+            if not tokens and completed is None and priority is None:
+                return self.tasks[:limit]
+            if tokens:
+                if self.search_index is None:
+                    self.search_index = TaskSearchIndex()
+                    self.search_index.rebuild(self.tasks)
+                ids = self.search_index.match(tokens)
+                if completed is not None or priority is not None:
+                    ids &= self._bucket_ids(completed, priority)
+            else:
+                ids = self._bucket_ids(completed, priority)
+            if len(ids) * 8 < len(self.tasks):
+                # few matches: order just those
+                return heapq.nsmallest(limit, (self.tasks_by_id[task_id] for task_id in ids), key=task_sort_key)
+            # many matches: the task list is already in order, stop after `limit` of them
+            return list(itertools.islice((task for task in self.tasks if task["id"] in ids), limit))
+
+    # replace the loaded tasks and rebuild the indexes
+    def _set_tasks(self, tasks):
+        with self.lock:
+            self.tasks = tasks
+            self.tasks_by_id = {}
+            self.buckets = {}
+            self.ids_by_text = {}
+            self.search_index = None
+            for task in tasks:
+                self._index_task(task)
+            return tasks
+
+    def _index_task(self, task):
+        self.tasks_by_id[task["id"]] = task
+        self.buckets.setdefault((task["completed"], task["priority"]), set()).add(task["id"])
+        self.ids_by_text[task["text"].lower()] = task["id"]
+        if self.search_index is not None:
+            self.search_index.add(task)
+
+    # keep self.tasks sorted without re-querying after a mutation
+    def _place_task(self, task):
+        with self.lock:
+            self.changed_ids.add(task["id"])
+            if place_task(self.tasks, task, not self.has_more):
+                self._index_task(task)
+
+    def _remove_task(self, task_id):
+        with self.lock:
+            task = self.tasks_by_id.pop(task_id, None)
+            if task is None:
+                return
+            self.changed_ids.add(task_id)
+            del self.tasks[insert_position(self.tasks, task_sort_key(task))]
+            bucket = self.buckets[(task["completed"], task["priority"])]
+            bucket.discard(task_id)
+            if not bucket:
+                del self.buckets[(task["completed"], task["priority"])]
+            if self.ids_by_text.get(task["text"].lower()) == task_id:
+                del self.ids_by_text[task["text"].lower()]
+            if self.search_index is not None:
+                self.search_index.remove(task_id)
+
+    # the text as update_task would save it; raises the same ValueError / DuplicateTaskError it would
+    # (used to reject an optimistic edit before it is applied)
+    def validate_text(self, text, task_id=None):
+        return self._clean_text(text, task_id)
 
-    # sanitize user input using bleach to protect against attacks
-    def sanitize_input(self, user_input):
-        return bleach.clean(user_input)
\ No newline at end of file
+    # sanitize user input using bleach to protect against attacks. text equal to the task's saved
+    # text (e.g. a toggle sending the label back) was already sanitized and is not escaped again
+    def sanitize_input(self, user_input, task_id=None):
+        task = self.tasks_by_id.get(task_id) if task_id is not None else None
+        if task is not None and task["text"] == user_input:
+            return user_input
+        return sanitize(user_input)
@@ -0,0 +1,94 @@
+# app/model/offline_model.py
+from concurrent.futures import Future
+from app.model.model import TaskModel, PRIORITY_MAPPING, TASK_PAGE_SIZE, TASK_COLUMNS, MODEL_UNTIMED, SEARCH_LIMIT
+from app.model.search import tokenize
+from app.model.sync import get_sync_engine
+from app import metrics
+
+@metrics.instrumented("model", skip=MODEL_UNTIMED)
+class OfflineTaskModel(TaskModel):
+    """TaskModel that reads and writes a local SQLite replica (app/model/replica.py).
+
+    Loads and writes never wait on supabase: local changes are recorded in the replica's outbox and
+    pushed by the sync engine in the background, which also pulls changes made elsewhere.
+    """
+
+    def __init__(self, page_size=TASK_PAGE_SIZE, engine=None):
+        super().__init__(page_size)
+        self.engine = engine or get_sync_engine()
+        self.replica = self.engine.replica
+        self.breaker = None # the replica answers even while supabase is down
+        self.delta_sync = False # the store reloads from the replica, which the sync engine keeps current
+
+    # local changes reach every session through the feed even while the realtime connection is down
+    def subscribe(self, listener):
+        try:
+            super().subscribe(listener)
+        except Exception as ex:
+            print("Error starting task change feed:", ex)
+
+    def fetch_page(self, after=None, limit=TASK_PAGE_SIZE, columns=TASK_COLUMNS):
+        if self.replica.watermark() is None:
+            # nothing synced yet (first run): fill the replica before reading it
+            try:
+                self.engine.sync_now()
+            except Exception as ex:
+                print("Error syncing tasks:", ex)
+        return self.replica.fetch_page(after, limit)
+
+    def search(self, query="", completed=None, priority=None, limit=SEARCH_LIMIT):
+        if not self.has_more:
+            return super().search(query, completed, priority, limit)
+        return self.replica.search(tokenize(query), completed, PRIORITY_MAPPING[priority] if priority is not None else None, limit)
+
+    def add_task(self, text, priority):
+        text = self._clean_text(text)
+        task = self.replica.add_local([{"text": text, "completed": False, "priority": PRIORITY_MAPPING[priority]}])[0]
+        self.engine.local_change("INSERT", task)
+        return self._task_added(task)
+
+    def update_task(self, task_id, text, priority, completed):
+        text = self._clean_text(text, task_id)
+        saved = self.replica.update_local([task_id], {"text": text, "priority": PRIORITY_MAPPING[priority], "completed": completed})
+        for task in saved:
+            self.engine.local_change("UPDATE", task)
+        return self._task_updated(task_id, saved)
+
+    # local writes are already cheap, so there is nothing to coalesce
+    def queue_update(self, task_id, text, priority, completed):
+        future = Future()
+        try:
+            future.set_result(self.update_task(task_id, text, priority, completed))
+        except Exception as ex:
+            future.set_exception(ex)
+        return future
+
+    def delete_task(self, task_id):
+        self.delete_tasks([task_id])
+
+    def add_tasks(self, items):
+        tasks = self.replica.add_local(self._new_task_rows(items))
+        for task in tasks:
+            self.engine.local_change("INSERT", task)
+        return [self._task_added(task) for task in tasks]
+
+    def _existing_texts(self, texts):
+        return self.replica.existing_texts(texts)
+
+    def update_tasks(self, task_ids, completed=None, priority=None):
+        saved = self.replica.update_local(task_ids, self._bulk_fields(completed, priority))
+        for task in saved:
+            self.engine.local_change("UPDATE", task)
+        return self._tasks_updated(task_ids, saved)
+
+    def delete_tasks(self, task_ids):
+        self.replica.delete_local(task_ids)
+        for task_id in task_ids:
+            self.engine.local_change("DELETE", None, {"id": task_id})
+        return self._tasks_deleted(task_ids)
+
+    def complete_all_tasks(self):
+        return self.update_tasks(self.replica.ids_where(completed=False), completed=True)
+
+    def delete_completed_tasks(self):
+        return self.delete_tasks(self.replica.ids_where(completed=True))
@@ -0,0 +1,254 @@
+# app/model/replica.py
+import itertools
+import os
+import sqlite3
+import threading
+from app.model.backends.base import DuplicateTaskError
+from app.model.search import matches
+
+# where the local copy of the tasks table is kept
+TASK_REPLICA_PATH = os.getenv("TASK_REPLICA_PATH", os.path.expanduser("~/.cache/flettaskmaster/tasks.db"))
+
+# tasks created locally get ids from this range until the insert reaches supabase and the real id
+# comes back. they sort after existing ids, like the server-assigned id will
+TEMP_ID_BASE = 2 ** 62
+
+SCHEMA = """
+create table if not exists tasks (
+    id integer primary key,
+    text text not null,
+    text_key text not null, -- lower(text), for the case-insensitive duplicate check
+    priority integer not null,
+    completed integer not null,
+    updated_at text
+);
+create index if not exists tasks_order_idx on tasks (completed, priority, id);
+create index if not exists tasks_text_key_idx on tasks (text_key);
+
+-- local changes not yet sent to supabase, at most one per task: insert, update or delete.
+-- the row itself is read from tasks when it is pushed, so repeated edits go out once
+create table if not exists outbox (
+    task_id integer primary key,
+    op text not null,
+    seq integer not null
+);
+
+create table if not exists meta (
+    key text primary key,
+    value text
+);
+"""
+
+def is_temp_id(task_id):
+    return task_id >= TEMP_ID_BASE
+
+def _to_task(row):
+    return {"id": row[0], "text": row[1], "priority": row[2], "completed": bool(row[3])}
+
+class TaskReplica:
+    """SQLite copy of the tasks table plus an outbox of local changes waiting to be pushed."""
+
+    def __init__(self, path=TASK_REPLICA_PATH):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.RLock()
+        with self.lock, self.db:
+            self.db.execute("pragma journal_mode=wal")
+            self.db.executescript(SCHEMA)
+            last_seq = self.db.execute("select coalesce(max(seq), 0) from outbox").fetchone()[0]
+        self.seq = itertools.count(last_seq + 1)
+
+    # reads, in the same order and with the same keyset pagination as TaskModel.fetch_page
+    def fetch_page(self, after, limit):
+        with self.lock:
+            if after is None:
+                rows = self.db.execute(
+                    "select id, text, priority, completed from tasks order by completed, priority, id limit ?", (limit,))
+            else:
+                rows = self.db.execute(
+                    "select id, text, priority, completed from tasks where (completed, priority, id) > (?, ?, ?) "
+                    "order by completed, priority, id limit ?",
+                    (int(after["completed"]), after["priority"], after["id"], limit))
+            return [_to_task(row) for row in rows.fetchall()]
+
+    def get(self, task_id):
+        with self.lock:
+            row = self.db.execute("select id, text, priority, completed from tasks where id = ?", (task_id,)).fetchone()
+        return _to_task(row) if row else None
+
+    # same rules as TaskBackend.search
+    def search(self, query_tokens, completed, priority, limit):
+        conditions, values = [], []
+        if completed is not None:
+            conditions.append("completed = ?")
+            values.append(int(completed))
+        if priority is not None:
+            conditions.append("priority = ?")
+            values.append(priority)
+        where = f"where {' and '.join(conditions)} " if conditions else ""
+        found = []
+        with self.lock:
+            for row in self.db.execute(f"select id, text, priority, completed from tasks {where}order by completed, priority, id", values):
+                if len(found) == limit:
+                    break
+                if matches(row[1], query_tokens):
+                    found.append(_to_task(row))
+        return found
+
+    # lower(text) of the given texts that a task already has
+    def existing_texts(self, texts):
+        keys = list({text.lower() for text in texts})
+        found = set()
+        with self.lock:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ", ".join("?" * len(chunk))
+                found.update(row[0] for row in self.db.execute(f"select text_key from tasks where text_key in ({placeholders})", chunk))
+        return found
+
+    def ids_where(self, completed):
+        with self.lock:
+            return [row[0] for row in self.db.execute("select id from tasks where completed = ?", (int(completed),))]
+
+    # local changes. each one is written to tasks and recorded in the outbox in one transaction
+    def add_local(self, rows):
+        with self.lock, self.db:
+            for row in rows:
+                self._check_unique(row["text"])
+            next_id = max(self.db.execute("select coalesce(max(id), 0) + 1 from tasks").fetchone()[0], TEMP_ID_BASE)
+            tasks = []
+            for task_id, row in enumerate(rows, next_id):
+                task = {"id": task_id, "text": row["text"], "priority": row["priority"], "completed": row["completed"]}
+                self._write(task, None)
+                self._record(task_id, "insert")
+                tasks.append(task)
+            return tasks
+
+    # apply fields to the given tasks, returns the updated tasks (missing ids are skipped)
+    def update_local(self, task_ids, fields):
+        with self.lock, self.db:
+            saved = []
+            for task_id in task_ids:
+                task = self.get(task_id)
+                if task is None:
+                    continue
+                if "text" in fields and fields["text"].lower() != task["text"].lower():
+                    self._check_unique(fields["text"])
+                task.update(fields)
+                self._write(task, None)
+                self._record(task_id, "update")
+                saved.append(task)
+            return saved
+
+    def delete_local(self, task_ids):
+        with self.lock, self.db:
+            for task_id in task_ids:
+                if self.db.execute("delete from tasks where id = ?", (task_id,)).rowcount:
+                    self._record(task_id, "delete")
+            return list(task_ids)
+
+    # changes received from supabase. tasks with a pending local change are left alone: the local
+    # change wins and overwrites the server row when it is pushed. returns True if the replica changed
+    def apply_remote(self, task):
+        with self.lock, self.db:
+            if self._pending_op(task["id"]) is not None:
+                return False
+            if self.get(task["id"]) == {k: task[k] for k in ("id", "text", "priority", "completed")}:
+                return False
+            self._write(task, task.get("updated_at"))
+            return True
+
+    def remove_remote(self, task_id):
+        with self.lock, self.db:
+            if self._pending_op(task_id) is not None:
+                return False
+            return self.db.execute("delete from tasks where id = ?", (task_id,)).rowcount > 0
+
+    # outbox, oldest first: [(task_id, op, seq)]
+    def pending(self, limit=1000):
+        with self.lock:
+            return self.db.execute("select task_id, op, seq from outbox order by seq limit ?", (limit,)).fetchall()
+
+    def pending_count(self):
+        with self.lock:
+            return self.db.execute("select count(*) from outbox").fetchone()[0]
+
+    # a pushed update/delete was acknowledged. the outbox entry is only cleared if the task was not
+    # changed again while the request was in flight; saved is the row as stored by supabase
+    def push_done(self, task_id, seq, saved=None):
+        with self.lock, self.db:
+            cleared = self.db.execute("delete from outbox where task_id = ? and seq = ?", (task_id, seq)).rowcount > 0
+            if cleared and saved is not None:
+                self._write(saved, saved.get("updated_at"))
+            return cleared
+
+    # a pushed insert came back with its real id: move the task over to it. returns the task as it
+    # now stands, or None if it was deleted locally while the insert was in flight (the new row is
+    # then queued for deletion)
+    def insert_done(self, temp_id, seq, saved):
+        with self.lock, self.db:
+            local = self.get(temp_id)
+            entry = self.db.execute("select seq from outbox where task_id = ?", (temp_id,)).fetchone()
+            self.db.execute("delete from outbox where task_id = ?", (temp_id,))
+            if local is None:
+                self._record(saved["id"], "delete")
+                return None
+            self.db.execute("delete from tasks where id = ?", (temp_id,))
+            if entry is not None and entry[0] != seq:
+                # edited while in flight: keep the local fields and push them as an update
+                task = dict(local, id=saved["id"])
+                self._write(task, saved.get("updated_at"))
+                self._record(task["id"], "update")
+                return task
+            self._write(saved, saved.get("updated_at"))
+            return saved
+
+    # a pushed change was rejected (e.g. duplicate text): forget it. a rejected insert removes the task
+    def drop_pending(self, task_id):
+        with self.lock, self.db:
+            self.db.execute("delete from outbox where task_id = ?", (task_id,))
+            if is_temp_id(task_id):
+                self.db.execute("delete from tasks where id = ?", (task_id,))
+
+    def server_ids(self):
+        with self.lock:
+            return {row[0] for row in self.db.execute("select id from tasks where id < ?", (TEMP_ID_BASE,))}
+
+    # sync watermark: (updated_at, id) of the newest row pulled from supabase, None before the first sync
+    def watermark(self):
+        with self.lock:
+            row = self.db.execute("select value from meta where key = 'watermark'").fetchone()
+        if row is None:
+            return None
+        updated_at, _, task_id = row[0].rpartition("|")
+        return updated_at, int(task_id)
+
+    def set_watermark(self, updated_at, task_id):
+        with self.lock, self.db:
+            self.db.execute("insert or replace into meta (key, value) values ('watermark', ?)", (f"{updated_at}|{task_id}",))
+
+    def _check_unique(self, text):
+        if self.db.execute("select 1 from tasks where text_key = ?", (text.lower(),)).fetchone():
+            raise DuplicateTaskError()
+
+    def _write(self, task, updated_at):
+        self.db.execute(
+            "insert or replace into tasks (id, text, text_key, priority, completed, updated_at) values (?, ?, ?, ?, ?, "
+            "coalesce(?, (select updated_at from tasks where id = ?)))",
+            (task["id"], task["text"], task["text"].lower(), task["priority"], int(task["completed"]), updated_at, task["id"]))
+
+    def _pending_op(self, task_id):
+        row = self.db.execute("select op from outbox where task_id = ?", (task_id,)).fetchone()
+        return row[0] if row else None
+
+    # fold a local change into the task's outbox entry
+    def _record(self, task_id, op):
+        current = self._pending_op(task_id)
+        if op == "delete" and current == "insert":
+            # never reached supabase, nothing to send
+            self.db.execute("delete from outbox where task_id = ?", (task_id,))
+            return
+        if op == "update" and current in ("insert", "update"):
+            op = current # the pushed row is read from tasks, so the pending entry already covers it
+        self.db.execute("insert or replace into outbox (task_id, op, seq) values (?, ?, ?)", (task_id, op, next(self.seq)))
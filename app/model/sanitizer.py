@@ -0,0 +1,32 @@
+# app/model/sanitizer.py
+import functools
+import os
+import re
+import bleach
+
+# number of distinct strings whose cleaned form is remembered
+SANITIZE_CACHE_SIZE = int(os.getenv("SANITIZE_CACHE_SIZE", "4096"))
+
+# the only characters bleach.clean changes in plain text: markup (&, <, >) and the control
+# characters it strips or normalizes (everything below 0x20 except tab and newline). text without
+# any of them comes back unchanged, so it can skip the HTML parser
+_UNSAFE = re.compile(r"[\x00-\x08\x0b-\x1f&<>]")
+
+@functools.lru_cache(maxsize=SANITIZE_CACHE_SIZE)
+def _clean(text):
+    return bleach.clean(text)
+
+def sanitize(text):
+    """Same result as bleach.clean(text), without parsing text that has nothing to escape."""
+    if not _UNSAFE.search(text):
+        return text
+    return _clean(text)
+
+def sanitize_many(texts):
+    """Sanitize a batch (e.g. an import), cleaning each distinct string once."""
+    texts = list(texts)
+    cleaned = {text: sanitize(text) for text in set(texts)}
+    return [cleaned[text] for text in texts]
+
+def cache_info():
+    return _clean.cache_info()
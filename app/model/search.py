@@ -0,0 +1,79 @@
+# app/model/search.py
+import bisect
+import re
+
+# words as postgres' text search parser splits them (underscores separate words too)
+_WORD = re.compile(r"[^\W_]+")
+
+def tokenize(text):
+    return _WORD.findall(text.lower())
+
+# a task matches when every query word is the start of one of its words ("gro mil" finds
+# "Groceries: milk"), the same rule as the tsquery built by to_tsquery() below
+def matches(text, query_tokens):
+    words = tokenize(text)
+    return all(any(word.startswith(token) for word in words) for token in query_tokens)
+
+# prefix tsquery for the tasks.search column (see sql/004_tasks_search.sql), e.g. "gro:* & mil:*"
+def to_tsquery(query_tokens):
+    return " & ".join(f"{token}:*" for token in query_tokens)
+
+class TaskSearchIndex:
+    """Inverted index over task text: word -> ids of the tasks containing it, plus the sorted
+    vocabulary so a query word is looked up as a prefix range instead of a scan over every task."""
+
+    # below this many candidates the remaining query words are checked per task instead of looked up
+    VERIFY_BELOW = 256
+
+    def __init__(self):
+        self.postings = {} # word -> set of task ids
+        self.vocabulary = [] # sorted words
+        self.words_by_id = {} # task id -> its words, to unindex it without the old text
+
+    def rebuild(self, tasks):
+        self.postings, self.words_by_id = {}, {}
+        for task in tasks:
+            words = set(tokenize(task["text"]))
+            self.words_by_id[task["id"]] = words
+            for word in words:
+                self.postings.setdefault(word, set()).add(task["id"])
+        self.vocabulary = sorted(self.postings)
+
+    def add(self, task):
+        words = set(tokenize(task["text"]))
+        self.words_by_id[task["id"]] = words
+        for word in words:
+            ids = self.postings.get(word)
+            if ids is None:
+                ids = self.postings[word] = set()
+                bisect.insort(self.vocabulary, word)
+            ids.add(task["id"])
+
+    def remove(self, task_id):
+        for word in self.words_by_id.pop(task_id, ()):
+            ids = self.postings[word]
+            ids.discard(task_id)
+            if not ids:
+                del self.postings[word]
+                del self.vocabulary[bisect.bisect_left(self.vocabulary, word)]
+
+    # ids of the tasks matching every query word (as a prefix)
+    def match(self, query_tokens):
+        # longest words first: they tend to match the fewest tasks
+        tokens = sorted(set(query_tokens), key=len, reverse=True)
+        ids = self._with_prefix(tokens[0])
+        for i, token in enumerate(tokens[1:], 1):
+            if len(ids) < self.VERIFY_BELOW:
+                rest = tokens[i:]
+                return {task_id for task_id in ids if all(any(word.startswith(t) for word in self.words_by_id[task_id]) for t in rest)}
+            ids = ids & self._with_prefix(token)
+        return ids
+
+    def _with_prefix(self, prefix):
+        ids = set()
+        for i in range(bisect.bisect_left(self.vocabulary, prefix), len(self.vocabulary)):
+            word = self.vocabulary[i]
+            if not word.startswith(prefix):
+                break
+            ids |= self.postings[word]
+        return ids
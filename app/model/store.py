@@ -0,0 +1,400 @@
+# app/model/store.py
+import asyncio
+import collections
+import datetime
+import os
+import threading
+import time
+import weakref
+
+# seconds a loaded task list is served from memory before the next load re-queries supabase.
+# 0 disables caching, a negative value keeps the list until it is explicitly invalidated
+TASK_STORE_TTL = float(os.getenv("TASK_STORE_TTL", "30"))
+# per-user task lists kept in memory once their sessions have closed; the least recently used
+# user's list is dropped first. lists of open sessions are always kept
+TASK_STORE_USERS = int(os.getenv("TASK_STORE_USERS", "1000"))
+# refresh a stale list by fetching only the rows changed and deleted since it was loaded
+# (sql/006_task_tombstones.sql), instead of loading it again. more than TASK_DELTA_MAX_CHANGES
+# changes, or a list last loaded in full over TASK_DELTA_MAX_AGE seconds ago (tombstones may have
+# been purged since), still reloads it
+TASK_DELTA_SYNC = os.getenv("TASK_DELTA_SYNC", "false").lower() == "true"
+TASK_DELTA_MAX_CHANGES = int(os.getenv("TASK_DELTA_MAX_CHANGES", "500"))
+TASK_DELTA_MAX_AGE = float(os.getenv("TASK_DELTA_MAX_AGE", "86400"))
+# changes are re-read from this many seconds before the watermark: updated_at is set when a row is
+# written, and a transaction committing late can make it visible after later ones
+TASK_DELTA_OVERLAP = float(os.getenv("TASK_DELTA_OVERLAP", "5"))
+
+# display order of tasks: incomplete first, then by priority, then by id so ties stay stable
+def task_sort_key(task):
+    return (task["completed"], task["priority"], task["id"])
+
+# binary search for the position a task with the given sort key belongs at
+def insert_position(tasks, key):
+    lo, hi = 0, len(tasks)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if task_sort_key(tasks[mid]) < key:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+# insert a task into a sorted prefix of the table. tasks sorting after the last loaded row belong to
+# a page that has not been fetched yet, so they are skipped unless the prefix is the whole table
+def place_task(tasks, task, complete):
+    key = task_sort_key(task)
+    if not complete and (not tasks or key > task_sort_key(tasks[-1])):
+        return False
+    tasks.insert(insert_position(tasks, key), task)
+    return True
+
+# updated_at / deleted_at values as datetimes: postgres trims trailing zeros from the fraction, so
+# the strings do not compare in time order
+def parse_time(value):
+    return datetime.datetime.fromisoformat(value)
+
+def later_time(a, b):
+    if a is None or b is None:
+        return a or b
+    return a if parse_time(a) >= parse_time(b) else b
+
+class TaskStore:
+    """In-process copy of the tasks table shared by every session, filled one page at a time.
+
+    With delta sync, a stale list is brought up to date from `changes` (the model): its
+    fetch_watermark() gives the latest change time before a full load, and fetch_changes(since,
+    limit) the rows changed and tombstones of tasks deleted after it.
+    """
+
+    def __init__(self, ttl=TASK_STORE_TTL):
+        self.ttl = ttl
+        self.lock = threading.RLock() # held only to read or swap in state, never across a query
+        self.loading = None # set (an Event) while one caller fetches for everyone
+        self.pending = None # tasks written / ids deleted while loading, replayed onto what it fetched
+        self.generation = 0 # bumped by invalidate
+        self.size = None # tasks in the list when last counted, adjusted by this process's adds and deletes since
+        self.sized_at = 0.0
+        self.tasks = None # sorted prefix of the table, None until first load
+        self.by_id = {} # id -> task in self.tasks
+        self.complete = False # True once the last page has been fetched
+        self.loaded_at = 0.0
+        self.watermark = None # latest updated_at / deleted_at merged into the list (delta sync)
+        self.full_loaded_at = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+
+    def is_fresh(self):
+        if self.tasks is None or self.ttl == 0:
+            return False
+        return self.ttl < 0 or time.monotonic() - self.loaded_at < self.ttl
+
+    # returns (first `count` tasks, has_more). missing pages are fetched with fetch_page(after, limit).
+    # one caller at a time fetches, without holding the lock; concurrent callers wait for its load
+    # and are served from it, so sessions connecting at the same time share the same queries
+    def get_tasks(self, fetch_page, count, page_size, changes=None):
+        fetched = False
+        while True:
+            load, loading, result = self._claim(count, changes, fetched)
+            if result is not None:
+                return result
+            if loading is not None:
+                loading.wait()
+                continue
+            try:
+                if not self._delta(load, changes.fetch_changes if load.since is not None else None):
+                    if load.after is None and changes is not None:
+                        self._watermark(load, changes.fetch_watermark)
+                    while load.needs_page(count):
+                        load.add_page(fetch_page(load.last(), page_size), page_size)
+            except Exception:
+                self._release(None)
+                raise
+            self._release(load)
+            fetched = True
+
+    # same as get_tasks for async callers; fetch_page is a coroutine function. a load another caller
+    # is fetching is waited for off the event loop
+    async def get_tasks_async(self, fetch_page, count, page_size, changes=None):
+        fetched = False
+        while True:
+            load, loading, result = self._claim(count, changes, fetched)
+            if result is not None:
+                return result
+            if loading is not None:
+                await asyncio.to_thread(loading.wait)
+                continue
+            try:
+                if not await self._delta_async(load, changes.fetch_changes if load.since is not None else None):
+                    if load.after is None and changes is not None:
+                        await self._watermark_async(load, changes.fetch_watermark)
+                    while load.needs_page(count):
+                        load.add_page(await fetch_page(load.last(), page_size), page_size)
+            except Exception:
+                self._release(None)
+                raise
+            self._release(load)
+            fetched = True
+
+    # fetch the changes since load.since with fetch_changes (None: no delta to try), True if they are
+    # merged instead of reloading the list. a failed query (no task_tombstones table, sql/006) also
+    # reloads it, as does a failed watermark query, which leaves the next refresh without a watermark
+    def _delta(self, load, fetch_changes):
+        try:
+            return fetch_changes is not None and load.use_delta(*fetch_changes(load.since, TASK_DELTA_MAX_CHANGES))
+        except Exception as ex:
+            print(f"Error fetching task changes, reloading the list: {ex}")
+            return False
+
+    async def _delta_async(self, load, fetch_changes):
+        try:
+            return fetch_changes is not None and load.use_delta(*await fetch_changes(load.since, TASK_DELTA_MAX_CHANGES))
+        except Exception as ex:
+            print(f"Error fetching task changes, reloading the list: {ex}")
+            return False
+
+    def _watermark(self, load, fetch_watermark):
+        try:
+            load.set_watermark(fetch_watermark())
+        except Exception as ex:
+            print(f"Error fetching the task watermark: {ex}")
+
+    async def _watermark_async(self, load, fetch_watermark):
+        try:
+            load.set_watermark(await fetch_watermark())
+        except Exception as ex:
+            print(f"Error fetching the task watermark: {ex}")
+
+    # the last loaded list, however old, or None if nothing was ever loaded. served while the
+    # database is unreachable (see app/model/breaker.py)
+    def cached(self, count):
+        with self.lock:
+            if self.tasks is None or not self.tasks and not self.complete:
+                return None
+            return self.tasks[:count], len(self.tasks) > count or not self.complete
+
+    # under the lock: (None, None, result) if the list can be served as is, else (load, None, None)
+    # for a load this caller must fetch, or (None, event, None) while another caller's load is running
+    def _claim(self, count, changes, fetched):
+        with self.lock:
+            if self.loading is not None:
+                return None, self.loading, None
+            # a list this caller just loaded is served even with caching off
+            fresh = self.is_fresh() or fetched and self.tasks is not None
+            if fresh and (len(self.tasks) >= count or self.complete):
+                return None, None, self._finish_read(count, fetched)
+            if fresh:
+                # more pages of the current list
+                load = _Load(self.generation, self.tasks[-1] if self.tasks else None, len(self.tasks))
+            else:
+                # reload, or bring the list up to date from its changes
+                load = _Load(self.generation, None, 0, self._since() if self._can_refresh(changes) else None)
+            self.loading = threading.Event()
+            self.pending = []
+            return load, None, None
+
+    # end a load (None if it failed, keeping the list as it was): swap in what it fetched, then
+    # replay the writes made while it was fetching, which its queries may have missed
+    def _release(self, load):
+        with self.lock:
+            pending, self.pending = self.pending, None
+            if load is not None and load.generation == self.generation:
+                if load.delta is not None:
+                    self._refresh(*load.delta)
+                elif load.after is None:
+                    self.tasks = load.rows
+                    self.by_id = {task["id"]: task for task in load.rows}
+                    self.complete = load.complete
+                    self.loaded_at = load.started
+                    self.watermark, self.full_loaded_at = load.watermark, load.watermark_at
+                else:
+                    self._add_page(load.rows, load.complete)
+                for task in pending:
+                    if isinstance(task, dict):
+                        self._put(task)
+                    else:
+                        self._remove(task)
+            self.loading.set()
+            self.loading = None
+
+    # append rows fetched after the tail the page load started from. a write may have removed that
+    # tail since, and the rows may repeat tasks already placed by a write
+    def _add_page(self, rows, complete):
+        tail = task_sort_key(self.tasks[-1]) if self.tasks else None
+        for task in rows:
+            if task["id"] not in self.by_id and (tail is None or task_sort_key(task) > tail):
+                self.tasks.append(task)
+                self.by_id[task["id"]] = task
+        self.complete = complete
+
+    def _can_refresh(self, changes):
+        return (changes is not None and self.tasks is not None and self.watermark is not None
+                and time.monotonic() - self.full_loaded_at < TASK_DELTA_MAX_AGE)
+
+    def _since(self):
+        try:
+            return (parse_time(self.watermark) - datetime.timedelta(seconds=TASK_DELTA_OVERLAP)).isoformat()
+        except ValueError:
+            return self.watermark
+
+    # merge a delta into the list
+    def _refresh(self, rows, deleted):
+        for tombstone in deleted:
+            self._remove(tombstone["id"])
+            self.watermark = later_time(self.watermark, tombstone["deleted_at"])
+        for row in rows:
+            self.watermark = later_time(self.watermark, row.pop("updated_at"))
+            self._put(row)
+        self.loaded_at = time.monotonic()
+        self.refreshes += 1
+
+    def _finish_read(self, count, fetched):
+        if fetched:
+            self.misses += 1
+        else:
+            self.hits += 1
+        has_more = len(self.tasks) > count or not self.complete
+        return self.tasks[:count], has_more
+
+    # write-through from the model after a successful insert/update
+    def put(self, task):
+        with self.lock:
+            if self.pending is not None:
+                self.pending.append(task)
+            if self.tasks is not None:
+                self._put(task)
+
+    # write-through from the model after a successful delete
+    def discard(self, task_id):
+        with self.lock:
+            if self.pending is not None:
+                self.pending.append(task_id)
+            if self.tasks is not None:
+                self._remove(task_id)
+
+    # number of tasks in the whole list without a query, or None: exact once every page is loaded,
+    # otherwise the last count() while it is younger than the ttl
+    def known_size(self):
+        with self.lock:
+            if self.tasks is not None and self.complete:
+                return len(self.tasks)
+            if self.size is not None and self.ttl != 0 and (self.ttl < 0 or time.monotonic() - self.sized_at < self.ttl):
+                return self.size
+            return None
+
+    def set_size(self, size):
+        with self.lock:
+            self.size, self.sized_at = size, time.monotonic()
+
+    # tasks added (positive) or deleted (negative) by this process. changes made elsewhere are picked
+    # up by the next count
+    def resize(self, change):
+        with self.lock:
+            if self.size is not None:
+                self.size = max(self.size + change, 0)
+
+    # a load running meanwhile is dropped instead of swapped in
+    def invalidate(self):
+        with self.lock:
+            self.tasks = None
+            self.by_id = {}
+            self.size = None
+            self.generation += 1
+
+    def stats(self):
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "refreshes": self.refreshes,
+                "size": len(self.tasks) if self.tasks is not None else 0,
+                "age": time.monotonic() - self.loaded_at if self.tasks is not None else None,
+            }
+
+    def _put(self, task):
+        self._remove(task["id"])
+        if place_task(self.tasks, task, self.complete):
+            self.by_id[task["id"]] = task
+
+    def _remove(self, task_id):
+        task = self.by_id.pop(task_id, None)
+        if task is not None:
+            del self.tasks[insert_position(self.tasks, task_sort_key(task))]
+
+class _Load:
+    """What one caller of get_tasks fetches with the lock released: rows after `after` (the first
+    page when None, replacing the list), or the changes since `since` (delta sync)."""
+
+    def __init__(self, generation, after, have, since=None):
+        self.generation = generation
+        self.after = after
+        self.have = have # tasks in the list before `after`
+        self.since = since
+        self.started = time.monotonic()
+        self.rows = []
+        self.complete = False
+        self.delta = None # (rows, tombstones) to merge instead of rows
+        self.watermark = None
+        self.watermark_at = 0.0
+
+    # keep a delta unless it has too many changes, in which case the list is reloaded instead
+    def use_delta(self, rows, deleted):
+        if len(rows) >= TASK_DELTA_MAX_CHANGES or len(deleted) >= TASK_DELTA_MAX_CHANGES:
+            return False
+        self.delta = (rows, deleted)
+        return True
+
+    # taken before the first page, so changes made while loading are fetched again
+    def set_watermark(self, watermark):
+        self.watermark, self.watermark_at = watermark, time.monotonic()
+
+    def needs_page(self, count):
+        return not self.complete and self.have + len(self.rows) < count
+
+    def last(self):
+        return self.rows[-1] if self.rows else self.after
+
+    def add_page(self, page, page_size):
+        self.rows.extend(page)
+        self.complete = len(page) < page_size
+
+# single store shared by all sessions in this process
+task_store = TaskStore()
+
+# user id -> TaskStore of every list in use. a store is held by its sessions' models and, for the
+# TASK_STORE_USERS most recently used lists, by _user_stores; once neither holds it, it is dropped
+_live_stores = weakref.WeakValueDictionary()
+_user_stores = collections.OrderedDict() # user id -> TaskStore, least recently used first
+_user_stores_lock = threading.Lock()
+
+# store of one user's task list, shared by that user's sessions (task_store for the shared list).
+# a list evicted from _user_stores while a session still uses it keeps its store, so every session
+# of a user shares one store and the change feed reaches it
+def store_for(user_id):
+    if user_id is None:
+        return task_store
+    with _user_stores_lock:
+        store = _live_stores.get(user_id)
+        if store is None:
+            store = _live_stores[user_id] = TaskStore()
+        _user_stores[user_id] = store
+        _user_stores.move_to_end(user_id)
+        if len(_user_stores) > TASK_STORE_USERS:
+            _user_stores.popitem(last=False)
+        return store
+
+# every store in use
+def all_stores():
+    with _user_stores_lock:
+        return [task_store, *_live_stores.values()]
+
+# stores a changed row belongs in: its user's store if loaded (rows without user_id are in the
+# shared list). a realtime delete carries only the id, so it is dropped from every store
+def stores_for_change(row, deleted=False):
+    if "user_id" not in row:
+        return all_stores() if deleted else [task_store]
+    if row["user_id"] is None:
+        return [task_store]
+    with _user_stores_lock:
+        store = _live_stores.get(row["user_id"])
+    return [store] if store is not None else []
@@ -0,0 +1,280 @@
+# app/model/sync.py
+import datetime
+import itertools
+import os
+import threading
+from app.model.changes import task_feed, change_for_user
+from app.model.backends import DuplicateTaskError
+from app.model.backends.supabase import SupabaseBackend, get_client, scoped
+from app.model.replica import TaskReplica, is_temp_id
+from app import metrics
+
+# seconds between background syncs (local changes also trigger one right away)
+SYNC_INTERVAL = float(os.getenv("SYNC_INTERVAL", "15"))
+# rows per pull / push request
+SYNC_BATCH_SIZE = int(os.getenv("SYNC_BATCH_SIZE", "500"))
+# pulls re-read rows this many seconds older than the watermark, so rows whose updated_at was set
+# by a transaction that committed after a later one are not skipped
+SYNC_OVERLAP = float(os.getenv("SYNC_OVERLAP", "5"))
+
+SYNC_COLUMNS = "id,text,priority,completed,updated_at"
+# watermark recorded after the first sync of an empty table
+EPOCH = "1970-01-01T00:00:00+00:00"
+
+# why supabase refused pushed rows: a text another task has, or a list at its size cap
+# (sql/008_tasks_list_limit.sql). None for other errors, which are retried
+def _rejection(ex):
+    if isinstance(ex, DuplicateTaskError):
+        return "it already exists"
+    if "task limit reached" in str(ex):
+        return "the task list is full"
+    return None
+
+class SyncEngine:
+    """Keeps a TaskReplica and the supabase tasks table in step from a background thread.
+
+    Push: outbox entries go out oldest first, consecutive entries of the same kind in one request.
+    Pull: rows changed since the watermark (updated_at, id) are copied into the replica. A task
+    with a local change still in the outbox keeps the local version; once pushed, the row supabase
+    stores is the one kept (last writer wins). Changes that reach the replica are published to
+    every session through the task feed.
+
+    The replica holds one user's list (user_id None: the shared list). Pulls, pushes and the feed
+    are scoped to it like the online backends, so other users' tasks never reach it.
+    """
+
+    def __init__(self, replica, interval=SYNC_INTERVAL, batch_size=SYNC_BATCH_SIZE, user_id=None):
+        self.replica = replica
+        self.user_id = user_id
+        self.backend = SupabaseBackend(user_id) # writes go through the same queries as the online model
+        self.interval = interval
+        self.batch_size = batch_size
+        self.sync_lock = threading.Lock() # one push/pull at a time
+        self.wake_event = threading.Event()
+        self.thread = None
+        self.reconciled = False # deletions missed while offline are checked once per process
+        self.last_sync = None
+        self.last_error = None
+
+    def start(self):
+        with self.sync_lock:
+            if self.thread is not None:
+                return
+            # realtime changes keep the replica current between pulls
+            task_feed.subscribe(self.on_remote_change)
+            self.thread = threading.Thread(target=self._worker, name="task-sync", daemon=True)
+            self.thread.start()
+
+    # sync soon, e.g. after a local change
+    def wake(self):
+        self.wake_event.set()
+
+    # a local change was written to the replica: show it in every session and push it
+    def local_change(self, event_type, record, old_record=None):
+        task_feed.publish(event_type, record, old_record)
+        self.wake()
+
+    def on_remote_change(self, event_type, record, old_record):
+        if not change_for_user(self.user_id, event_type, record, old_record):
+            return # another user's list
+        if event_type == "DELETE":
+            self.replica.remove_remote(old_record["id"])
+        else:
+            self.replica.apply_remote(record)
+
+    def sync_now(self):
+        with self.sync_lock:
+            self.push()
+            self.pull()
+            self.last_sync = datetime.datetime.now(datetime.timezone.utc)
+
+    def stats(self):
+        return {
+            "pending": self.replica.pending_count(),
+            "last_sync": self.last_sync.isoformat() if self.last_sync else None,
+            "last_error": str(self.last_error) if self.last_error else None,
+        }
+
+    def _worker(self):
+        while True:
+            try:
+                self.sync_now()
+                self.last_error = None
+            except Exception as ex:
+                # offline or supabase unavailable: local changes stay in the outbox for the next try
+                self.last_error = ex
+                print("Error syncing tasks:", ex)
+            self.wake_event.wait(self.interval)
+            self.wake_event.clear()
+
+    # send the outbox. a request that fails for any reason other than a rejected row stops the push
+    # and leaves the remaining entries for the next sync
+    def push(self):
+        while True:
+            entries = self.replica.pending(self.batch_size)
+            for op, run in itertools.groupby(entries, key=lambda entry: entry[1]):
+                run = list(run)
+                if op == "insert":
+                    self._push_inserts(run)
+                elif op == "update":
+                    self._push_updates(run)
+                else:
+                    self._push_deletes(run)
+            if len(entries) < self.batch_size:
+                return
+
+    def _push_inserts(self, run):
+        rows, entries = [], []
+        for task_id, op, seq in run:
+            task = self.replica.get(task_id)
+            if task is None:
+                self.replica.drop_pending(task_id)
+                continue
+            rows.append({"text": task["text"], "priority": task["priority"], "completed": task["completed"]})
+            entries.append((task_id, seq))
+        if not rows:
+            return
+        try:
+            saved = self.backend.insert(rows)
+        except Exception as ex:
+            reason = _rejection(ex)
+            if reason is None:
+                raise
+            if len(rows) > 1:
+                # one refused row rejects the whole insert; send the rows one by one to find it
+                for entry in run:
+                    self._push_inserts([entry])
+                return
+            # the text was added elsewhere, or the list filled up, before this insert got through: drop the local task
+            print(f"Dropping offline task, {reason}:", rows[0]["text"])
+            self.replica.drop_pending(entries[0][0])
+            task_feed.publish("DELETE", None, {"id": entries[0][0]})
+            return
+        for (temp_id, seq), row in zip(entries, saved):
+            task = self.replica.insert_done(temp_id, seq, row)
+            task_feed.publish("DELETE", None, {"id": temp_id})
+            if task is not None:
+                task_feed.publish("INSERT", task, None)
+
+    def _push_updates(self, run):
+        rows, entries = [], []
+        for task_id, op, seq in run:
+            task = self.replica.get(task_id)
+            if task is None:
+                self.replica.push_done(task_id, seq)
+                continue
+            rows.append(task)
+            entries.append((task_id, seq))
+        if not rows:
+            return
+        try:
+            saved = self.backend.update_rows(rows)
+        except Exception as ex:
+            reason = _rejection(ex)
+            if reason is None:
+                raise
+            if len(rows) > 1:
+                for entry in run:
+                    self._push_updates([entry])
+                return
+            # rejected edit: go back to the row as supabase has it
+            print(f"Dropping offline edit, {reason}:", rows[0]["text"])
+            self.replica.drop_pending(entries[0][0])
+            self._refetch(entries[0][0])
+            return
+        saved_by_id = {row["id"]: row for row in saved}
+        for task_id, seq in entries:
+            row = saved_by_id.get(task_id)
+            if row is not None:
+                if self.replica.push_done(task_id, seq, row):
+                    task_feed.publish("UPDATE", row, None)
+                continue
+            # deleted in supabase before the edit got through: the edit goes with the task
+            self.replica.push_done(task_id, seq)
+            if self.replica.remove_remote(task_id):
+                task_feed.publish("DELETE", None, {"id": task_id})
+
+    def _push_deletes(self, run):
+        task_ids = [task_id for task_id, op, seq in run if not is_temp_id(task_id)]
+        if task_ids:
+            self.backend.delete(task_ids)
+        for task_id, op, seq in run:
+            self.replica.push_done(task_id, seq)
+
+    def _refetch(self, task_id):
+        rows = self._tasks(get_client().table("tasks").select(SYNC_COLUMNS)).eq("id", task_id).execute().data
+        if rows:
+            if self.replica.apply_remote(rows[0]):
+                task_feed.publish("UPDATE", rows[0], None)
+        elif self.replica.remove_remote(task_id):
+            task_feed.publish("DELETE", None, {"id": task_id})
+
+    # copy rows changed since the watermark into the replica. the first pull fills an empty replica
+    # that sessions are waiting to read, so its rows are not published one by one
+    def pull(self):
+        watermark = self.replica.watermark()
+        publish = watermark is not None
+        after = (self._rewind(watermark[0]), None) if watermark else None
+        while True:
+            query = self._tasks(get_client().table("tasks").select(SYNC_COLUMNS)).order("updated_at").order("id").limit(self.batch_size)
+            if after is not None:
+                updated_at, task_id = after
+                if task_id is None:
+                    query = query.gt("updated_at", updated_at)
+                else:
+                    query = query.or_(f'updated_at.gt."{updated_at}",and(updated_at.eq."{updated_at}",id.gt.{task_id})')
+            rows = query.execute().data
+            for row in rows:
+                if self.replica.apply_remote(row) and publish:
+                    task_feed.publish("UPDATE", row, None)
+            if rows:
+                after = (rows[-1]["updated_at"], rows[-1]["id"])
+                self.replica.set_watermark(*after)
+            if len(rows) < self.batch_size:
+                break
+        if after is None:
+            self.replica.set_watermark(EPOCH, 0)
+        if not self.reconciled:
+            self._reconcile()
+            self.reconciled = True
+
+    # a query limited to the replica's list
+    def _tasks(self, query):
+        return scoped(query, self.user_id)
+
+    def _rewind(self, updated_at):
+        try:
+            moment = datetime.datetime.fromisoformat(updated_at)
+        except ValueError:
+            return updated_at
+        return (moment - datetime.timedelta(seconds=SYNC_OVERLAP)).isoformat()
+
+    # rows deleted in supabase while this process was not listening never show up in a pull;
+    # compare ids once and drop the missing ones (tasks with local changes are kept)
+    def _reconcile(self):
+        server_ids, after = set(), None
+        while True:
+            query = self._tasks(get_client().table("tasks").select("id")).order("id").limit(self.batch_size)
+            if after is not None:
+                query = query.gt("id", after)
+            rows = query.execute().data
+            server_ids.update(row["id"] for row in rows)
+            if len(rows) < self.batch_size:
+                break
+            after = rows[-1]["id"]
+        for task_id in self.replica.server_ids() - server_ids:
+            if self.replica.remove_remote(task_id):
+                task_feed.publish("DELETE", None, {"id": task_id})
+
+_engine = None
+_engine_lock = threading.Lock()
+
+# replica and sync engine shared by every session, opened on first use
+def get_sync_engine():
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = SyncEngine(TaskReplica())
+            _engine.start()
+            metrics.register_collector(lambda: {"sync_pending_changes": _engine.replica.pending_count()})
+    return _engine
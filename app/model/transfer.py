@@ -0,0 +1,149 @@
+# app/model/transfer.py
+"""Streaming import and export of tasks as CSV or JSONL.
+
+    python -m app.model.transfer import tasks.csv
+    python -m app.model.transfer export tasks.jsonl
+
+Files are read and written a batch at a time, so memory use does not depend on the file size.
+Rows are dicts with "text", "priority" (high/med/low or 0-2) and optionally "completed".
+"""
+import argparse
+import csv
+import json
+import sys
+from app.model.backends import DuplicateTaskError
+from app.model.model import TaskModel, PRIORITY_MAPPING, PRIORITY_REVERSE_MAPPING
+
+IMPORT_BATCH_SIZE = 500
+EXPORT_PAGE_SIZE = 1000
+EXPORT_FIELDS = ["text", "priority", "completed"]
+
+def _is_jsonl(path):
+    return path.endswith(".jsonl") or path.endswith(".ndjson")
+
+def read_rows(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        if _is_jsonl(path):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(f)
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _parse_priority(value):
+    value = str(value if value is not None else "low").strip().lower()
+    if value in PRIORITY_MAPPING:
+        return value
+    if value.isdigit() and int(value) in PRIORITY_REVERSE_MAPPING:
+        return PRIORITY_REVERSE_MAPPING[int(value)]
+    raise ValueError(f"Unknown priority: {value}")
+
+def _parse_completed(value):
+    if isinstance(value, bool):
+        return value
+    return str(value or "").strip().lower() in ("true", "1", "yes", "y")
+
+# (text, priority, completed) for a file row, or None if the row can't be imported
+def _to_item(row):
+    text = str(row.get("text") or "").strip()
+    if not text:
+        return None
+    try:
+        return (text, _parse_priority(row.get("priority")), _parse_completed(row.get("completed")))
+    except ValueError:
+        return None
+
+def import_tasks(path, model=None, batch_size=IMPORT_BATCH_SIZE, on_progress=None):
+    """Insert the tasks in a file in batches, skipping invalid rows and tasks that already exist.
+
+    Returns counts of rows read, imported, skipped as duplicates and skipped as invalid. on_progress
+    is called with the same counts after every batch.
+    """
+    model = model or TaskModel()
+    counts = {"read": 0, "imported": 0, "duplicates": 0, "invalid": 0}
+    for batch in _batches(read_rows(path), batch_size):
+        counts["read"] += len(batch)
+        items, seen = [], set()
+        for row in batch:
+            item = _to_item(row)
+            if item is None:
+                counts["invalid"] += 1
+            elif item[0].lower() in seen:
+                counts["duplicates"] += 1
+            else:
+                seen.add(item[0].lower())
+                items.append(item)
+        imported = _insert_items(model, items)
+        counts["imported"] += imported
+        counts["duplicates"] += len(items) - imported
+        if on_progress:
+            on_progress(dict(counts))
+    return counts
+
+# insert the items whose text is not taken yet, with one lookup and one insert. a task another
+# session adds in between fails the insert; the lookup is then repeated once. returns the number inserted
+def _insert_items(model, items):
+    for attempt in range(2):
+        fresh = model.new_items(items)
+        if not fresh:
+            return 0
+        try:
+            return len(model.add_tasks(fresh))
+        except DuplicateTaskError:
+            if attempt:
+                raise
+
+def export_tasks(path, model=None, page_size=EXPORT_PAGE_SIZE, on_progress=None):
+    """Write every task to a file in display order, reading one page at a time. Returns the count."""
+    model = model or TaskModel()
+    count = 0
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = None if _is_jsonl(path) else csv.DictWriter(f, fieldnames=EXPORT_FIELDS)
+        if writer:
+            writer.writeheader()
+        after = None
+        while True:
+            page = model.fetch_page(after, page_size)
+            for task in page:
+                row = {"text": task["text"], "priority": PRIORITY_REVERSE_MAPPING[task["priority"]], "completed": task["completed"]}
+                if writer:
+                    writer.writerow(row)
+                else:
+                    f.write(json.dumps(row) + "\n")
+            count += len(page)
+            if on_progress:
+                on_progress(count)
+            if len(page) < page_size:
+                return count
+            after = page[-1]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import or export tasks as CSV or JSONL.")
+    parser.add_argument("action", choices=["import", "export"])
+    parser.add_argument("path")
+    parser.add_argument("--batch-size", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    if args.action == "import":
+        counts = import_tasks(args.path, batch_size=args.batch_size or IMPORT_BATCH_SIZE,
+                              on_progress=lambda c: print(f"\rread {c['read']}, imported {c['imported']}", end="", file=sys.stderr))
+        print(file=sys.stderr)
+        print(json.dumps(counts))
+    else:
+        count = export_tasks(args.path, page_size=args.batch_size or EXPORT_PAGE_SIZE,
+                             on_progress=lambda n: print(f"\rexported {n}", end="", file=sys.stderr))
+        print(file=sys.stderr)
+        print(json.dumps({"exported": count}))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+# app/model/transport.py
+import asyncio
+import contextlib
+import contextvars
+import os
+import threading
+import time
+import httpx
+from postgrest import SyncPostgrestClient, AsyncPostgrestClient
+from supabase import Client, AsyncClient, ClientOptions, AsyncClientOptions
+from app import metrics
+
+# connections kept to the supabase REST api by each client, and how many of them stay open while idle
+SUPABASE_POOL_SIZE = int(os.getenv("SUPABASE_POOL_SIZE", "20"))
+SUPABASE_KEEPALIVE = int(os.getenv("SUPABASE_KEEPALIVE", "10"))
+# seconds an idle connection is kept before it is closed
+SUPABASE_KEEPALIVE_EXPIRY = float(os.getenv("SUPABASE_KEEPALIVE_EXPIRY", "30"))
+# multiplex requests over fewer connections (needs the h2 package)
+SUPABASE_HTTP2 = os.getenv("SUPABASE_HTTP2", "true").lower() == "true"
+# per-request timeouts in seconds: connecting, and reading/writing once connected
+SUPABASE_CONNECT_TIMEOUT = float(os.getenv("SUPABASE_CONNECT_TIMEOUT", "5"))
+SUPABASE_TIMEOUT = float(os.getenv("SUPABASE_TIMEOUT", "10"))
+# requests sent at once by all sessions together (0: no limit); the rest wait up to
+# SUPABASE_QUEUE_TIMEOUT seconds for a slot and then fail with httpx.PoolTimeout
+SUPABASE_MAX_IN_FLIGHT = int(os.getenv("SUPABASE_MAX_IN_FLIGHT", "32"))
+SUPABASE_QUEUE_TIMEOUT = float(os.getenv("SUPABASE_QUEUE_TIMEOUT", "10"))
+
+# time.monotonic() by which the running model operation must finish (see app/model/breaker.py), or
+# None. requests queue and wait on the network for at most the time left, and fail once it runs out
+request_deadline = contextvars.ContextVar("request_deadline", default=None)
+
+def time_left():
+    deadline = request_deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+# the client's timeouts for a request, cut down to the operation's remaining time
+def _bounded_timeout(request):
+    left = time_left()
+    if left is None:
+        return None
+    if left <= 0:
+        raise httpx.TimeoutException("Deadline exceeded before the request was sent", request=request)
+    timeout = request.extensions.get("timeout", {})
+    request.extensions["timeout"] = {phase: left if value is None else min(value, left) for phase, value in timeout.items()}
+    return left
+
+def request_timeout():
+    return httpx.Timeout(SUPABASE_TIMEOUT, connect=SUPABASE_CONNECT_TIMEOUT)
+
+def pool_limits():
+    return httpx.Limits(
+        max_connections=SUPABASE_POOL_SIZE,
+        max_keepalive_connections=SUPABASE_KEEPALIVE,
+        keepalive_expiry=SUPABASE_KEEPALIVE_EXPIRY,
+    )
+
+class RequestLimiter:
+    """Caps the requests in flight through one kind of client across every session.
+
+    The sync client is shared by every session thread and waits on a thread semaphore; the async
+    client is shared by every session on the event loop and waits on an asyncio semaphore. Both
+    record how long each request queued for its slot.
+    """
+
+    def __init__(self, name, size=SUPABASE_MAX_IN_FLIGHT, queue_timeout=SUPABASE_QUEUE_TIMEOUT):
+        self.name = name
+        self.size = size
+        self.queue_timeout = queue_timeout
+        self.semaphore = threading.BoundedSemaphore(size) if size > 0 else None
+        self.async_semaphore = None # created on first use, inside the event loop
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.waiting = 0
+        self.sent = 0
+        self.rejected = 0
+
+    # hold one of the slots while the block runs; waits up to the queue timeout (or `limit`, if sooner)
+    @contextlib.contextmanager
+    def slot(self, limit=None):
+        start = self._queued()
+        acquired = self.semaphore is None or self.semaphore.acquire(timeout=self._wait(limit))
+        self._dequeued(start, acquired)
+        try:
+            yield
+        finally:
+            self._finished()
+            if self.semaphore is not None:
+                self.semaphore.release()
+
+    @contextlib.asynccontextmanager
+    async def async_slot(self, limit=None):
+        if self.size > 0 and self.async_semaphore is None:
+            self.async_semaphore = asyncio.Semaphore(self.size)
+        start = self._queued()
+        try:
+            if self.async_semaphore is not None:
+                await asyncio.wait_for(self.async_semaphore.acquire(), self._wait(limit))
+            acquired = True
+        except asyncio.TimeoutError:
+            acquired = False
+        self._dequeued(start, acquired)
+        try:
+            yield
+        finally:
+            self._finished()
+            if self.async_semaphore is not None:
+                self.async_semaphore.release()
+
+    def stats(self):
+        with self.lock:
+            return {"in_flight": self.in_flight, "waiting": self.waiting, "sent": self.sent, "rejected": self.rejected}
+
+    def _wait(self, limit):
+        return self.queue_timeout if limit is None else min(self.queue_timeout, limit)
+
+    def _queued(self):
+        with self.lock:
+            self.waiting += 1
+        return time.perf_counter()
+
+    def _dequeued(self, start, acquired):
+        metrics.request_queue_seconds.observe(time.perf_counter() - start, client=self.name)
+        with self.lock:
+            self.waiting -= 1
+            if not acquired:
+                self.rejected += 1
+            else:
+                self.in_flight += 1
+                self.sent += 1
+        if not acquired:
+            raise httpx.PoolTimeout("No free supabase request slot")
+
+    def _finished(self):
+        with self.lock:
+            self.in_flight -= 1
+
+# shared by every client created in this process, so a client rebuilt after a secret rotation
+# stays under the same cap
+sync_limiter = RequestLimiter("sync")
+async_limiter = RequestLimiter("async")
+
+class LimitedClient(httpx.Client):
+    """httpx client that holds a limiter slot while a request is sent and its body read.
+    httpx clients are safe to share between threads; the pool hands each request its own connection
+    (or http/2 stream)."""
+
+    def __init__(self, limiter, **kwargs):
+        super().__init__(**kwargs)
+        self.limiter = limiter
+
+    def send(self, request, **kwargs):
+        with self.limiter.slot(_bounded_timeout(request)):
+            return super().send(request, **kwargs)
+
+class AsyncLimitedClient(httpx.AsyncClient):
+    def __init__(self, limiter, **kwargs):
+        super().__init__(**kwargs)
+        self.limiter = limiter
+
+    async def send(self, request, **kwargs):
+        async with self.limiter.async_slot(_bounded_timeout(request)):
+            return await super().send(request, **kwargs)
+
+def _session_options(base_url, headers, timeout, verify, proxy):
+    return {
+        "base_url": base_url,
+        "headers": headers,
+        "timeout": timeout,
+        "verify": verify,
+        "proxy": proxy,
+        "follow_redirects": True,
+        "http2": SUPABASE_HTTP2,
+        "limits": pool_limits(),
+    }
+
+class PooledPostgrestClient(SyncPostgrestClient):
+    def create_session(self, base_url, headers, timeout, verify=True, proxy=None):
+        return LimitedClient(sync_limiter, **_session_options(base_url, headers, timeout, verify, proxy))
+
+class AsyncPooledPostgrestClient(AsyncPostgrestClient):
+    def create_session(self, base_url, headers, timeout, verify=True, proxy=None):
+        return AsyncLimitedClient(async_limiter, **_session_options(base_url, headers, timeout, verify, proxy))
+
+# supabase clients whose table queries go through the pooled, limited sessions above. supabase
+# rebuilds its postgrest client on auth changes through _init_postgrest_client, so it is replaced
+# there rather than patched after creation
+class PooledClient(Client):
+    @staticmethod
+    def _init_postgrest_client(rest_url, headers, schema, timeout=None, verify=True, proxy=None):
+        return PooledPostgrestClient(rest_url, headers=headers, schema=schema, timeout=timeout or request_timeout(), verify=verify, proxy=proxy)
+
+class AsyncPooledClient(AsyncClient):
+    @staticmethod
+    def _init_postgrest_client(rest_url, headers, schema, timeout=None, verify=True, proxy=None):
+        return AsyncPooledPostgrestClient(rest_url, headers=headers, schema=schema, timeout=timeout or request_timeout(), verify=verify, proxy=proxy)
+
+def create_pooled_client(url, key):
+    return PooledClient.create(url, key, ClientOptions(postgrest_client_timeout=request_timeout()))
+
+async def create_pooled_async_client(url, key):
+    return await AsyncPooledClient.create(url, key, AsyncClientOptions(postgrest_client_timeout=request_timeout()))
+
+def _transport_metrics():
+    stats = [(limiter.name, limiter.stats()) for limiter in (sync_limiter, async_limiter)]
+    return {
+        "supabase_requests_in_flight": [({"client": name}, s["in_flight"]) for name, s in stats],
+        "supabase_requests_waiting": [({"client": name}, s["waiting"]) for name, s in stats],
+        "supabase_requests_total": [({"client": name}, s["sent"]) for name, s in stats],
+        "supabase_requests_rejected_total": [({"client": name}, s["rejected"]) for name, s in stats],
+    }
+
+metrics.register_collector(_transport_metrics)
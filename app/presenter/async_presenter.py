@@ -0,0 +1,92 @@
+# app/presenter/async_presenter.py
+from app.model.async_model import AsyncTaskModel
+from app.presenter.presenter import TaskPresenter, HANDLERS
+from app import metrics
+
+@metrics.instrumented("handler", only=HANDLERS)
+class AsyncTaskPresenter(TaskPresenter):
+    """TaskPresenter with coroutine handlers that await the AsyncTaskModel on the page's event loop."""
+
+    def __init__(self, page, user_id=None):
+        super().__init__(page, AsyncTaskModel(user_id=user_id))
+
+    async def load_tasks(self):
+        self.view.clear_tasks()
+        try:
+            self.show_tasks(await self.model.load_tasks())
+        except Exception as ex:
+            self.show_error("Error loading tasks:", ex)
+
+    async def load_more_tasks(self, e=None):
+        try:
+            self.show_more_tasks(await self.model.load_more_tasks())
+        except Exception as ex:
+            self.show_error("Error loading tasks:", ex)
+
+    async def on_list_near_end(self):
+        if self.model.has_more and not self.loading_more and not self.searching:
+            self.loading_more = True
+            try:
+                await self.load_more_tasks()
+            finally:
+                self.loading_more = False
+
+    async def add_task(self, e):
+        task_text = self.view.task_input.value.strip()
+        try:
+            task_data = await self.model.add_task(task_text, self.view.priority_dropdown.value)
+            self.view.clear_input()
+            self.task_changed(task_data["id"])
+        except Exception as ex:
+            self.show_error("Error adding task:", ex)
+
+    async def toggle_task(self, e, task_label, task_id):
+        task_priority = self.task_priority(task_id)
+        if self.write_queue is not None or task_priority is None:
+            return super().toggle_task(e, task_label, task_id)
+        try:
+            await self.model.update_task(task_id, task_label.value, task_priority, e.control.value)
+            self.task_changed(task_id)
+        except Exception as ex:
+            self.show_error("Error updating task status:", ex)
+
+    async def on_save_edit(self, task_id, new_text, new_priority, task_checkbox, task_label, text_field, edit_button, save_button, cancel_button, delete_button, priority_label, priority_edit_dropdown):
+        if self.write_queue is not None:
+            return super().on_save_edit(task_id, new_text, new_priority, task_checkbox, task_label, text_field, edit_button, save_button, cancel_button, delete_button, priority_label, priority_edit_dropdown)
+        try:
+            await self.model.update_task(task_id, new_text, new_priority, task_checkbox.value)
+            self.finish_edit(task_id, task_checkbox, task_label, text_field, edit_button, save_button, cancel_button, delete_button, priority_label, priority_edit_dropdown)
+        except Exception as ex:
+            self.show_error("Error updating task:", ex)
+
+    async def delete_task(self, task_id, task_row):
+        if self.write_queue is not None:
+            return super().delete_task(task_id, task_row)
+        try:
+            await self.model.delete_task(task_id)
+            self.task_changed(task_id)
+        except Exception as ex:
+            self.show_error("Error deleting task:", ex)
+
+    async def apply_search(self):
+        query, completed, priority = self.view.search_criteria()
+        if not query and completed is None and priority is None:
+            self.show_all_tasks()
+            return
+        try:
+            self.show_search_results(await self.model.search(query, completed, priority))
+        except Exception as ex:
+            self.show_error("Error searching tasks:", ex)
+
+    async def run_bulk(self, action, message, clear_selection=False):
+        try:
+            task_ids = await action()
+            if clear_selection:
+                self.view.set_select_mode(False)
+            self.tasks_changed(task_ids)
+        except Exception as ex:
+            self.show_error(message, ex)
+
+    async def run(self):
+        await self.load_tasks()
+        self.view.build()
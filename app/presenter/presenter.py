@@ -1,85 +1,393 @@
 # app/presenter/presenter.py
-from app.model.model import TaskModel, PRIORITY_REVERSE_MAPPING
+import collections
+import os
+import threading
+from app.model.model import TaskModel, PRIORITY_MAPPING, PRIORITY_REVERSE_MAPPING, WRITE_COALESCING
 from app.view.view import TaskView
+from app.presenter.write_queue import WriteQueue
+from app import metrics
+from app.scheduler import scheduler
 
+# apply toggles, edits and deletes to the UI immediately and send the writes in the background
+OPTIMISTIC_UPDATES = os.getenv("OPTIMISTIC_UPDATES", "false").lower() == "true"
+# seconds the search box must be idle before searching
+SEARCH_DEBOUNCE = float(os.getenv("SEARCH_DEBOUNCE", "0.25"))
+
+# methods run as UI event handlers, timed and used to attribute page updates in app/metrics.py
+HANDLERS = (
+    "run", "load_tasks", "load_more_tasks", "on_list_near_end", "apply_task_change", "rollback_task",
+    "add_task", "toggle_task", "on_edit_click", "on_save_edit", "on_cancel_edit", "delete_task",
+    "toggle_select_mode", "complete_selected", "prioritize_selected", "delete_selected",
+    "mark_all_done", "clear_completed", "run_bulk", "apply_search",
+)
+
+@metrics.instrumented("handler", only=HANDLERS)
 class TaskPresenter:
-    def __init__(self, page):
-        self.model = TaskModel()
+    def __init__(self, page, model=None, optimistic=OPTIMISTIC_UPDATES):
+        self.model = model or TaskModel()
         self.view = TaskView(page)
+        self.row_callbacks = {
+            "toggle_task": self.toggle_task,
+            "edit_task": self.on_edit_click,
+            "save_task": self.on_save_edit,
+            "cancel_edit": self.on_cancel_edit,
+            "delete_task": self.delete_task
+        }
+        self.loading_more = False
+        self.searching = False # a search or filter is active; the list shows its results
+        self.search_results = {} # id -> task shown as a search result, including tasks not loaded
+        # realtime changes waiting to be applied, in the order the feed delivered them
+        self.pending_changes = collections.deque()
+        self.pending_lock = threading.Lock()
+        self.applying_changes = False
+        # per-session queue of background writes in optimistic mode
+        self.write_queue = WriteQueue(run_async=self.view.run_async, name=f"write-queue-{page.session_id}") if optimistic else None
         self.setup_callbacks()
+        # receive other sessions' changes as row-level deltas
+        self.model.subscribe(self.on_task_change)
+        self.view.page.on_close = self.on_session_close
+        metrics.active_sessions.inc()
+        if self.write_queue is not None:
+            metrics.register_collector(self.write_queue_metrics)
+
+    def on_session_close(self, e):
+        self.model.unsubscribe(self.on_task_change)
+        scheduler.cancel_owner(self.view) # pending banner closes for a page that is gone
+        metrics.active_sessions.dec()
+        if self.write_queue is not None:
+            metrics.unregister_collector(self.write_queue_metrics)
+            self.write_queue.close()
+
+    # summed over sessions by the metrics endpoint. time to ack goes to the write_queue_ack_seconds
+    # histogram as each write is acked
+    def write_queue_metrics(self):
+        stats = self.write_queue.stats()
+        return {"write_queue_depth": stats["depth"], "write_queue_acked_total": stats["acked"], "write_queue_failed_total": stats["failed"]}
 
     def setup_callbacks(self):
         self.view.add_button.on_click = self.add_task
+        self.view.load_more_button.on_click = self.load_more_tasks
+        if self.view.virtualized:
+            self.view.bind_virtual_list(self.row_callbacks, PRIORITY_REVERSE_MAPPING, self.on_list_near_end)
+        self.view.select_mode_button.on_click = self.toggle_select_mode
+        self.view.search_field.on_change = lambda e: self.schedule_search()
+        self.view.priority_filter.on_change = lambda e: self.search_now()
+        self.view.status_filter.on_change = lambda e: self.search_now()
+        self.view.bulk_complete_button.on_click = lambda e: self.view.dispatch(self.complete_selected(e))
+        self.view.bulk_priority_dropdown.on_change = lambda e: self.view.dispatch(self.prioritize_selected(e))
+        self.view.bulk_delete_button.on_click = lambda e: self.view.dispatch(self.delete_selected(e))
+        self.view.mark_all_done_item.on_click = lambda e: self.view.dispatch(self.mark_all_done(e))
+        self.view.clear_completed_item.on_click = lambda e: self.view.dispatch(self.clear_completed(e))
         self.view.task_already_exists_warning.actions[0].on_click = lambda e: self.view.close_banner(self.view.task_already_exists_warning)
         self.view.empty_task_warning.actions[0].on_click = lambda e: self.view.close_banner(self.view.empty_task_warning)
+        self.view.task_limit_warning.actions[0].on_click = lambda e: self.view.close_banner(self.view.task_limit_warning)
+        self.view.cached_tasks_warning.actions[0].on_click = lambda e: self.view.close_banner(self.view.cached_tasks_warning)
         self.view.error_warning.actions[0].on_click = lambda e: self.view.close_banner(self.view.error_warning)
 
     def load_tasks(self):
         # function to load tasks
         self.view.clear_tasks()
         try:
-            tasks = self.model.load_tasks()
+            self.show_tasks(self.model.load_tasks())
+        except Exception as ex:
+            self.show_error("Error loading tasks:", ex)
+
+    # render the first page of tasks
+    def show_tasks(self, tasks):
+        with self.model.lock:
+            self.model.take_changed() # every row is built from the list below
+            if self.view.virtualized:
+                self.view.show_tasks(tasks) # rows are built as they scroll into view
+                tasks = []
             for task in tasks:
                 task_id = task["id"]
                 task_text = task["text"]
                 task_is_completed = task["completed"]
                 task_priority = task["priority"]
                 task_row = self.view.create_task_row(
-                    task_id, task_text, task_is_completed, PRIORITY_REVERSE_MAPPING[task_priority],
-                    {
-                        "toggle_task": self.toggle_task,
-                        "edit_task": self.on_edit_click,
-                        "save_task": self.on_save_edit,
-                        "cancel_edit": self.on_cancel_edit,
-                        "delete_task": self.delete_task
-                    }
+                    task_id, task_text, task_is_completed, PRIORITY_REVERSE_MAPPING[task_priority], self.row_callbacks
                 )
                 self.view.add_task_to_list(task_row)
-            self.view.update()
+        self.view.set_has_more(self.model.has_more)
+        self.warn_if_cached()
+        self.view.flush()
+
+    # function to fetch and append the next page of tasks
+    def load_more_tasks(self, e=None):
+        try:
+            self.show_more_tasks(self.model.load_more_tasks())
+        except Exception as ex:
+            self.show_error("Error loading tasks:", ex)
+
+    # append a newly loaded page of tasks. if the store reloaded in between (TTL expiry or a delta
+    # refresh), the loaded list may no longer start with the rows shown, so the whole list is
+    # reconciled instead
+    def show_more_tasks(self, new_tasks):
+        with self.model.lock:
+            changed = self.model.take_changed()
+            if self.view.virtualized:
+                self.view.show_tasks(self.model.tasks)
+            else:
+                shown = self.view.task_order()
+                if not changed and shown == [task["id"] for task in self.model.tasks[:len(shown)]]:
+                    for task in self.model.tasks[len(shown):]:
+                        self.sync_task_row(task["id"])
+                else:
+                    self.reconcile_task_list()
+        self.view.set_has_more(self.model.has_more)
+        self.warn_if_cached()
+        self.view.flush()
+
+    # virtualized list scrolled close to the last loaded task
+    def on_list_near_end(self):
+        if self.model.has_more and not self.loading_more and not self.searching:
+            self.loading_more = True
+            try:
+                self.load_more_tasks()
+            finally:
+                self.loading_more = False
+
+    # bring the rows in line with the model after task_ids changed, together with any rows changed
+    # on other threads since the last sync. call with the model's lock held
+    def sync_changed_rows(self, task_ids):
+        changed = self.model.take_changed(task_ids)
+        if self.view.virtualized:
+            self.view.refresh_tasks()
+        elif len(changed) == 1:
+            self.sync_task_row(next(iter(changed)))
+        elif changed:
+            # several rows may move at once, so patch the changed rows and then lay out the list
+            # in model order in one pass (unchanged rows are only reordered, not re-sent)
+            for task_id in changed:
+                task = self.model.get_task(task_id)
+                if task is not None:
+                    self.render_task_row(task)
+            self.view.set_task_order([task["id"] for task in self.model.tasks])
+
+    # reconcile a single task's row with the model: insert, move, update or remove only that row
+    def sync_task_row(self, task_id):
+        if self.view.virtualized:
+            # only the visible window is materialized; re-bind it to the updated list
+            self.view.refresh_tasks()
+            return
+        index = self.model.position_of(task_id)
+        task_row = self.view.get_task_row(task_id)
+        if index is None:
+            if task_row is not None:
+                self.view.remove_task_from_list(task_row)
+            return
+        if task_row is None:
+            self.view.insert_task_row(index, self.render_task_row(self.model.tasks[index]))
+        else:
+            self.render_task_row(self.model.tasks[index])
+            self.view.move_task_row(task_row, index)
+
+    # patch every row and lay them out in the order of the model's whole loaded list
+    def reconcile_task_list(self):
+        for task in self.model.tasks:
+            self.render_task_row(task)
+        self.view.set_task_order([task["id"] for task in self.model.tasks])
+
+    # create the row for a task, or patch its existing row
+    def render_task_row(self, task):
+        task_row = self.view.get_task_row(task["id"])
+        task_priority = PRIORITY_REVERSE_MAPPING[task["priority"]]
+        if task_row is None:
+            return self.view.create_task_row(task["id"], task["text"], task["completed"], task_priority, self.row_callbacks)
+        self.view.update_task_row(task_row, task["text"], task["completed"], task_priority)
+        return task_row
+
+    # refresh the UI after a single task was added, updated or deleted. only the controls the change
+    # touched are sent (see TaskView.flush)
+    def task_changed(self, task_id):
+        if self.searching:
+            self.refresh_search()
+            return
+        with self.model.lock:
+            self.sync_changed_rows([task_id])
+        self.view.flush()
+
+    # refresh the UI once after a bulk action changed several tasks
+    def tasks_changed(self, task_ids):
+        if self.searching:
+            self.refresh_search()
+        else:
+            with self.model.lock:
+                self.sync_changed_rows(task_ids)
+        self.view.flush()
+
+    # search box typed into: search once typing pauses. runs on the session's executor
+    def schedule_search(self):
+        scheduler.call_later(SEARCH_DEBOUNCE, self.view.page.run_thread, self.search_now, key=(id(self), "search"), owner=self.view)
+
+    def search_now(self):
+        scheduler.cancel(key=(id(self), "search"))
+        self.view.dispatch(self.apply_search())
+
+    # results changed while searching: searching loaded tasks is cheap, a backend search is debounced
+    # so a burst of changes costs one query
+    def refresh_search(self):
+        if self.model.has_more:
+            self.schedule_search()
+        else:
+            self.search_now()
+
+    def apply_search(self):
+        query, completed, priority = self.view.search_criteria()
+        if not query and completed is None and priority is None:
+            self.show_all_tasks()
+            return
+        try:
+            self.show_search_results(self.model.search(query, completed, priority))
         except Exception as ex:
-            print("Error loading tasks:", ex)
+            self.show_error("Error searching tasks:", ex)
+
+    # show search results in place of the task list (no paging while searching)
+    def show_search_results(self, tasks):
+        self.searching = True
+        self.search_results = {task["id"]: task for task in tasks}
+        self.warn_if_cached()
+        self.show_task_list(tasks, has_more=False)
+
+    # back to the loaded task list after the search was cleared
+    def show_all_tasks(self):
+        self.searching = False
+        self.search_results = {}
+        self.show_task_list(self.model.tasks, self.model.has_more)
+
+    def show_task_list(self, tasks, has_more):
+        with self.model.lock:
+            self.model.take_changed()
+            if self.view.virtualized:
+                self.view.show_tasks(tasks)
+            else:
+                for task in tasks:
+                    self.render_task_row(task)
+                self.view.set_task_order([task["id"] for task in tasks])
+        self.view.set_has_more(has_more)
+        self.view.flush()
+
+    # a loaded task, or a search result outside the loaded pages
+    def known_task(self, task_id):
+        return self.model.get_task(task_id) or self.search_results.get(task_id)
+
+    # the last read was answered from the cached list because the database is unreachable
+    def warn_if_cached(self):
+        if self.model.serving_cached:
+            self.view.show_banner(self.view.cached_tasks_warning)
+
+    # show the matching banner for a failed model call
+    def show_error(self, message, ex):
+        metrics.record_error(ex)
+        if isinstance(ex, ValueError) and str(ex) == "Task already exists":
+            self.view.show_banner(self.view.task_already_exists_warning)
+        elif isinstance(ex, ValueError) and str(ex) == "Task cannot be empty":
+            self.view.show_banner(self.view.empty_task_warning)
+        elif isinstance(ex, ValueError) and str(ex) == "Task limit reached":
+            self.view.show_banner(self.view.task_limit_warning)
+        else:
+            print(message, ex)
             self.view.show_banner(self.view.error_warning)
 
+    # optimistic mode: apply the change to the model now and queue the write; the row is rolled back
+    # if the write fails. changes=None means the task is being deleted. the write queue's callbacks
+    # run on other threads, so the model's indexes are only changed under its lock
+    def write_optimistically(self, task_id, changes, write, message):
+        with self.model.lock:
+            previous = self.known_task(task_id)
+            if previous is None:
+                return
+            if changes is None:
+                self.model.apply_change("DELETE", None, previous)
+            else:
+                self.model.apply_change("UPDATE", dict(previous, **changes), None)
+        self.write_queue.submit(
+            write,
+            # the model now holds the row as saved by the database
+            on_success=lambda result: self.view.page.run_thread(self.task_changed, task_id),
+            on_failure=lambda ex: self.view.page.run_thread(self.rollback_task, previous, message, ex),
+        )
+
+    # background write for an optimistic update, merged with other updates when coalescing is on
+    def queued_update(self, task_id, text, priority, completed):
+        if WRITE_COALESCING:
+            return lambda: self.model.queue_update(task_id, text, priority, completed)
+        return lambda: self.model.update_task(task_id, text, priority, completed)
+
+    def rollback_task(self, previous, message, ex):
+        self.model.apply_change("UPDATE", previous, None)
+        self.task_changed(previous["id"])
+        self.show_error(message, ex)
+
+    # called from the realtime feed thread. page.run_thread hands work to a pool shared by every
+    # session, so changes are queued and applied one at a time, in feed order, by a single drain;
+    # they can still overlap this session's handlers and write queue callbacks, which the model's
+    # lock keeps consistent
+    def on_task_change(self, event_type, record, old_record):
+        if not self.model.owns_change(event_type, record, old_record):
+            return # another user's list
+        with self.pending_lock:
+            self.pending_changes.append((event_type, record, old_record))
+            if self.applying_changes:
+                return
+            self.applying_changes = True
+        self.view.page.run_thread(self.apply_pending_changes)
+
+    def apply_pending_changes(self):
+        while True:
+            with self.pending_lock:
+                if not self.pending_changes:
+                    self.applying_changes = False
+                    return
+                change = self.pending_changes.popleft()
+            self.apply_task_change(*change)
+
+    def apply_task_change(self, event_type, record, old_record):
+        try:
+            self.task_changed(self.model.apply_change(event_type, record, old_record))
+        except Exception as ex:
+            print("Error applying task change:", ex)
+
     # function to add a task when button is clicked
     def add_task(self, e):
         task_text = self.view.task_input.value.strip() # get input text
         try:
             task_data = self.model.add_task(task_text, self.view.priority_dropdown.value)
-            task_id = task_data["id"]
-            task_row = self.view.create_task_row(
-                task_id, task_text, False, PRIORITY_REVERSE_MAPPING[task_data["priority"]],
-                {
-                    "toggle_task": self.toggle_task,
-                    "edit_task": self.on_edit_click,
-                    "save_task": self.on_save_edit,
-                    "cancel_edit": self.on_cancel_edit,
-                    "delete_task": self.delete_task
-                }
-            )
-            self.view.add_task_to_list(task_row)
-            # sort task list after adding task
-            self.load_tasks()
             self.view.clear_input()  # clear input field
-            self.view.update()  # refresh UI
-        except ValueError as ve:
-            if str(ve) == "Task already exists":
-                self.view.show_banner(self.view.task_already_exists_warning)
-            elif str(ve) == "Task cannot be empty":
-                self.view.show_banner(self.view.empty_task_warning)
+            # place the new row at its sorted position and refresh UI
+            self.task_changed(task_data["id"])
         except Exception as ex:
-            print("Error adding task:", ex)
-            self.view.show_banner(self.view.error_warning)
+            self.show_error("Error adding task:", ex)
 
     # function to handle checkbox changes
     def toggle_task(self, e, task_label, task_id):
         checkbox = e.control # get checkbox that triggered the event
         is_completed = checkbox.value
+        task_priority = self.task_priority(task_id)
+        if task_priority is None:
+            self.task_gone(task_id, "Error updating task status:")
+            return
+        if self.write_queue is not None:
+            task_text = task_label.value
+            self.write_optimistically(task_id, {"completed": is_completed}, self.queued_update(task_id, task_text, task_priority, is_completed), "Error updating task status:")
+            self.task_changed(task_id)
+            return
         try:
-            self.model.update_task(task_id, task_label.value, PRIORITY_REVERSE_MAPPING[self.model.tasks[[t["id"] for t in self.model.tasks].index(task_id)]["priority"]], is_completed)
-            self.load_tasks()
+            self.model.update_task(task_id, task_label.value, task_priority, is_completed)
+            self.task_changed(task_id)
         except Exception as ex:
-            print("Error updating task status:", ex)
-            self.view.show_banner(self.view.error_warning)
+            self.show_error("Error updating task status:", ex)
+
+    # priority text of a loaded task, used when only the completion changes. None once the task is
+    # gone (deleted by another session or a feed DELETE while its row was still on screen)
+    def task_priority(self, task_id):
+        task = self.known_task(task_id)
+        return PRIORITY_REVERSE_MAPPING[task["priority"]] if task is not None else None
+
+    # the task behind a row was removed before the handler ran: drop the row and show the error
+    def task_gone(self, task_id, message):
+        self.task_changed(task_id)
+        self.show_error(message, Exception("Task no longer exists"))
 
     # function to toggle between viewing and editing mode
     def on_edit_click(self, task_checkbox, task_label, text_field, edit_button, save_button, cancel_button, delete_button, priority_label, priority_edit_dropdown):
@@ -94,30 +402,41 @@ class TaskPresenter:
         delete_button.visible = False
         priority_edit_dropdown.visible = True
         priority_label.visible = False
-        self.view.update()
+        self.view.mark_dirty(task_checkbox, task_label, text_field, edit_button, save_button, cancel_button, delete_button, priority_label, priority_edit_dropdown)
+        self.view.flush()
 
     # function to update task text in database
     def on_save_edit(self, task_id, new_text, new_priority, task_checkbox, task_label, text_field, edit_button, save_button, cancel_button, delete_button, priority_label, priority_edit_dropdown):
+        if self.write_queue is not None:
+            is_completed = task_checkbox.value
+            try:
+                # empty or duplicate text is rejected before the row changes, as without optimistic updates
+                changes = {"text": self.model.validate_text(new_text, task_id), "priority": PRIORITY_MAPPING[new_priority]}
+            except ValueError as ex:
+                self.show_error("Error updating task:", ex)
+                return
+            self.write_optimistically(task_id, changes, self.queued_update(task_id, new_text, new_priority, is_completed), "Error updating task:")
+            self.finish_edit(task_id, task_checkbox, task_label, text_field, edit_button, save_button, cancel_button, delete_button, priority_label, priority_edit_dropdown)
+            return
         try:
             self.model.update_task(task_id, new_text, new_priority, task_checkbox.value)
-            self.load_tasks()
-            # update UI
-            task_checkbox.visible = True
-            task_label.visible = True
-            text_field.visible = False # hide input after updating
-            save_button.visible = False
-            cancel_button.visible = False
-            edit_button.visible = True
-            delete_button.visible = True
-            priority_edit_dropdown.visible = False
-            priority_label.visible = True
-            self.view.update()
-        except ValueError as ve:
-            if str(ve) == "Task cannot be empty":
-                self.view.show_banner(self.view.empty_task_warning)
+            self.finish_edit(task_id, task_checkbox, task_label, text_field, edit_button, save_button, cancel_button, delete_button, priority_label, priority_edit_dropdown)
         except Exception as ex:
-            print("Error updating task:", ex)
-            self.view.show_banner(self.view.error_warning)
+            self.show_error("Error updating task:", ex)
+
+    # switch a row back to view mode after its edit was saved
+    def finish_edit(self, task_id, task_checkbox, task_label, text_field, edit_button, save_button, cancel_button, delete_button, priority_label, priority_edit_dropdown):
+        task_checkbox.visible = True
+        task_label.visible = True
+        text_field.visible = False # hide input after updating
+        save_button.visible = False
+        cancel_button.visible = False
+        edit_button.visible = True
+        delete_button.visible = True
+        priority_edit_dropdown.visible = False
+        priority_label.visible = True
+        self.view.mark_dirty(task_checkbox, task_label, text_field, edit_button, save_button, cancel_button, delete_button, priority_label, priority_edit_dropdown)
+        self.task_changed(task_id)
 
     # function to cancel editing
     def on_cancel_edit(self, task_checkbox, task_label, text_field, edit_button, save_button, cancel_button, delete_button, priority_label, priority_edit_dropdown):
@@ -130,17 +449,56 @@ class TaskPresenter:
         delete_button.visible = True
         priority_edit_dropdown.visible = False
         priority_label.visible = True
-        self.view.update()
+        self.view.mark_dirty(task_checkbox, task_label, text_field, edit_button, save_button, cancel_button, delete_button, priority_label, priority_edit_dropdown)
+        self.view.flush()
 
     def delete_task(self, task_id, task_row):
         # Note: Original delete_task had a lambda with parameters, but here we pass them directly
+        if self.write_queue is not None:
+            self.write_optimistically(task_id, None, lambda: self.model.delete_task(task_id), "Error deleting task:")
+            self.task_changed(task_id)
+            return
         try:
             self.model.delete_task(task_id)
-            self.view.remove_task_from_list(task_row)
-            self.view.update()
+            self.task_changed(task_id)
         except Exception as ex:
-            print("Error deleting task")
-            self.view.show_banner(self.view.error_warning)
+            self.show_error("Error deleting task:", ex)
+
+    # function to show or hide the multi-select controls
+    def toggle_select_mode(self, e=None):
+        self.view.set_select_mode(not self.view.select_mode)
+        self.view.flush()
+
+    # bulk actions: each is a constant number of requests followed by a single UI update
+    def complete_selected(self, e=None):
+        task_ids = self.view.selected_task_ids()
+        if task_ids:
+            return self.run_bulk(lambda: self.model.update_tasks(task_ids, completed=True), "Error completing tasks:", True)
+
+    def prioritize_selected(self, e=None):
+        task_ids, priority = self.view.selected_task_ids(), self.view.bulk_priority_dropdown.value
+        if task_ids and priority:
+            return self.run_bulk(lambda: self.model.update_tasks(task_ids, priority=priority), "Error updating tasks:", True)
+
+    def delete_selected(self, e=None):
+        task_ids = self.view.selected_task_ids()
+        if task_ids:
+            return self.run_bulk(lambda: self.model.delete_tasks(task_ids), "Error deleting tasks:", True)
+
+    def mark_all_done(self, e=None):
+        return self.run_bulk(self.model.complete_all_tasks, "Error completing tasks:")
+
+    def clear_completed(self, e=None):
+        return self.run_bulk(self.model.delete_completed_tasks, "Error deleting tasks:")
+
+    def run_bulk(self, action, message, clear_selection=False):
+        try:
+            task_ids = action()
+            if clear_selection:
+                self.view.set_select_mode(False)
+            self.tasks_changed(task_ids)
+        except Exception as ex:
+            self.show_error(message, ex)
 
     def run(self):
         ## APP MAIN FUNCTIONALITY IS STARTED
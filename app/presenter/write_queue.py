@@ -0,0 +1,101 @@
+# app/presenter/write_queue.py
+import collections
+import inspect
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from app import metrics
+
+class WriteQueue:
+    """Per-session FIFO of database writes drained by one background thread.
+
+    Writes run in the order they were submitted. A write may return an awaitable (async model), in
+    which case run_async is used to wait for it on the page's event loop, or a Future (coalesced
+    write), which is acked when it resolves without holding up the writes behind it.
+    """
+
+    def __init__(self, run_async=None, name="write-queue"):
+        self.queue = queue.Queue()
+        self.run_async = run_async
+        self.name = name
+        self.lock = threading.Lock()
+        self.thread = None
+        self.pending = 0 # queued + in flight
+        self.acked = 0
+        self.failed = 0
+        self.ack_times = collections.deque(maxlen=200) # seconds from submit to ack, most recent writes
+
+    # write() performs the request; on_success(result) / on_failure(ex) run on the queue thread
+    def submit(self, write, on_success=None, on_failure=None):
+        with self.lock:
+            self.pending += 1
+            if self.thread is None:
+                # started on first use so sessions that never write don't hold a thread
+                self.thread = threading.Thread(target=self._worker, name=self.name, daemon=True)
+                self.thread.start()
+        self.queue.put((write, on_success, on_failure, time.monotonic()))
+
+    def depth(self):
+        return self.pending
+
+    def stats(self):
+        with self.lock:
+            ack_times = list(self.ack_times)
+        return {
+            "depth": self.pending,
+            "acked": self.acked,
+            "failed": self.failed,
+            "last_ack_ms": ack_times[-1] * 1000 if ack_times else None,
+            "avg_ack_ms": sum(ack_times) / len(ack_times) * 1000 if ack_times else None,
+        }
+
+    # stop the worker once the writes already queued have been sent
+    def close(self):
+        self.queue.put(None)
+
+    def _worker(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            write, on_success, on_failure, queued_at = item
+            try:
+                result = write()
+                if inspect.isawaitable(result):
+                    result = self.run_async(result)
+            except Exception as ex:
+                self._finish(queued_at, on_success, on_failure, error=ex)
+                continue
+            if isinstance(result, Future):
+                result.add_done_callback(self._future_done(queued_at, on_success, on_failure))
+            else:
+                self._finish(queued_at, on_success, on_failure, result=result)
+
+    def _future_done(self, queued_at, on_success, on_failure):
+        def done(future):
+            error = future.exception()
+            self._finish(queued_at, on_success, on_failure, error, None if error else future.result())
+        return done
+
+    def _finish(self, queued_at, on_success, on_failure, error=None, result=None):
+        with self.lock:
+            self.pending -= 1
+            if error is not None:
+                self.failed += 1
+            else:
+                self.acked += 1
+                self.ack_times.append(time.monotonic() - queued_at)
+                metrics.write_ack_seconds.observe(self.ack_times[-1])
+        if error is not None:
+            self._notify(on_failure, error)
+        else:
+            self._notify(on_success, result)
+
+    def _notify(self, callback, arg):
+        if callback is None:
+            return
+        try:
+            callback(arg)
+        except Exception as ex:
+            print("Error in write queue callback:", ex)
@@ -0,0 +1,138 @@
+# app/scheduler.py
+import heapq
+import itertools
+import threading
+import time
+from app import metrics
+
+class _Call:
+    __slots__ = ("when", "callback", "args", "key", "owner", "done")
+
+    def __init__(self, when, callback, args, key, owner):
+        self.when, self.callback, self.args, self.key, self.owner = when, callback, args, key, owner
+        self.done = False # fired or cancelled
+
+class Scheduler:
+    """Runs delayed calls for every session from one background thread, ordered by a heap.
+
+    A call scheduled with a key replaces the pending call with the same key (e.g. showing a banner
+    again pushes its dismissal back instead of adding a second one). Calls scheduled with an owner
+    can all be cancelled at once with cancel_owner(), e.g. when a session disconnects. Callbacks run
+    on the scheduler thread and must be quick; UI work should be handed to the page's executor.
+    """
+
+    def __init__(self, name="scheduler"):
+        self.name = name
+        self.heap = [] # (when, seq, call); cancelled calls are dropped when they reach the top
+        self.seq = itertools.count()
+        self.by_key = {}
+        self.by_owner = {} # id(owner) -> set of pending calls
+        self.pending = 0
+        self.cond = threading.Condition()
+        self.thread = None
+        self.fired = 0
+        self.coalesced = 0
+        self.cancelled = 0
+
+    # run callback(*args) after delay seconds. returns a handle for cancel()
+    def call_later(self, delay, callback, *args, key=None, owner=None):
+        call = _Call(time.monotonic() + delay, callback, args, key, owner)
+        with self.cond:
+            if key is not None and key in self.by_key:
+                self._cancel(self.by_key[key])
+                self.coalesced += 1
+            if key is not None:
+                self.by_key[key] = call
+            if owner is not None:
+                self.by_owner.setdefault(id(owner), set()).add(call)
+            heapq.heappush(self.heap, (call.when, next(self.seq), call))
+            self.pending += 1
+            if self.thread is None:
+                # started on first use, then shared by every session
+                self.thread = threading.Thread(target=self._worker, name=self.name, daemon=True)
+                self.thread.start()
+            self.cond.notify()
+        return call
+
+    # cancel a call by its handle or key; returns True if it was still pending
+    def cancel(self, handle=None, key=None):
+        with self.cond:
+            call = self.by_key.get(key) if handle is None else handle
+            if call is None or call.done:
+                return False
+            self._cancel(call)
+            self.cancelled += 1
+            return True
+
+    # cancel every pending call scheduled with this owner
+    def cancel_owner(self, owner):
+        with self.cond:
+            calls = list(self.by_owner.get(id(owner), ()))
+            for call in calls:
+                self._cancel(call)
+            self.cancelled += len(calls)
+            return len(calls)
+
+    def pending_count(self):
+        return self.pending
+
+    def stats(self):
+        with self.cond:
+            return {
+                "pending": self.pending,
+                "fired": self.fired,
+                "coalesced": self.coalesced,
+                "cancelled": self.cancelled,
+            }
+
+    def _cancel(self, call):
+        call.done = True
+        self._forget(call)
+        self.pending -= 1
+
+    def _forget(self, call):
+        if call.key is not None and self.by_key.get(call.key) is call:
+            del self.by_key[call.key]
+        if call.owner is not None:
+            calls = self.by_owner.get(id(call.owner))
+            if calls is not None:
+                calls.discard(call)
+                if not calls:
+                    del self.by_owner[id(call.owner)]
+
+    def _worker(self):
+        while True:
+            with self.cond:
+                while True:
+                    while self.heap and self.heap[0][2].done:
+                        heapq.heappop(self.heap)
+                    if not self.heap:
+                        self.cond.wait()
+                        continue
+                    timeout = self.heap[0][0] - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    self.cond.wait(timeout)
+                call = heapq.heappop(self.heap)[2]
+                call.done = True
+                self._forget(call)
+                self.pending -= 1
+                self.fired += 1
+            try:
+                call.callback(*call.args)
+            except Exception as ex:
+                print("Error in scheduled call:", ex)
+
+# shared by all sessions
+scheduler = Scheduler()
+
+def _scheduler_metrics():
+    stats = scheduler.stats()
+    return {
+        "scheduler_pending_calls": stats["pending"],
+        "scheduler_fired_total": stats["fired"],
+        "scheduler_coalesced_total": stats["coalesced"],
+        "scheduler_cancelled_total": stats["cancelled"],
+    }
+
+metrics.register_collector(_scheduler_metrics)
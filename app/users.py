@@ -0,0 +1,37 @@
+# app/users.py
+import os
+import uuid
+
+# whose tasks a session shows: "shared" (default, one list for everyone) or "device" (a list per
+# browser/device, keyed by an id kept in the client's storage). per-user lists are what the RLS
+# policies on the roadmap will restrict to the signed-in user
+TASK_USER_MODE = os.getenv("TASK_USER_MODE", "shared").lower()
+USER_ID_KEY = "flettaskmaster.user_id"
+
+# user id of this session's task list, None for the shared list
+def session_user_id(page):
+    if TASK_USER_MODE != "device":
+        return None
+    try:
+        user_id = page.client_storage.get(USER_ID_KEY)
+        if not user_id:
+            user_id = str(uuid.uuid4())
+            page.client_storage.set(USER_ID_KEY, user_id)
+        return user_id
+    except Exception as ex:
+        # storage unavailable: this session gets a list of its own that ends with it
+        print("Error reading user id:", ex)
+        return str(uuid.uuid4())
+
+async def session_user_id_async(page):
+    if TASK_USER_MODE != "device":
+        return None
+    try:
+        user_id = await page.client_storage.get_async(USER_ID_KEY)
+        if not user_id:
+            user_id = str(uuid.uuid4())
+            await page.client_storage.set_async(USER_ID_KEY, user_id)
+        return user_id
+    except Exception as ex:
+        print("Error reading user id:", ex)
+        return str(uuid.uuid4())
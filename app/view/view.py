@@ -1,17 +1,50 @@
 # app/view/view.py
 import flet as ft
+import inspect
+import os
 import threading
+from app.view.virtual_list import VirtualTaskList
+from app import metrics
+from app.scheduler import scheduler
+
+# render tasks in a virtualized list that only builds the rows near the viewport
+TASK_LIST_VIRTUALIZED = os.getenv("TASK_LIST_VIRTUALIZED", "false").lower() == "true"
+# fixed row height used by the virtualized list
+VIRTUAL_ROW_HEIGHT = 56
+# rows per chunk of the (non-virtualized) task list, see TaskRowChunk
+ROW_CHUNK_SIZE = 8
+# seconds a banner stays open
+BANNER_DURATION = float(os.getenv("BANNER_DURATION", "2"))
+
+async def _await(awaitable):
+    return await awaitable
+
+class TaskRow(ft.Container):
+    """Container for one task row. Rows are isolated: updating the task list only diffs the list's
+    order, not every row's controls, so a changed row is sent by updating the row itself."""
+
+    def is_isolated(self):
+        return True
+
+class TaskRowChunk(ft.Column):
+    """A run of consecutive rows of the task list. The list holds chunks rather than rows, so adding,
+    moving or removing a row re-sends the chunks it touched instead of every row's slot in the list.
+    Isolated like TaskRow; a chunk that grows to twice ROW_CHUNK_SIZE rows is split."""
+
+    def is_isolated(self):
+        return True
 
 class TaskView:
-    def __init__(self, page: ft.Page):
+    def __init__(self, page: ft.Page, virtualized=TASK_LIST_VIRTUALIZED):
         self.page = page
+        self.virtualized = virtualized
         self.page.title = "Flet Task Master"
         self.page.horizontal_alignment = ft.CrossAxisAlignment.CENTER
         self.page.window.width = 100
         self.page.bgcolor = ft.Colors.GREY_50
         # close any open banners on app startup
         self.page.banner = None
-        self.page.update()
+        self.update()
         
         # check if accessing from desktop platform
         self.is_desktop = self.page.platform in [ft.PagePlatform.LINUX, ft.PagePlatform.WINDOWS, ft.PagePlatform.MACOS]
@@ -48,8 +81,43 @@ class TaskView:
         # input field for users to type in their task
         self.task_input = ft.TextField(label="Enter a task", expand=True)
 
-        # column to hold all tasks
-        self.task_list = ft.Column(scroll=ft.ScrollMode.AUTO) # makes the task list scrollable
+        # search box and filters above the list
+        self.search_field = ft.TextField(hint_text="Search tasks", prefix_icon=ft.Icons.SEARCH, dense=True, expand=True)
+        self.priority_filter = ft.Dropdown(
+            options=[ft.dropdown.Option("all")] + [ft.dropdown.Option(p) for p in self.PRIORITY_OPTIONS],
+            value="all",
+            label="Priority",
+            dense=True,
+            width=100,
+        )
+        self.status_filter = ft.Dropdown(
+            options=[ft.dropdown.Option(s) for s in ("all", "active", "done")],
+            value="all",
+            label="Status",
+            dense=True,
+            width=100,
+        )
+
+        # shown below the list while more pages of tasks can be fetched
+        self.load_more_button = ft.TextButton("Load more", visible=False)
+        if self.virtualized:
+            # list view that only holds the rows near the viewport, set up by bind_virtual_list
+            self.virtual_list = VirtualTaskList(self.create_virtual_row, self.bind_virtual_row, row_extent=VIRTUAL_ROW_HEIGHT, update=self.update)
+            self.task_list = self.virtual_list.list_view
+            # keyed registry of rendered rows, maintained by the virtual list
+            self.task_rows = self.virtual_list.rows_by_id
+        else:
+            # column to hold all tasks, in chunks of rows (TaskRowChunk)
+            self.task_list = ft.Column()
+            # keyed registry of rendered rows (task id -> task row) so single rows can be patched in place
+            self.task_rows = {}
+        self.row_callbacks = None
+        self.priority_names = None
+
+        # controls changed by the running handler, sent together by flush() instead of the whole page
+        self.dirty_controls = {}
+        self.page_dirty = False
+        self.dirty_lock = threading.Lock()
 
         # defining the banner
         self.task_already_exists_warning = ft.Banner(
@@ -74,6 +142,24 @@ class TaskView:
             ],
         )
 
+        self.task_limit_warning = ft.Banner(
+            bgcolor=ft.Colors.RED_400,
+            leading=ft.Icon(ft.Icons.WARNING, color=ft.Colors.WHITE, size=15),
+            content=ft.Text("Task limit reached! Delete some tasks first.", color=ft.Colors.WHITE),
+            actions=[
+                ft.TextButton(text="Close", style=ft.ButtonStyle(color=ft.Colors.WHITE))
+            ],
+        )
+
+        self.cached_tasks_warning = ft.Banner(
+            bgcolor=ft.Colors.AMBER_400,
+            leading=ft.Icon(ft.Icons.CLOUD_OFF, color=ft.Colors.BLACK, size=15),
+            content=ft.Text("Can't reach the server. Showing saved tasks.", color=ft.Colors.BLACK),
+            actions=[
+                ft.TextButton(text="Close", style=ft.ButtonStyle(color=ft.Colors.BLACK))
+            ],
+        )
+
         self.error_warning = ft.Banner(
             bgcolor=ft.Colors.RED_400,
             leading=ft.Icon(ft.Icons.ERROR, color=ft.Colors.WHITE, size=15),
@@ -88,17 +174,34 @@ class TaskView:
         # button that triggers add_task function when clicked
         self.add_button = ft.ElevatedButton("Add Task") if self.is_desktop else ft.IconButton(icon=ft.Icons.ADD_CIRCLE_ROUNDED, icon_size=55)
 
+        # multi-select and bulk actions
+        self.select_mode = False
+        self.selected_ids = set()
+        self.select_mode_button = ft.IconButton(icon=ft.Icons.CHECKLIST, tooltip="Select tasks")
+        self.bulk_complete_button = ft.TextButton("Complete", visible=False)
+        self.bulk_priority_dropdown = ft.Dropdown(
+            options=[ft.dropdown.Option(p) for p in self.PRIORITY_OPTIONS],
+            label="Set priority",
+            width=120,
+            visible=False,
+        )
+        self.bulk_delete_button = ft.TextButton("Delete", visible=False)
+        self.mark_all_done_item = ft.PopupMenuItem(text="Mark all done")
+        self.clear_completed_item = ft.PopupMenuItem(text="Clear completed")
+        self.bulk_menu = ft.PopupMenuButton(items=[self.mark_all_done_item, self.clear_completed_item])
+
+    # page.open/page.close send the banner themselves, the rest of the page is left alone
     def show_banner(self, banner):
-        self.page.banner = banner
-        self.page.open(banner) # open the banner
-        self.page.update()
+        if not banner.open:
+            self.page.open(banner) # open the banner
 
-        # Automatically close banner after 2 seconds
-        threading.Timer(2, lambda: self.close_banner(banner)).start()
+        # Automatically close banner after BANNER_DURATION seconds; showing it again while it is open
+        # pushes the close back. closed on the session's own executor
+        scheduler.call_later(BANNER_DURATION, self.page.run_thread, self.close_banner, banner, key=(id(self), id(banner)), owner=self)
 
     def close_banner(self, banner):
+        scheduler.cancel(key=(id(self), id(banner)))
         self.page.close(banner)
-        self.page.update()
 
     def create_task_row(self, task_id, task_text, task_is_completed, task_priority, callbacks):
         # convert priority integer to readable text
@@ -139,6 +242,13 @@ class TaskView:
             adaptive=True
         )
 
+        # selection checkbox (only shown in select mode)
+        select_checkbox = ft.Checkbox(
+            value=task_id in self.selected_ids,
+            visible=self.select_mode,
+            fill_color=ft.Colors.BLUE_200,
+        )
+
         task_checkbox = ft.Checkbox(
             value=bool(task_is_completed),
             data=task_id,
@@ -172,11 +282,12 @@ class TaskView:
                 task_row.bgcolor = ft.Colors.GREY_200  # Change to a subtle highlight
             else:  # Mouse left
                 task_row.bgcolor = None  # Reset to default
-            task_row.update()
+            self.update(task_row)
 
-        task_row = ft.Container(
+        task_row = TaskRow(
             ft.Row(
                 [
+                    select_checkbox,
                     task_checkbox,
                     priority_label,
                     priority_edit_dropdown,
@@ -194,16 +305,90 @@ class TaskView:
             border_radius=ft.border_radius.all(5),  # Rounded corners
             on_hover=on_hover
         )
+        # keep references to the row's controls so the row can be updated in place later
+        task_row.data = {
+            "task_id": task_id,
+            "select_checkbox": select_checkbox,
+            "task_checkbox": task_checkbox,
+            "priority_label": priority_label,
+            "priority_edit_dropdown": priority_edit_dropdown,
+            "task_label": task_label,
+            "text_field": text_field,
+            "edit_button": edit_button,
+            "save_button": save_button,
+            "cancel_button": cancel_button,
+            "delete_button": delete_button,
+        }
 
-        # Bind callbacks
-        task_checkbox.on_change = lambda e: callbacks["toggle_task"](e, task_label, task_id)
+        # Bind callbacks (task id is read from the row at click time)
+        select_checkbox.on_change = lambda e: self.set_task_selected(task_row.data["task_id"], e.control.value)
+        task_checkbox.on_change = lambda e: self.dispatch(callbacks["toggle_task"](e, task_label, task_row.data["task_id"]))
         edit_button.on_click = lambda e: callbacks["edit_task"](task_checkbox, task_label, text_field, edit_button, save_button, cancel_button, delete_button, priority_label, priority_edit_dropdown)
-        save_button.on_click = lambda e: callbacks["save_task"](task_id, text_field.value, priority_edit_dropdown.value, task_checkbox, task_label, text_field, edit_button, save_button, cancel_button, delete_button, priority_label, priority_edit_dropdown)
+        save_button.on_click = lambda e: self.dispatch(callbacks["save_task"](task_row.data["task_id"], text_field.value, priority_edit_dropdown.value, task_checkbox, task_label, text_field, edit_button, save_button, cancel_button, delete_button, priority_label, priority_edit_dropdown))
         cancel_button.on_click = lambda e: callbacks["cancel_edit"](task_checkbox, task_label, text_field, edit_button, save_button, cancel_button, delete_button, priority_label, priority_edit_dropdown)
-        delete_button.on_click = lambda e: callbacks["delete_task"](task_id, task_row)
+        delete_button.on_click = lambda e: self.dispatch(callbacks["delete_task"](task_row.data["task_id"], task_row))
+
+        if task_id is not None:
+            self.task_rows[task_id] = task_row
+        return task_row
 
+    # patch an existing row's controls to reflect new task values
+    def update_task_row(self, task_row, task_text, task_is_completed, task_priority):
+        controls = task_row.data
+        controls["task_checkbox"].value = bool(task_is_completed)
+        controls["task_label"].value = task_text
+        controls["task_label"].style = ft.TextStyle(decoration=ft.TextDecoration.LINE_THROUGH if task_is_completed else ft.TextDecoration.NONE)
+        controls["task_label"].color = ft.Colors.GREY_400 if task_is_completed else ft.Colors.BLACK
+        controls["text_field"].value = task_text
+        controls["priority_label"].content.value = task_priority
+        controls["priority_label"].bgcolor = self.PRIORITY_COLORS.get(task_priority, ft.Colors.GREY)
+        controls["priority_edit_dropdown"].value = task_priority
+        controls["priority_edit_dropdown"].label = str(task_priority)
+        self.mark_dirty(task_row)
+
+    # put a row back into view mode (used when a recycled row is bound to a different task)
+    def reset_task_row_mode(self, task_row):
+        controls = task_row.data
+        for name in ("task_checkbox", "task_label", "edit_button", "delete_button", "priority_label"):
+            controls[name].visible = True
+        for name in ("text_field", "save_button", "cancel_button", "priority_edit_dropdown"):
+            controls[name].visible = False
+
+    def get_task_row(self, task_id):
+        return self.task_rows.get(task_id)
+
+    # hook the virtualized list up to the presenter's row callbacks and paging
+    def bind_virtual_list(self, callbacks, priority_names, on_near_end):
+        self.row_callbacks = callbacks
+        self.priority_names = priority_names
+        self.virtual_list.on_near_end = lambda: self.dispatch(on_near_end())
+
+    def create_virtual_row(self):
+        task_row = self.create_task_row(None, "", False, self.PRIORITY_OPTIONS[-1], self.row_callbacks)
+        # fixed height so off-screen rows can be replaced by spacers
+        task_row.height = VIRTUAL_ROW_HEIGHT
+        task_row.data["task_label"].max_lines = 2
+        task_row.data["task_label"].overflow = ft.TextOverflow.ELLIPSIS
         return task_row
 
+    def bind_virtual_row(self, task_row, task):
+        if task_row.data["task_id"] != task["id"]:
+            self.reset_task_row_mode(task_row)
+            task_row.data["task_id"] = task["id"]
+            task_row.data["select_checkbox"].value = task["id"] in self.selected_ids
+        task_row.data["select_checkbox"].visible = self.select_mode
+        self.update_task_row(task_row, task["text"], task["completed"], self.priority_names[task["priority"]])
+
+    # virtualized mode: show the given tasks (in display order)
+    def show_tasks(self, tasks):
+        self.virtual_list.set_tasks(tasks)
+        self.mark_dirty(self.task_list)
+
+    # virtualized mode: re-bind the visible window after the task list changed
+    def refresh_tasks(self):
+        self.virtual_list.render()
+        self.mark_dirty(self.task_list)
+
     def build(self):
         ## CONTAINERS
         # header centered at top of screen
@@ -217,29 +402,186 @@ class TaskView:
 
         # wrap task list in fixed height container to prevent overflow
         task_list_container = ft.Container(
-            content=self.task_list,
+            # the virtualized list scrolls itself and pages on scroll instead of with a button
+            content=self.task_list if self.virtualized else ft.Column([self.task_list, self.load_more_button], scroll=ft.ScrollMode.AUTO), # makes the task list scrollable
             expand=True
         )
 
         # layout
         self.main_column.controls.extend([
             header,
+            ft.Row([self.search_field, self.priority_filter, self.status_filter]),
+            # bulk actions for selected tasks
+            ft.Row([self.select_mode_button, self.bulk_complete_button, self.bulk_priority_dropdown, self.bulk_delete_button, self.bulk_menu], alignment=ft.MainAxisAlignment.END),
             task_list_container, # expand task list to fill space
             ft.Row([self.priority_dropdown, self.task_input, self.add_button], alignment=ft.MainAxisAlignment.SPACE_BETWEEN) # input field and add task button aligned at bottom of screen
         ])
         self.page.add(self.main_column)
 
     def clear_tasks(self):
+        self.mark_dirty(self.task_list)
+        if self.virtualized:
+            self.virtual_list.clear()
+            return
         self.task_list.controls.clear()
+        self.task_rows.clear()
 
     def add_task_to_list(self, task_row):
-        self.task_list.controls.append(task_row)
+        chunks = self.task_list.controls
+        if not chunks or len(chunks[-1].controls) >= ROW_CHUNK_SIZE:
+            chunks.append(TaskRowChunk())
+            self.mark_dirty(self.task_list)
+        chunks[-1].controls.append(task_row)
+        self.mark_dirty(chunks[-1])
+
+    def insert_task_row(self, index, task_row):
+        chunk, offset = self._locate_row(index)
+        if chunk is None:
+            self.add_task_to_list(task_row)
+            return
+        chunk.controls.insert(offset, task_row)
+        self.mark_dirty(chunk)
+        if len(chunk.controls) >= 2 * ROW_CHUNK_SIZE:
+            chunks = self.task_list.controls
+            chunks.insert(chunks.index(chunk) + 1, TaskRowChunk(chunk.controls[ROW_CHUNK_SIZE:]))
+            del chunk.controls[ROW_CHUNK_SIZE:]
+            self.mark_dirty(self.task_list)
+
+    def move_task_row(self, task_row, index):
+        chunk, offset = self._locate_row(index)
+        if chunk is not None and chunk.controls[offset] is task_row:
+            return # already in place
+        self._detach_row(task_row)
+        self.insert_task_row(index, task_row)
+
+    # ids of the tasks shown, in list order
+    def task_order(self):
+        return [task_row.data["task_id"] for chunk in self.task_list.controls for task_row in chunk.controls]
+
+    # lay out the list in the given order, dropping rows whose tasks are gone. chunks are refilled in
+    # place, so only the ones whose rows changed are sent
+    def set_task_order(self, task_ids):
+        rows = [self.task_rows[task_id] for task_id in task_ids]
+        for task_id in set(self.task_rows) - set(task_ids):
+            del self.task_rows[task_id]
+        chunks = self.task_list.controls
+        runs = [rows[start:start + ROW_CHUNK_SIZE] for start in range(0, len(rows), ROW_CHUNK_SIZE)]
+        for chunk, run in zip(chunks, runs):
+            if len(chunk.controls) != len(run) or any(shown is not row for shown, row in zip(chunk.controls, run)):
+                chunk.controls = run
+                self.mark_dirty(chunk)
+        if len(chunks) != len(runs):
+            self._forget_dirty(chunks[len(runs):])
+            chunks[len(runs):] = [TaskRowChunk(run) for run in runs[len(chunks):]]
+            self.mark_dirty(self.task_list)
 
     def remove_task_from_list(self, task_row):
-        self.task_list.controls.remove(task_row)
-
-    def update(self):
-        self.page.update()
+        self._detach_row(task_row)
+        self.task_rows.pop(task_row.data["task_id"], None)
+
+    # the chunk holding the row at index and the row's offset in it; (None, 0) past the last row
+    def _locate_row(self, index):
+        for chunk in self.task_list.controls:
+            if index < len(chunk.controls):
+                return chunk, index
+            index -= len(chunk.controls)
+        return None, 0
+
+    # take a row out of its chunk, dropping the chunk once it is empty
+    def _detach_row(self, task_row):
+        chunks = self.task_list.controls
+        chunk = next(chunk for chunk in chunks if task_row in chunk.controls)
+        chunk.controls.remove(task_row)
+        if chunk.controls:
+            self.mark_dirty(chunk)
+            return
+        chunks.remove(chunk)
+        self._forget_dirty([chunk])
+        self.mark_dirty(self.task_list)
+
+    # controls taken off the page before the next flush are not sent
+    def _forget_dirty(self, controls):
+        with self.dirty_lock:
+            for control in controls:
+                self.dirty_controls.pop(id(control), None)
+
+    # show or hide the selection checkboxes and bulk action controls
+    def set_select_mode(self, select_mode):
+        self.select_mode = select_mode
+        if not select_mode:
+            self.selected_ids.clear()
+        for task_row in self.task_rows.values():
+            task_row.data["select_checkbox"].visible = select_mode
+            task_row.data["select_checkbox"].value = task_row.data["task_id"] in self.selected_ids
+        self.bulk_complete_button.visible = select_mode
+        self.bulk_priority_dropdown.visible = select_mode
+        self.bulk_delete_button.visible = select_mode
+        self.bulk_priority_dropdown.value = None
+        self.mark_dirty(*self.task_rows.values(), self.bulk_complete_button, self.bulk_priority_dropdown, self.bulk_delete_button)
+
+    def set_task_selected(self, task_id, selected):
+        if selected:
+            self.selected_ids.add(task_id)
+        else:
+            self.selected_ids.discard(task_id)
+
+    # (query, completed, priority) from the search box and filters; None where a filter is "all"
+    def search_criteria(self):
+        completed = {"active": False, "done": True}.get(self.status_filter.value)
+        priority = self.priority_filter.value if self.priority_filter.value != "all" else None
+        return (self.search_field.value or "").strip(), completed, priority
+
+    def selected_task_ids(self):
+        return list(self.selected_ids)
+
+    def set_has_more(self, has_more):
+        self.load_more_button.visible = has_more
+        self.mark_dirty(self.load_more_button)
+
+    # callbacks may be coroutines (async presenter); schedule those on the page's event loop
+    def dispatch(self, result):
+        if inspect.isawaitable(result):
+            self.page.run_task(_await, result)
+
+    # block the calling (non-loop) thread until an awaitable finishes on the page's event loop
+    def run_async(self, awaitable):
+        return self.page.run_task(_await, awaitable).result()
+
+    # every page update goes through here so it is counted in app/metrics.py
+    def update(self, *controls):
+        metrics.record_page_update(self.page, controls)
+        self.page.update(*controls)
+
+    # queue changed controls for the next flush(); with no controls the whole page is sent
+    def mark_dirty(self, *controls):
+        with self.dirty_lock:
+            if not controls:
+                self.page_dirty = True
+            for control in controls:
+                self.dirty_controls[id(control)] = control
+
+    # send everything marked dirty since the last flush in a single update. controls that are not on
+    # the page yet are skipped (page.add sends them), as are controls sent with a dirty ancestor
+    def flush(self):
+        with self.dirty_lock:
+            dirty, page_dirty = self.dirty_controls, self.page_dirty
+            self.dirty_controls, self.page_dirty = {}, False
+        if page_dirty:
+            self.update()
+            return
+        controls = [control for control in dirty.values() if control.page is not None and not self._sent_with_ancestor(control, dirty)]
+        if controls:
+            self.update(*controls)
+
+    # an update includes the control's subtree down to (not into) isolated controls
+    @staticmethod
+    def _sent_with_ancestor(control, dirty):
+        while not control.is_isolated() and control.parent is not None:
+            control = control.parent
+            if id(control) in dirty:
+                return True
+        return False
 
     def clear_input(self):
-        self.task_input.value = ""
\ No newline at end of file
+        self.task_input.value = ""
+        self.mark_dirty(self.task_input)
\ No newline at end of file
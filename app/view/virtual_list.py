@@ -0,0 +1,93 @@
+# app/view/virtual_list.py
+import math
+import flet as ft
+
+class VirtualTaskList:
+    """Scrollable task list that only materializes the rows near the viewport.
+
+    Rows have a fixed height so the unrendered parts of the list can be stood in for by two spacers.
+    Rows scrolled out of the window are kept in a pool and re-bound to other tasks instead of being
+    rebuilt, and on_near_end is called when the user scrolls close to the last loaded task.
+    """
+
+    def __init__(self, create_row, bind_row, on_near_end=None, row_extent=56, overscan=10, near_end_rows=20, update=None):
+        self.create_row = create_row # () -> task row
+        self.bind_row = bind_row # (task_row, task) -> None
+        self.update = update # (*controls) -> None, sends controls to the page; list_view.update() if None
+        self.on_near_end = on_near_end
+        self.row_extent = row_extent
+        self.overscan = overscan
+        self.near_end_rows = near_end_rows
+
+        self.tasks = [] # data source, in display order
+        self.rows = [] # materialized rows, rows[i] shows tasks[self.start + i]
+        self.rows_by_id = {} # task id -> materialized row
+        self.pool = [] # detached rows waiting to be reused
+        self.start = 0
+        self.first_visible = 0
+        self.visible_rows = 20 # refined from the viewport size on the first scroll event
+
+        self.top_spacer = ft.Container(height=0)
+        self.bottom_spacer = ft.Container(height=0)
+        self.list_view = ft.ListView(
+            controls=[self.top_spacer, self.bottom_spacer],
+            expand=True,
+            on_scroll=self.on_scroll,
+            on_scroll_interval=50,
+        )
+
+    # replace the data source and re-render the current window
+    def set_tasks(self, tasks):
+        self.tasks = tasks
+        self.render()
+
+    def on_scroll(self, e):
+        self.first_visible = int(max(e.pixels, 0) // self.row_extent)
+        if e.viewport_dimension:
+            self.visible_rows = math.ceil(e.viewport_dimension / self.row_extent)
+        if not self.in_window():
+            self.render()
+            if self.update:
+                self.update(self.list_view)
+            else:
+                self.list_view.update()
+        if self.on_near_end and e.max_scroll_extent - e.pixels < self.near_end_rows * self.row_extent:
+            self.on_near_end()
+
+    # True while the visible rows (without overscan) are all materialized
+    def in_window(self):
+        end = min(len(self.tasks), self.first_visible + self.visible_rows)
+        return self.start <= self.first_visible and end <= self.start + len(self.rows)
+
+    # bind the rows around the viewport to their tasks, reusing row controls where possible
+    def render(self):
+        total = len(self.tasks)
+        start = min(max(0, self.first_visible - self.overscan), total)
+        end = min(total, self.first_visible + self.visible_rows + self.overscan)
+        needed = end - start
+
+        while len(self.rows) > needed:
+            self.pool.append(self.rows.pop())
+        while len(self.rows) < needed:
+            self.rows.append(self.pool.pop() if self.pool else self.create_row())
+
+        self.rows_by_id.clear()
+        for row, task in zip(self.rows, self.tasks[start:end]):
+            self.bind_row(row, task)
+            self.rows_by_id[task["id"]] = row
+
+        self.start = start
+        self.top_spacer.height = start * self.row_extent
+        self.bottom_spacer.height = (total - end) * self.row_extent
+        self.list_view.controls = [self.top_spacer, *self.rows, self.bottom_spacer]
+
+    def clear(self):
+        self.pool.extend(self.rows)
+        self.rows = []
+        self.rows_by_id.clear()
+        self.tasks = []
+        self.start = 0
+        self.first_visible = 0
+        self.top_spacer.height = 0
+        self.bottom_spacer.height = 0
+        self.list_view.controls = [self.top_spacer, self.bottom_spacer]
@@ -0,0 +1,54 @@
+# benchmarks/sanitizer.py
+"""Compare app.model.sanitizer with plain bleach.clean on task-like text.
+
+    python -m benchmarks.sanitizer [--count 20000]
+"""
+import argparse
+import json
+import random
+import timeit
+import bleach
+from app.model import sanitizer
+
+WORDS = ["buy", "milk", "call", "mom", "fix", "bug", "in", "login", "page", "review", "PR", "for",
+         "release", "book", "flights", "to", "Denver", "pay", "rent", "email", "Sam", "about", "Q3"]
+# occasional markup and ampersands, as real input sometimes has
+SPECIAL = ["R&D", "<b>urgent</b>", "a < b", "Tom & Jerry", "<script>alert(1)</script>"]
+
+def make_texts(count, seed=0):
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(count):
+        words = rng.choices(WORDS, k=rng.randint(2, 8))
+        if rng.random() < 0.1:
+            words.insert(rng.randrange(len(words) + 1), rng.choice(SPECIAL))
+        texts.append(" ".join(words))
+    return texts
+
+def bench(label, fn, texts, repeat=3):
+    best = min(timeit.repeat(lambda: fn(texts), number=1, repeat=repeat))
+    return {"case": label, "total_ms": round(best * 1000, 2), "per_call_us": round(best / len(texts) * 1e6, 2)}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sanitizer micro-benchmark.")
+    parser.add_argument("--count", type=int, default=20000)
+    args = parser.parse_args(argv)
+    texts = make_texts(args.count)
+    # the result must match bleach exactly
+    assert [sanitizer.sanitize(t) for t in texts] == [bleach.clean(t) for t in texts]
+
+    def uncached(texts):
+        sanitizer._clean.cache_clear()
+        return [sanitizer.sanitize(t) for t in texts]
+
+    results = [
+        bench("bleach.clean", lambda texts: [bleach.clean(t) for t in texts], texts),
+        bench("sanitize (cold cache)", uncached, texts),
+        bench("sanitize (warm cache)", lambda texts: [sanitizer.sanitize(t) for t in texts], texts),
+        bench("sanitize_many", sanitizer.sanitize_many, texts),
+    ]
+    for result in results:
+        print(json.dumps(result))
+
+if __name__ == "__main__":
+    main()
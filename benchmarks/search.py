@@ -0,0 +1,59 @@
+# benchmarks/search.py
+"""Time TaskModel.search over a fully loaded list of generated tasks.
+
+    python -m benchmarks.search [--count 100000]
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+from app.model.backends.memory import MemoryBackend
+from app.model.model import TaskModel
+from app.model.store import task_sort_key
+
+WORDS = ["buy", "milk", "call", "mom", "fix", "bug", "in", "login", "page", "review", "release", "for",
+         "book", "flights", "to", "Denver", "pay", "rent", "email", "Sam", "about", "Q3", "draft", "report"]
+
+QUERIES = [
+    ("one word", "review", {}),
+    ("two prefixes", "rev dra", {}),
+    ("rare word", "task 4242", {}),
+    ("short prefix", "b", {}),
+    ("word + done", "denver", {"completed": True}),
+    ("priority only", "", {"priority": "high"}),
+    ("no match", "zzz", {}),
+]
+
+def make_model(count, seed=0):
+    rng = random.Random(seed)
+    tasks = [
+        {"id": i, "text": " ".join(rng.choices(WORDS, k=rng.randint(2, 6))) + f" task {i}", "priority": rng.randrange(3), "completed": rng.random() < 0.2}
+        for i in range(1, count + 1)
+    ]
+    model = TaskModel(page_size=count, backend=MemoryBackend(publish=False))
+    model.has_more = False # searched in memory, as once every page is loaded
+    model._set_tasks(sorted(tasks, key=task_sort_key))
+    return model
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Search micro-benchmark.")
+    parser.add_argument("--count", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args(argv)
+    model = make_model(args.count)
+
+    start = time.perf_counter()
+    model.search("x") # the first search builds the index
+    print(json.dumps({"case": "build index", "count": args.count, "ms": round((time.perf_counter() - start) * 1000, 2)}))
+
+    for label, query, filters in QUERIES:
+        times = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            results = model.search(query, **filters)
+            times.append(time.perf_counter() - start)
+        print(json.dumps({"case": label, "results": len(results), "median_ms": round(statistics.median(times) * 1000, 3), "max_ms": round(max(times) * 1000, 3)}))
+
+if __name__ == "__main__":
+    main()
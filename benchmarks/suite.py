@@ -0,0 +1,264 @@
+# benchmarks/suite.py
+"""Headless benchmarks for the model and presenter hot paths.
+
+    python -m benchmarks.suite [--sizes 100,10000,100000] [--output results.json]
+    python -m benchmarks.suite --baseline benchmarks/baseline.json   # exit 1 on regressions
+
+Each run drives a TaskPresenter against a stub Flet page and an in-memory backend seeded with
+`size` tasks, and reports per operation: latency (median / p95 ms), Flet controls created, page
+updates issued and controls sent to the client per call (the size of what goes over the
+websocket), and peak Python memory (tracemalloc) for one call. Set
+TASK_LIST_VIRTUALIZED=true to benchmark the virtualized list.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from concurrent.futures import Future
+from types import SimpleNamespace
+import flet as ft
+from app.model.backends.memory import MemoryBackend
+from app.model.model import TaskModel
+from app.model.store import task_sort_key, task_store
+from app.presenter.presenter import TaskPresenter
+from app.view.view import TASK_LIST_VIRTUALIZED
+from app.metrics import count_controls
+
+DEFAULT_SIZES = [100, 10000, 100000]
+DEFAULT_REPEAT = 30
+# relative slowdown (latency, memory) tolerated before a result counts as a regression
+DEFAULT_TOLERANCE = 0.25
+# run settings a baseline must share to be compared: the first calls pay one-time costs (building
+# rows, filling caches) the later ones don't, so the per-call averages shift with the repeat count
+COMPARABLE_META = ["repeat", "virtualized"]
+# per-call counts compared exactly; any increase is a regression
+COUNT_METRICS = ["controls_created", "page_updates", "controls_sent"]
+# compared relative to the baseline, ignoring differences smaller than the noise floor
+RATIO_METRICS = {"median_ms": 0.05, "peak_kb": 16}
+
+class StubPage:
+    """The parts of ft.Page the view and presenter use, with no client attached. Like ft.Page, it
+    mounts the controls it sends (sets their page and parent) and sends a whole subtree per control."""
+
+    def __init__(self):
+        self.window = SimpleNamespace(width=None)
+        self.platform = ft.PagePlatform.LINUX
+        self.client_ip = "127.0.0.1"
+        self.session_id = "benchmark"
+        self.controls = []
+        self.updates = 0
+        self.controls_sent = 0
+        self.overhead = 0 # seconds spent in the stub's own bookkeeping, left out of the timings
+        self.on_close = None
+
+    def update(self, *controls):
+        start = time.perf_counter()
+        self.updates += 1
+        for control in controls or self.controls:
+            self.controls_sent += count_controls(control)
+            self.mount(control)
+        self.overhead += time.perf_counter() - start
+
+    def add(self, *controls):
+        self.controls.extend(controls)
+        for control in controls:
+            self.mount(control)
+
+    def mount(self, control, parent=None):
+        control.page = self
+        if parent is not None:
+            control.parent = parent
+        for child in control._get_children():
+            if child is not None:
+                self.mount(child, control)
+
+    def open(self, control):
+        control.open = True
+
+    def close(self, control):
+        control.open = False
+
+    def run_thread(self, handler, *args, **kwargs):
+        handler(*args, **kwargs)
+
+    def run_task(self, handler, *args, **kwargs):
+        future = Future()
+        future.set_result(asyncio.run(handler(*args, **kwargs)))
+        return future
+
+# counts every Flet control constructed while active
+@contextlib.contextmanager
+def counting_controls():
+    counter = SimpleNamespace(created=0)
+    original = ft.Control.__init__
+
+    def init(self, *args, **kwargs):
+        counter.created += 1
+        original(self, *args, **kwargs)
+
+    ft.Control.__init__ = init
+    try:
+        yield counter
+    finally:
+        ft.Control.__init__ = original
+
+def make_tasks(size, seed=0):
+    rng = random.Random(seed)
+    tasks = [{"id": i, "text": f"task {i}", "priority": rng.randrange(3), "completed": rng.random() < 0.2} for i in range(1, size + 1)]
+    return sorted(tasks, key=task_sort_key) # appending in order keeps seeding the backend linear
+
+def make_presenter(size):
+    # publish=False: measure the handler itself, not the change feed echoing it back
+    backend = MemoryBackend(make_tasks(size), publish=False)
+    page = StubPage()
+    with contextlib.redirect_stdout(io.StringIO()): # the view logs each connection
+        presenter = TaskPresenter(page, model=TaskModel(backend=backend))
+        task_store.invalidate()
+        presenter.run()
+    return presenter, page
+
+def _row(presenter, rng):
+    return presenter.view.get_task_row(rng.choice(list(presenter.view.task_rows)))
+
+# each operation is (prepare, call): prepare picks its target outside the timed section
+def operations(presenter, rng):
+    view = presenter.view
+    counter = {"n": 0}
+
+    def unique(prefix):
+        counter["n"] += 1
+        return f"{prefix} {counter['n']}"
+
+    def load():
+        task_store.invalidate()
+        return presenter.load_tasks
+
+    def add():
+        view.task_input.value = unique("bench add")
+        view.priority_dropdown.value = rng.choice(["high", "med", "low"])
+        return lambda: view.add_button.on_click(None)
+
+    def toggle():
+        checkbox = _row(presenter, rng).data["task_checkbox"]
+        checkbox.value = not checkbox.value
+        return lambda: checkbox.on_change(SimpleNamespace(control=checkbox))
+
+    def save_edit():
+        controls = _row(presenter, rng).data
+        controls["text_field"].value = unique("bench edit")
+        return lambda: controls["save_button"].on_click(None)
+
+    def delete():
+        button = _row(presenter, rng).data["delete_button"]
+        return lambda: button.on_click(None)
+
+    return {"load_tasks": load, "add_task": add, "toggle_task": toggle, "on_save_edit": save_edit, "delete_task": delete}
+
+def measure(presenter, page, counter, prepare, repeat):
+    times, controls, updates, sent = [], 0, 0, 0
+    for _ in range(repeat):
+        call = prepare()
+        created, updated, sent_before, overhead = counter.created, page.updates, page.controls_sent, page.overhead
+        start = time.perf_counter()
+        call()
+        times.append(time.perf_counter() - start - (page.overhead - overhead))
+        controls += counter.created - created
+        updates += page.updates - updated
+        sent += page.controls_sent - sent_before
+    # one more call under tracemalloc for memory; kept out of the timings above
+    call = prepare()
+    tracemalloc.start()
+    call()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    times.sort()
+    return {
+        "median_ms": round(statistics.median(times) * 1000, 4),
+        "p95_ms": round(times[min(len(times) - 1, int(len(times) * 0.95))] * 1000, 4),
+        "controls_created": round(controls / repeat, 2),
+        "page_updates": round(updates / repeat, 2),
+        "controls_sent": round(sent / repeat, 2),
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+def run(sizes=DEFAULT_SIZES, repeat=DEFAULT_REPEAT, seed=0):
+    results = []
+    with counting_controls() as counter:
+        for size in sizes:
+            presenter, page = make_presenter(size)
+            rng = random.Random(seed)
+            for name, prepare in operations(presenter, rng).items():
+                result = measure(presenter, page, counter, prepare, repeat)
+                results.append(dict({"size": size, "op": name}, **result))
+                print(json.dumps(results[-1]), file=sys.stderr)
+            presenter.on_session_close(None)
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "repeat": repeat,
+            "virtualized": TASK_LIST_VIRTUALIZED,
+        },
+        "results": results,
+    }
+
+# results that got worse than the baseline: latency/memory beyond the tolerance, counts at all.
+# raises ValueError if the baseline was run with other settings or none of the same sizes
+def compare(report, baseline, tolerance=DEFAULT_TOLERANCE):
+    meta, baseline_meta = report.get("meta", {}), baseline.get("meta", {})
+    differing = [f"{key}={baseline_meta.get(key)} (this run: {meta.get(key)})" for key in COMPARABLE_META if baseline_meta.get(key) != meta.get(key)]
+    if differing:
+        raise ValueError("baseline was run with " + ", ".join(differing))
+    previous = {(r["size"], r["op"]): r for r in baseline["results"]}
+    if not any((result["size"], result["op"]) in previous for result in report["results"]):
+        raise ValueError("baseline has none of the sizes run")
+    regressions = []
+    for result in report["results"]:
+        before = previous.get((result["size"], result["op"]))
+        if before is None:
+            continue
+        for metric, floor in RATIO_METRICS.items():
+            if result[metric] > before[metric] * (1 + tolerance) and result[metric] - before[metric] > floor:
+                regressions.append(dict(size=result["size"], op=result["op"], metric=metric, baseline=before[metric], current=result[metric]))
+        for metric in COUNT_METRICS:
+            if metric in before and result[metric] > before[metric]:
+                regressions.append(dict(size=result["size"], op=result["op"], metric=metric, baseline=before[metric], current=result[metric]))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the model and presenter hot paths.")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)))
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--output", help="write the results to this file")
+    parser.add_argument("--baseline", help="compare against results saved earlier with --output")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    report = run([int(size) for size in args.sizes.split(",")], args.repeat)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        try:
+            regressions = compare(report, baseline, args.tolerance)
+        except ValueError as ve:
+            print("Cannot compare with the baseline:", ve, file=sys.stderr)
+            sys.exit(2)
+        for regression in regressions:
+            print("REGRESSION", json.dumps(regression), file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,29 @@
 # main.py
+import os
 import flet as ft
 from app.presenter.presenter import TaskPresenter
+from app.presenter.async_presenter import AsyncTaskPresenter
+from app.model.model import TaskModel
+from app.model.offline_model import OfflineTaskModel
+from app.users import session_user_id, session_user_id_async
+from app import metrics
+
+# run the presenter's handlers as coroutines on the event loop instead of in worker threads
+USE_ASYNC_MODEL = os.getenv("TASK_MODEL_ASYNC", "false").lower() == "true"
+# serve tasks from a local SQLite replica synced with supabase in the background (sync handlers only)
+USE_OFFLINE_MODEL = os.getenv("TASK_MODEL_OFFLINE", "false").lower() == "true"
 
 def main(page: ft.Page):
-    presenter = TaskPresenter(page)
+    # the offline replica holds the shared list only
+    model = OfflineTaskModel() if USE_OFFLINE_MODEL else TaskModel(user_id=session_user_id(page))
+    presenter = TaskPresenter(page, model=model)
     presenter.run()
 
-ft.app(target=main)
\ No newline at end of file
+async def main_async(page: ft.Page):
+    presenter = AsyncTaskPresenter(page, user_id=await session_user_id_async(page))
+    await presenter.run()
+
+# prometheus endpoint, when METRICS_PORT is set
+metrics.start_server()
+
+ft.app(target=main_async if USE_ASYNC_MODEL else main)
\ No newline at end of file
@@ -0,0 +1,2 @@
+-- publish row changes on the tasks table to Supabase Realtime
+alter publication supabase_realtime add table public.tasks;
@@ -0,0 +1,2 @@
+-- composite index matching the app's display order, used by keyset pagination in TaskModel.fetch_page
+create index if not exists tasks_completed_priority_id_idx on public.tasks (completed, priority, id);
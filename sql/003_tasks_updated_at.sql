@@ -0,0 +1,16 @@
+-- last-modified time of each task, the watermark the offline replica pulls changes by (app/model/sync.py)
+alter table public.tasks add column if not exists updated_at timestamptz not null default now();
+
+create or replace function public.set_tasks_updated_at() returns trigger
+language plpgsql as $$
+begin
+    new.updated_at = clock_timestamp();
+    return new;
+end;
+$$;
+
+drop trigger if exists tasks_set_updated_at on public.tasks;
+create trigger tasks_set_updated_at before insert or update on public.tasks
+    for each row execute function public.set_tasks_updated_at();
+
+create index if not exists tasks_updated_at_id_idx on public.tasks (updated_at, id);
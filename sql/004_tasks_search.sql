@@ -0,0 +1,7 @@
+-- full-text search over task text, used by TaskModel.search when the list is too large to search
+-- in memory. 'simple' keeps words as typed (no stemming) so prefix queries like 'gro:*' behave
+-- like the in-memory index in app/model/search.py
+alter table public.tasks add column if not exists search tsvector
+    generated always as (to_tsvector('simple', text)) stored;
+
+create index if not exists tasks_search_idx on public.tasks using gin (search);
@@ -0,0 +1,12 @@
+-- per-user task lists (TASK_USER_MODE, app/users.py). rows with a null user_id form the shared list
+alter table public.tasks add column if not exists user_id uuid;
+
+-- display order within one user's list: loads, keyset pages and counts scoped by user_id are index
+-- range scans over that user's rows only
+create index if not exists tasks_user_completed_priority_id_idx on public.tasks (user_id, completed, priority, id);
+
+-- duplicates are checked within a user's list, so the table-wide unique constraint on the text is
+-- dropped for two users to have the same task
+alter table public.tasks drop constraint if exists tasks_text_key;
+create unique index if not exists tasks_user_text_idx on public.tasks (user_id, lower(text)) where user_id is not null;
+create unique index if not exists tasks_shared_text_idx on public.tasks (lower(text)) where user_id is null;
@@ -0,0 +1,31 @@
+-- delta refresh of the cached task lists (TASK_DELTA_SYNC, app/model/store.py): rows changed since a
+-- list's watermark are found by updated_at (sql/003_tasks_updated_at.sql), deleted rows by the
+-- tombstone this trigger records. deletes stay real deletes, so the unique text indexes and every
+-- existing query keep working unchanged
+create table if not exists public.task_tombstones (
+    id bigint primary key,
+    user_id uuid,
+    deleted_at timestamptz not null default clock_timestamp()
+);
+
+create or replace function public.record_task_tombstone() returns trigger
+language plpgsql as $$
+begin
+    insert into public.task_tombstones (id, user_id, deleted_at)
+    values (old.id, old.user_id, clock_timestamp())
+    on conflict (id) do update set user_id = excluded.user_id, deleted_at = excluded.deleted_at;
+    return old;
+end;
+$$;
+
+drop trigger if exists tasks_record_tombstone on public.tasks;
+create trigger tasks_record_tombstone after delete on public.tasks
+    for each row execute function public.record_task_tombstone();
+
+-- changes of one user's list since a watermark are index range scans
+create index if not exists tasks_user_updated_at_idx on public.tasks (user_id, updated_at);
+create index if not exists task_tombstones_user_deleted_at_idx on public.task_tombstones (user_id, deleted_at);
+
+-- tombstones only need to outlive TASK_DELTA_MAX_AGE (a list older than that is reloaded in full),
+-- so they can be purged on a schedule, e.g.
+--   delete from public.task_tombstones where deleted_at < now() - interval '2 days';
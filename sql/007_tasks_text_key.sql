@@ -0,0 +1,6 @@
+-- lower(text) as a stored column, so the importer (app/model/transfer.py) can find which texts of a
+-- batch already exist with one text_key=in.(...) query instead of an insert rejected per duplicate.
+-- postgrest filters columns, not expressions, so the lower(text) unique indexes can't serve it
+alter table public.tasks add column if not exists text_key text generated always as (lower(text)) stored;
+
+create index if not exists tasks_user_text_key_idx on public.tasks (user_id, text_key);
@@ -0,0 +1,41 @@
+-- cap on the tasks in one list (TASK_USER_LIMIT, app/model/model.py), enforced by the database so
+-- sessions in other processes can't add past it between their checks. read from the app.task_list_limit
+-- setting, so the limit changes without redefining the function; set it to match the app's, e.g.
+--   alter database postgres set app.task_list_limit = '500';
+-- unset or 0 turns the check off
+create or replace function public.task_list_limit() returns integer
+language sql stable as $$ select coalesce(nullif(current_setting('app.task_list_limit', true), '')::integer, 0) $$;
+
+create or replace function public.enforce_task_list_limit() returns trigger
+language plpgsql as $$
+declare
+    list record;
+    list_limit integer := public.task_list_limit();
+    list_size integer;
+begin
+    if list_limit <= 0 then
+        return null;
+    end if;
+    for list in select distinct user_id from inserted loop
+        -- inserts into one list take turns until commit, so each one counts the rows committed
+        -- before it and two can't both see room for their rows
+        perform pg_advisory_xact_lock(hashtext('tasks:' || coalesce(list.user_id::text, 'shared')));
+        if list.user_id is null then
+            select count(*) into list_size from public.tasks where user_id is null;
+        else
+            select count(*) into list_size from public.tasks where user_id = list.user_id;
+        end if;
+        if list_size > list_limit then
+            -- matched by the app to raise TaskLimitError
+            raise exception 'task limit reached' using errcode = 'check_violation';
+        end if;
+    end loop;
+    return null;
+end;
+$$;
+
+-- once per insert statement, so a bulk insert counts each list once. also fires for the inserts of an upsert
+drop trigger if exists tasks_enforce_list_limit on public.tasks;
+create trigger tasks_enforce_list_limit after insert on public.tasks
+    referencing new table as inserted
+    for each statement execute function public.enforce_task_list_limit();
@@ -0,0 +1,13 @@
+-- bulk update with different values per row, used by the write coalescer (app/model/coalescer.py)
+-- and by the offline sync engine's pushes (app/model/sync.py).
+-- an upsert on id would insert a task again if it was deleted after the edit was queued; this only
+-- updates tasks that still exist in the list and returns them, so the app can tell which are gone
+create or replace function public.update_tasks(task_rows jsonb, list_user_id uuid default null)
+returns setof public.tasks
+language sql as $$
+    update public.tasks as task
+    set text = edit.text, priority = edit.priority, completed = edit.completed
+    from jsonb_to_recordset(task_rows) as edit(id bigint, text text, priority integer, completed boolean)
+    where task.id = edit.id and task.user_id is not distinct from list_user_id
+    returning task.*;
+$$;
@@ -0,0 +1,291 @@
+# tests/fakes.py
+"""Test doubles: an in-memory stand-in for the supabase client's table queries (enough for the
+queries the app builds) and a Flet page with no client attached."""
+import asyncio
+import datetime
+import itertools
+import re
+from concurrent.futures import Future
+from types import SimpleNamespace
+import flet as ft
+
+def _split(expression):
+    parts, depth, start = [], 0, 0
+    for i, char in enumerate(expression):
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "," and depth == 0:
+            parts.append(expression[start:i])
+            start = i + 1
+    parts.append(expression[start:])
+    return parts
+
+def _value(raw, current):
+    raw = raw.strip('"')
+    if isinstance(current, bool):
+        return raw == "true"
+    if isinstance(current, int):
+        return int(raw)
+    return raw
+
+# words as postgres' 'simple' text search configuration splits them
+_WORD = re.compile(r"[^\W_]+")
+
+OPERATORS = {
+    "eq": lambda a, b: a == b,
+    "gt": lambda a, b: a is not None and a > b,
+    "lt": lambda a, b: a is not None and a < b,
+}
+
+# postgrest's or=(...) syntax: col.op.value terms and nested and(...) groups
+def _condition(expression):
+    if expression.startswith("and("):
+        terms = [_condition(part) for part in _split(expression[4:-1])]
+        return lambda row: all(term(row) for term in terms)
+    column, op, raw = expression.split(".", 2)
+    return lambda row: OPERATORS[op](row.get(column), _value(raw, row.get(column)))
+
+class FakeQuery:
+    def __init__(self, table, op, payload=None, **options):
+        self.table, self.op, self.payload, self.options = table, op, payload, options
+        self.filters, self.orders, self.row_limit = [], [], None
+
+    def select(self, columns="*", count=None, head=False):
+        self.options.update(columns=columns, count=count, head=head)
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def gt(self, column, value):
+        self.filters.append(lambda row: row.get(column) is not None and row[column] > value)
+        return self
+
+    def in_(self, column, values):
+        values = set(values)
+        self.filters.append(lambda row: row.get(column) in values)
+        return self
+
+    def is_(self, column, value):
+        self.filters.append(lambda row: row.get(column) is None)
+        return self
+
+    def or_(self, expression):
+        terms = [_condition(part) for part in _split(expression)]
+        self.filters.append(lambda row: any(term(row) for term in terms))
+        return self
+
+    # only full-text search over the generated tasks.search column (sql/004_tasks_search.sql):
+    # a tsquery of prefix terms joined by &, e.g. "gro:* & mil:*"
+    def filter(self, column, operator, value):
+        assert column == "search" and operator.startswith("fts"), (column, operator)
+        prefixes = [term.strip().removesuffix(":*") for term in value.split("&")]
+        self.table.client.tsqueries.append(value)
+        self.filters.append(lambda row: all(any(word.startswith(prefix) for word in _WORD.findall(row["text"].lower())) for prefix in prefixes))
+        return self
+
+    def order(self, column, desc=False):
+        self.orders.append((column, desc))
+        return self
+
+    def limit(self, count):
+        self.row_limit = count
+        return self
+
+    def execute(self):
+        self.table.client.requests.append((self.table.name, self.op))
+        if self.table.client.fail is not None:
+            raise self.table.client.fail
+        result = getattr(self, f"_{self.op}")()
+        return self._awaitable(result) if self.table.client.asynchronous else result
+
+    @staticmethod
+    async def _awaitable(result):
+        return result
+
+    def _matching(self):
+        return [row for row in self.table.rows if all(match(row) for match in self.filters)]
+
+    def _select(self):
+        rows = self._matching()
+        for column, desc in reversed(self.orders):
+            rows.sort(key=lambda row: row[column], reverse=desc)
+        if self.row_limit is not None:
+            rows = rows[:self.row_limit]
+        columns = self.options.get("columns", "*")
+        if columns != "*":
+            rows = [{column: row.get(column) for column in columns.split(",")} for row in rows]
+        else:
+            rows = [dict(row) for row in rows]
+        return SimpleNamespace(data=[] if self.options.get("head") else rows, count=len(rows))
+
+    def _insert(self):
+        rows = [dict(row) for row in self.payload]
+        for row in rows:
+            row.setdefault("id", next(self.table.client.ids))
+        self.table.check_unique(rows)
+        return SimpleNamespace(data=[dict(self.table.write(row)) for row in rows], count=None)
+
+    def _upsert(self):
+        saved = []
+        key = self.options.get("on_conflict") or "id"
+        existing = {self.table.key(row, key): row for row in self.table.rows}
+        rows = []
+        for row in self.payload:
+            current = existing.get(self.table.key(row, key))
+            if current is not None and self.options.get("ignore_duplicates"):
+                continue
+            merged = dict(current or {}, **row)
+            merged.setdefault("id", next(self.table.client.ids))
+            rows.append(merged)
+        self.table.check_unique(rows)
+        for row in rows:
+            saved.append(dict(self.table.write(row)))
+        return SimpleNamespace(data=saved, count=None)
+
+    def _update(self):
+        rows = self._matching()
+        self.table.check_unique([dict(row, **self.payload) for row in rows])
+        return SimpleNamespace(data=[dict(self.table.write(dict(row, **self.payload))) for row in rows], count=None)
+
+    def _delete(self):
+        rows = self._matching()
+        self.table.rows = [row for row in self.table.rows if row not in rows]
+        return SimpleNamespace(data=[dict(row) for row in rows], count=None)
+
+    # update_tasks(task_rows, list_user_id) of sql/009_update_tasks.sql: rows of tasks that are not
+    # in the list are skipped
+    def _update_tasks(self):
+        current = {row["id"]: row for row in self.table.rows if row.get("user_id") == self.payload["list_user_id"]}
+        rows = [dict(current[row["id"]], **row) for row in self.payload["task_rows"] if row["id"] in current]
+        self.table.check_unique(rows)
+        return SimpleNamespace(data=[dict(self.table.write(row)) for row in rows], count=None)
+
+class FakeTable:
+    def __init__(self, client, name):
+        self.client, self.name, self.rows = client, name, []
+
+    def select(self, columns="*", count=None, head=False):
+        return FakeQuery(self, "select").select(columns, count, head)
+
+    def insert(self, rows):
+        return FakeQuery(self, "insert", rows if isinstance(rows, list) else [rows])
+
+    def upsert(self, rows, on_conflict="", ignore_duplicates=False):
+        return FakeQuery(self, "upsert", rows if isinstance(rows, list) else [rows], on_conflict=on_conflict, ignore_duplicates=ignore_duplicates)
+
+    def update(self, fields):
+        return FakeQuery(self, "update", fields)
+
+    def delete(self):
+        return FakeQuery(self, "delete")
+
+    @staticmethod
+    def key(row, columns):
+        return tuple(str(row.get(column)).lower() if column == "text" else row.get(column) for column in columns.split(","))
+
+    # the (user_id, lower(text)) unique indexes of sql/005_tasks_user_id.sql
+    def check_unique(self, rows):
+        if self.name != "tasks":
+            return
+        ids = {row["id"] for row in rows}
+        taken = {(row.get("user_id"), row["text"].lower()) for row in self.rows if row["id"] not in ids}
+        for row in rows:
+            key = (row.get("user_id"), row["text"].lower())
+            if key in taken:
+                raise Exception('duplicate key value violates unique constraint "tasks_text_key"')
+            taken.add(key)
+
+    # insert or replace a row by id, stamping updated_at like the trigger in sql/003_tasks_updated_at.sql
+    # and text_key like its generated column (sql/007_tasks_text_key.sql)
+    def write(self, row):
+        row.setdefault("user_id", None)
+        if self.name == "tasks":
+            row["updated_at"] = self.client.now()
+            row["text_key"] = row["text"].lower()
+        self.rows = [existing for existing in self.rows if existing["id"] != row["id"]] + [row]
+        return row
+
+class FakeClient:
+    """Tables of dict rows; every executed query is recorded in `requests` as (table, op), every
+    full-text filter in `tsqueries`, and setting `fail` to an exception makes every query raise it.
+    With asynchronous=True, execute() returns an awaitable like the async client's."""
+
+    def __init__(self, asynchronous=False):
+        self.asynchronous = asynchronous
+        self.tables = {}
+        self.requests = []
+        self.fail = None
+        self.tsqueries = [] # full-text search filters, as sent
+        self.ids = itertools.count(1)
+        self.clock = datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc)
+
+    def table(self, name):
+        if name not in self.tables:
+            self.tables[name] = FakeTable(self, name)
+        return self.tables[name]
+
+    def rows(self, name="tasks"):
+        return self.table(name).rows
+
+    # database functions; only update_tasks, recorded in `requests` as ("tasks", "update_tasks")
+    def rpc(self, name, params):
+        assert name == "update_tasks", name
+        return FakeQuery(self.table("tasks"), name, params)
+
+    def now(self):
+        self.clock += datetime.timedelta(milliseconds=1)
+        return self.clock.isoformat()
+
+class StubPage:
+    """The parts of ft.Page the view and presenter use, with no client attached. Like ft.Page, it
+    mounts the controls it sends (sets their page and parent). Every update is recorded in `sent`
+    as the controls passed to it (none: the whole page)."""
+
+    def __init__(self):
+        self.window = SimpleNamespace(width=None)
+        self.platform = ft.PagePlatform.LINUX
+        self.client_ip = "127.0.0.1"
+        self.session_id = "test"
+        self.controls = []
+        self.sent = []
+        self.on_close = None
+
+    @property
+    def updates(self):
+        return len(self.sent)
+
+    def update(self, *controls):
+        self.sent.append(controls)
+        for control in controls or self.controls:
+            self.mount(control)
+
+    def add(self, *controls):
+        self.controls.extend(controls)
+        for control in controls:
+            self.mount(control)
+
+    def mount(self, control, parent=None):
+        control.page = self
+        if parent is not None:
+            control.parent = parent
+        for child in control._get_children():
+            if child is not None:
+                self.mount(child, control)
+
+    def open(self, control):
+        control.open = True
+
+    def close(self, control):
+        control.open = False
+
+    def run_thread(self, handler, *args, **kwargs):
+        handler(*args, **kwargs)
+
+    def run_task(self, handler, *args, **kwargs):
+        future = Future()
+        future.set_result(asyncio.run(handler(*args, **kwargs)))
+        return future
@@ -0,0 +1,116 @@
+# tests/test_async_model.py
+import asyncio
+import threading
+import unittest
+from unittest import mock
+from app.model.async_model import AsyncTaskModel
+from app.model.backends import DuplicateTaskError
+from app.model.backends.memory import MemoryBackend
+from app.model.backends import supabase
+from app.model.backends.supabase import SupabaseBackend
+from app.model.store import TaskStore
+from tests.fakes import FakeClient
+
+class AsyncTaskModelTest(unittest.TestCase):
+    def setUp(self):
+        self.client = FakeClient(asynchronous=True)
+        patcher = mock.patch("app.model.backends.supabase.get_async_client", mock.AsyncMock(return_value=self.client))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def model(self, user_id=None):
+        model = AsyncTaskModel(backend=SupabaseBackend(), user_id=user_id)
+        model.breaker = None
+        model.task_limit = 0
+        model.store = TaskStore(ttl=30)
+        return model
+
+    def test_update_to_an_existing_text_raises_duplicate(self):
+        model = self.model()
+        asyncio.run(model.add_tasks([("buy milk", "low"), ("walk dog", "low")]))
+        # a session that has not loaded the other task only finds out from the database
+        other = self.model()
+        with self.assertRaises(DuplicateTaskError):
+            asyncio.run(other.update_task(2, "Buy Milk", "low", False))
+
+    def test_other_update_errors_are_not_duplicates(self):
+        model = self.model()
+        self.client.fail = Exception("connection reset")
+        with self.assertRaises(Exception) as raised:
+            asyncio.run(model.update_task(1, "buy milk", "low", False))
+        self.assertNotIsInstance(raised.exception, DuplicateTaskError)
+        self.assertIn("Error updating task", str(raised.exception))
+
+    def test_writes_are_stamped_with_the_user(self):
+        model = self.model(user_id="u1")
+        asyncio.run(model.add_task("buy milk", "low"))
+        asyncio.run(model.add_tasks([("walk dog", "low")]))
+        self.assertEqual([row["user_id"] for row in self.client.rows()], ["u1", "u1"])
+
+    def test_queries_match_the_sync_backend(self):
+        sync_client = FakeClient()
+        for client in (self.client, sync_client): # a task in the shared list, which u1 must not see
+            client.table("tasks").rows.append({"id": 100, "text": "shared", "priority": 1, "completed": False, "user_id": None})
+        model = self.model(user_id="u1")
+        asyncio.run(model.add_tasks([("buy milk", "low"), ("walk dog", "high")]))
+        asyncio.run(model.update_tasks([1, 2], completed=True))
+        loaded = asyncio.run(model.load_tasks())
+        with mock.patch("app.model.backends.supabase.get_client", return_value=sync_client):
+            backend = SupabaseBackend().for_user("u1")
+            backend.insert([{"text": "buy milk", "completed": False, "priority": 2}, {"text": "walk dog", "completed": False, "priority": 0}])
+            backend.update([1, 2], {"completed": True})
+            page = backend.fetch_page(None, 100, "id,text,priority,completed")
+        self.assertEqual(loaded, page)
+        self.assertEqual([task["id"] for task in page], [2, 1])
+        self.assertEqual(self.client.rows(), sync_client.rows())
+        self.assertEqual(self.client.requests, sync_client.requests)
+
+class AsyncLocalBackendTest(unittest.TestCase):
+    def test_local_backend_runs_on_a_worker_thread(self):
+        backend = MemoryBackend(publish=False)
+        model = AsyncTaskModel(backend=backend)
+        model.breaker = None
+        model.task_limit = 0
+        model.store = TaskStore(ttl=30)
+        threads = []
+        insert = backend.insert
+        def recorded_insert(rows):
+            threads.append(threading.current_thread())
+            return insert(rows)
+        with mock.patch.object(backend, "insert", recorded_insert):
+            asyncio.run(model.add_task("buy milk", "low"))
+        self.assertNotIn(threading.main_thread(), threads)
+        self.assertEqual([task["text"] for task in asyncio.run(model.load_tasks())], ["buy milk"])
+        with self.assertRaises(DuplicateTaskError):
+            asyncio.run(AsyncTaskModel(backend=backend).add_task("Buy Milk", "low"))
+
+class AsyncClientTest(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.multiple(supabase, _async_client=None, _async_client_settings=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_secrets_are_first_read_off_the_event_loop(self):
+        threads = []
+        def settings():
+            threads.append(threading.current_thread())
+            return ("https://supabase.test", "key")
+        created = mock.AsyncMock(side_effect=lambda url, key: object())
+        with mock.patch("app.model.backends.supabase.get_supabase_settings", settings), mock.patch("app.model.backends.supabase.create_pooled_async_client", created):
+            async def twice():
+                return await supabase.get_async_client(), await supabase.get_async_client()
+            first, second = asyncio.run(twice())
+        self.assertIs(first, second)
+        self.assertEqual(created.await_count, 1)
+        self.assertNotEqual(threads[0], threading.main_thread())
+
+    def test_rotated_secrets_rebuild_the_client(self):
+        secrets = [("https://supabase.test", "old")]
+        created = mock.AsyncMock(side_effect=lambda url, key: key)
+        with mock.patch("app.model.backends.supabase.get_supabase_settings", lambda: secrets[0]), mock.patch("app.model.backends.supabase.create_pooled_async_client", created):
+            self.assertEqual(asyncio.run(supabase.get_async_client()), "old")
+            secrets[0] = ("https://supabase.test", "new")
+            self.assertEqual(asyncio.run(supabase.get_async_client()), "new")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,32 @@
+# tests/test_benchmarks.py
+import unittest
+from benchmarks.suite import compare
+
+def report(repeat=30, virtualized=False, size=100, **metrics):
+    result = dict({"size": size, "op": "add_task", "median_ms": 1.0, "p95_ms": 2.0, "controls_created": 16.0,
+                   "page_updates": 1.0, "controls_sent": 130.0, "peak_kb": 30.0}, **metrics)
+    return {"meta": {"repeat": repeat, "virtualized": virtualized}, "results": [result]}
+
+class CompareTest(unittest.TestCase):
+    def test_same_results_have_no_regressions(self):
+        self.assertEqual(compare(report(), report()), [])
+
+    def test_more_controls_per_call_is_a_regression(self):
+        regressions = compare(report(controls_created=17.0), report())
+        self.assertEqual([r["metric"] for r in regressions], ["controls_created"])
+
+    def test_different_repeat_is_refused(self):
+        # fewer calls spread the first call's one-time work over fewer runs
+        with self.assertRaises(ValueError):
+            compare(report(repeat=10, controls_created=24.0), report(repeat=30))
+
+    def test_different_list_mode_is_refused(self):
+        with self.assertRaises(ValueError):
+            compare(report(virtualized=True), report())
+
+    def test_no_shared_sizes_is_refused(self):
+        with self.assertRaises(ValueError):
+            compare(report(size=100000), report(size=100))
+
+if __name__ == "__main__":
+    unittest.main()
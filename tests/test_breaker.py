@@ -0,0 +1,183 @@
+# tests/test_breaker.py
+import asyncio
+import time
+import unittest
+from unittest import mock
+from app.model.breaker import CLOSED, HALF_OPEN, OPEN, MODEL_DEADLINE, MODEL_READ_DEADLINE, CircuitBreaker, CircuitOpenError, guarded
+from app.model.backends.memory import MemoryBackend
+from app.model.model import TaskModel
+from app.model.store import TaskStore
+from app.model.transport import time_left
+
+class CircuitBreakerTest(unittest.TestCase):
+    def setUp(self):
+        self.breaker = CircuitBreaker(failures=3, reset_after=10)
+
+    def open(self):
+        for _ in range(3):
+            self.assertTrue(self.breaker.allow())
+            self.breaker.failed_call()
+
+    def test_consecutive_failures_open_the_circuit(self):
+        self.breaker.failed_call()
+        self.breaker.failed_call()
+        self.breaker.succeeded() # a success in between starts the count again
+        self.open()
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertFalse(self.breaker.allow())
+        self.assertEqual(self.breaker.stats(), {"state": OPEN, "opened": 1, "rejected": 1, "fallbacks": 0})
+
+    def test_half_open_circuit_admits_one_probe(self):
+        self.open()
+        self.breaker.opened_at -= 10
+        self.assertTrue(self.breaker.allow())
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        self.assertFalse(self.breaker.allow()) # the others keep failing fast while the probe runs
+        self.breaker.succeeded()
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.assertTrue(self.breaker.allow())
+
+    def test_failed_probe_opens_the_circuit_again(self):
+        self.open()
+        self.breaker.opened_at -= 10
+        self.assertTrue(self.breaker.allow())
+        self.breaker.failed_call()
+        self.assertEqual(self.breaker.state, OPEN)
+        self.assertFalse(self.breaker.allow())
+        self.assertEqual(self.breaker.stats()["opened"], 2)
+
+    def test_released_probe_lets_the_next_one_through(self):
+        self.open()
+        self.breaker.opened_at -= 10
+        self.assertTrue(self.breaker.allow())
+        self.breaker.released()
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        self.assertTrue(self.breaker.allow())
+
+@guarded(skip=("unguarded",), reads=("read",))
+class Service:
+    def __init__(self, breaker):
+        self.breaker = breaker
+        self.serving_cached = False
+        self.fail = None
+        self.cache = None
+        self.time_left = []
+
+    def write(self):
+        self.time_left.append(time_left())
+        if self.fail is not None:
+            raise self.fail
+        return "written"
+
+    def read(self):
+        self.time_left.append(time_left())
+        if self.fail is not None:
+            raise self.fail
+        return self.write() # a nested guarded call is not counted twice
+
+    def unguarded(self):
+        raise ConnectionError("unguarded")
+
+    async def write_async(self):
+        self.time_left.append(time_left())
+        if self.fail is not None:
+            raise self.fail
+        return "written"
+
+    def _cached_read(self):
+        return self.cache
+
+class GuardedTest(unittest.TestCase):
+    def setUp(self):
+        self.breaker = CircuitBreaker(failures=2, reset_after=10)
+        self.service = Service(self.breaker)
+
+    def test_open_circuit_fails_fast(self):
+        self.service.fail = ConnectionError("down")
+        for _ in range(2):
+            with self.assertRaises(ConnectionError):
+                self.service.write()
+        self.service.fail = None
+        with self.assertRaises(CircuitOpenError):
+            self.service.write()
+        self.assertEqual(len(self.service.time_left), 2) # the refused call never ran
+
+    def test_validation_errors_are_not_failures(self):
+        self.service.fail = ValueError("Task cannot be empty")
+        for _ in range(3):
+            with self.assertRaises(ValueError):
+                self.service.write()
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.assertEqual(self.breaker.failed, 0)
+
+    def test_unguarded_methods_bypass_the_breaker(self):
+        for _ in range(3):
+            with self.assertRaises(ConnectionError):
+                self.service.unguarded()
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_reads_fall_back_to_the_cache(self):
+        self.service.cache = "cached"
+        self.service.fail = ConnectionError("down")
+        self.assertEqual(self.service.read(), "cached")
+        self.assertTrue(self.service.serving_cached)
+        self.assertEqual(self.service.read(), "cached")
+        self.assertEqual(self.service.read(), "cached") # circuit open: answered without trying
+        self.assertEqual(len(self.service.time_left), 2)
+        self.service.fail = None
+        self.breaker.opened_at -= 10
+        self.assertEqual(self.service.read(), "written")
+        self.assertFalse(self.service.serving_cached)
+        self.assertEqual(self.breaker.stats(), {"state": CLOSED, "opened": 1, "rejected": 1, "fallbacks": 3})
+
+    def test_read_without_a_cache_raises(self):
+        self.service.fail = ConnectionError("down")
+        with self.assertRaises(ConnectionError):
+            self.service.read()
+
+    def test_deadlines(self):
+        self.assertIsNone(time_left())
+        self.service.write()
+        self.service.read()
+        write_left, read_left, nested_left = self.service.time_left
+        self.assertTrue(MODEL_DEADLINE - 1 < write_left <= MODEL_DEADLINE)
+        self.assertTrue(MODEL_READ_DEADLINE - 1 < read_left <= MODEL_READ_DEADLINE)
+        self.assertLessEqual(nested_left, read_left) # a nested call keeps the outer deadline
+        self.assertIsNone(time_left())
+
+    def test_async_methods(self):
+        self.service.fail = ConnectionError("down")
+        for _ in range(2):
+            with self.assertRaises(ConnectionError):
+                asyncio.run(self.service.write_async())
+        with self.assertRaises(CircuitOpenError):
+            asyncio.run(self.service.write_async())
+        self.breaker.opened_at -= 10
+        self.service.fail = None
+        self.assertEqual(asyncio.run(self.service.write_async()), "written")
+        self.assertEqual(self.breaker.state, CLOSED)
+        self.assertTrue(0 < self.service.time_left[-1] <= MODEL_DEADLINE)
+
+class ModelBreakerTest(unittest.TestCase):
+    def test_cached_list_is_served_while_the_database_is_down(self):
+        backend = MemoryBackend([{"text": f"task {i}", "priority": 1, "completed": False} for i in range(1, 9)], publish=False)
+        model = TaskModel(page_size=5, backend=backend)
+        model.breaker = CircuitBreaker(failures=1, reset_after=10)
+        model.store = TaskStore(ttl=30)
+        model.task_limit = 0
+        self.assertEqual(len(model.load_tasks()), 5)
+        model.store.loaded_at -= 60
+        with mock.patch.object(backend, "fetch_page", side_effect=ConnectionError("down")) as fetch_page:
+            self.assertEqual(len(model.load_tasks()), 5)
+            self.assertTrue(model.serving_cached)
+            self.assertEqual(model.breaker.state, OPEN)
+            with self.assertRaises(CircuitOpenError):
+                model.add_task("new", "low")
+            self.assertEqual(fetch_page.call_count, 1)
+        model.breaker.opened_at = time.monotonic() - 10
+        self.assertEqual(len(model.load_tasks()), 5)
+        self.assertFalse(model.serving_cached)
+        self.assertEqual(model.breaker.state, CLOSED)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+# tests/test_bulk.py
+import contextlib
+import io
+import unittest
+from unittest import mock
+from app.model.backends.supabase import SupabaseBackend
+from app.model.model import TaskModel
+from app.model.store import TaskStore
+from app.presenter.presenter import TaskPresenter
+from tests.fakes import FakeClient, StubPage
+
+# a model over `size` tasks in a fake supabase table
+def make_model(test, size, page_size):
+    client = FakeClient()
+    client.table("tasks").insert([{"text": f"task {i}", "priority": 1, "completed": False} for i in range(1, size + 1)]).execute()
+    patcher = mock.patch("app.model.backends.supabase.get_client", return_value=client)
+    patcher.start()
+    test.addCleanup(patcher.stop)
+    model = TaskModel(page_size=page_size, backend=SupabaseBackend())
+    model.breaker = None
+    model.store = TaskStore(ttl=30) # not the store other tests share
+    model.task_limit = 0
+    return model, client
+
+class BulkOperationsTest(unittest.TestCase):
+    def setUp(self):
+        self.model, self.client = make_model(self, 1200, page_size=2000)
+        self.model.load_tasks()
+        self.client.requests.clear()
+
+    def requests(self, op):
+        return sum(1 for table, request_op in self.client.requests if request_op == op)
+
+    def test_updates_go_out_in_chunks(self):
+        updated = self.model.update_tasks(list(range(1, 1201)), completed=True, priority="high")
+        self.assertEqual(self.requests("update"), 3) # BULK_CHUNK_SIZE ids per request
+        self.assertEqual(len(updated), 1200)
+        self.assertTrue(all(task["completed"] and task["priority"] == 0 for task in self.model.tasks))
+
+    def test_deletes_go_out_in_chunks(self):
+        self.model.delete_tasks(list(range(1, 1001)))
+        self.assertEqual(self.requests("delete"), 2)
+        self.assertEqual([task["id"] for task in self.model.tasks], list(range(1001, 1201)))
+        self.assertEqual(len(self.client.rows()), 200)
+
+    def test_complete_all_and_delete_completed_are_one_request_each(self):
+        self.model.update_tasks([1, 2, 3], completed=True)
+        self.client.requests.clear()
+        self.assertEqual(len(self.model.complete_all_tasks()), 1197)
+        self.assertEqual(len(self.model.delete_completed_tasks()), 1200)
+        self.assertEqual(self.client.requests, [("tasks", "update"), ("tasks", "delete")])
+        self.assertEqual(self.model.tasks, [])
+
+    def test_added_batch_with_a_repeated_text_is_rejected_whole(self):
+        with self.assertRaises(ValueError):
+            self.model.add_tasks([("new", "low"), ("other", "high"), ("NEW", "med")])
+        with self.assertRaises(ValueError):
+            self.model.add_tasks([("new", "low"), ("Task 7", "high")])
+        self.assertEqual(len(self.client.rows()), 1200)
+
+    def test_added_batch_is_one_insert(self):
+        added = self.model.add_tasks([("new", "low"), ("other", "high")])
+        self.assertEqual(self.requests("insert"), 1)
+        self.assertEqual([(task["text"], task["priority"]) for task in added], [("new", 2), ("other", 0)])
+        self.assertEqual(self.model.tasks[0]["text"], "other")
+
+class BulkActionsTest(unittest.TestCase):
+    def setUp(self):
+        model, self.client = make_model(self, 10, page_size=20)
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.presenter = TaskPresenter(StubPage(), model=model, optimistic=False)
+        self.addCleanup(self.presenter.on_session_close, None)
+        self.view = self.presenter.view
+        self.view.build()
+        self.presenter.load_tasks()
+
+    def select(self, *task_ids):
+        self.presenter.toggle_select_mode()
+        for task_id in task_ids:
+            self.view.set_task_selected(task_id, True)
+
+    def test_completing_selected_tasks_is_one_page_update(self):
+        self.select(2, 5, 7)
+        updates = self.view.page.updates
+        self.presenter.complete_selected()
+        self.assertEqual(self.view.page.updates, updates + 1)
+        self.assertFalse(self.view.select_mode)
+        self.assertEqual(self.view.task_order(), [1, 3, 4, 6, 8, 9, 10, 2, 5, 7])
+        self.assertTrue(all(self.view.get_task_row(task_id).data["task_checkbox"].value for task_id in (2, 5, 7)))
+
+    def test_deleting_selected_tasks(self):
+        self.select(1, 10)
+        self.presenter.delete_selected()
+        self.assertEqual(self.view.task_order(), list(range(2, 10)))
+        self.assertEqual(len(self.client.rows()), 8)
+
+    def test_reprioritizing_selected_tasks(self):
+        self.select(9, 10)
+        self.view.bulk_priority_dropdown.value = "high"
+        self.presenter.prioritize_selected()
+        self.assertEqual(self.view.task_order()[:2], [9, 10])
+
+    def test_clear_completed(self):
+        self.presenter.mark_all_done()
+        self.presenter.clear_completed()
+        self.assertEqual((self.view.task_order(), self.client.rows()), ([], []))
+
+if __name__ == "__main__":
+    unittest.main()
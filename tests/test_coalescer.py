@@ -0,0 +1,154 @@
+# tests/test_coalescer.py
+import threading
+import time
+import unittest
+from unittest import mock
+from app.model.backends.memory import MemoryBackend
+from app.model.backends.supabase import SupabaseBackend
+from app.model.coalescer import MISSING, WriteCoalescer
+from app.model.model import TaskModel, write_coalescer
+from app.model.store import TaskStore
+from tests.fakes import FakeClient
+
+def row(task_id, text=None, completed=False):
+    return {"id": task_id, "text": text or f"task {task_id}", "priority": 1, "completed": completed}
+
+class WriteCoalescerTest(unittest.TestCase):
+    def setUp(self):
+        self.batches, self.sent_one = [], []
+        self.missing = set() # ids send_batch / send_one leave out, as if the tasks were deleted
+        self.rejected = set() # ids whose row makes the whole batch fail
+
+    def send_batch(self, rows):
+        self.batches.append(rows)
+        if any(row["id"] in self.rejected for row in rows):
+            raise ValueError("Task already exists")
+        return [dict(row) for row in rows if row["id"] not in self.missing]
+
+    def send_one(self, row):
+        self.sent_one.append(row["id"])
+        if row["id"] in self.rejected:
+            raise ValueError("Task already exists")
+        return None if row["id"] in self.missing else dict(row)
+
+    def coalescer(self, flush_interval=0.05, max_batch=100):
+        return WriteCoalescer(self.send_batch, self.send_one, flush_interval, max_batch)
+
+    def test_updates_to_one_task_are_merged(self):
+        coalescer = self.coalescer()
+        first = coalescer.submit(row(1, "draft"))
+        other = coalescer.submit(row(2))
+        last = coalescer.submit(row(1, "final", completed=True))
+        self.assertIs(first, last)
+        self.assertEqual(last.result(5), row(1, "final", completed=True))
+        self.assertEqual(other.result(5), row(2))
+        self.assertEqual(self.batches, [[row(2), row(1, "final", completed=True)]])
+        self.assertEqual(coalescer.stats(), {"pending": 0, "batches": 1, "rows_sent": 2, "merged": 1})
+
+    def test_batch_waits_for_the_interval(self):
+        coalescer = self.coalescer(flush_interval=0.1)
+        started = time.monotonic()
+        futures = [coalescer.submit(row(task_id)) for task_id in (1, 2, 3)]
+        self.assertEqual([future.result(5)["id"] for future in futures], [1, 2, 3])
+        self.assertGreaterEqual(time.monotonic() - started, 0.1)
+        self.assertEqual(len(self.batches), 1)
+
+    def test_full_batch_goes_out_without_waiting(self):
+        coalescer = self.coalescer(flush_interval=10, max_batch=3)
+        started = time.monotonic()
+        futures = [coalescer.submit(row(task_id)) for task_id in (1, 2, 3)]
+        for future in futures:
+            future.result(5)
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertEqual([[sent["id"] for sent in batch] for batch in self.batches], [[1, 2, 3]])
+
+    def test_rejected_batch_is_retried_row_by_row(self):
+        self.rejected.add(2)
+        self.missing.add(3)
+        coalescer = self.coalescer()
+        futures = [coalescer.submit(row(task_id)) for task_id in (1, 2, 3)]
+        self.assertEqual(futures[0].result(5), row(1))
+        with self.assertRaises(ValueError):
+            futures[1].result(5)
+        self.assertIs(futures[2].result(5), MISSING)
+        self.assertEqual(self.sent_one, [1, 2, 3])
+
+    def test_rows_of_missing_tasks_resolve_to_missing(self):
+        self.missing.add(2)
+        coalescer = self.coalescer()
+        futures = [coalescer.submit(row(task_id)) for task_id in (1, 2)]
+        self.assertEqual(futures[0].result(5), row(1))
+        self.assertIs(futures[1].result(5), MISSING)
+        self.assertEqual(self.sent_one, [])
+
+    def test_cancelled_update_is_not_sent(self):
+        coalescer = self.coalescer(flush_interval=0.2)
+        cancelled = coalescer.submit(row(1))
+        kept = coalescer.submit(row(2))
+        coalescer.cancel(1)
+        self.assertIsNone(cancelled.result(0))
+        kept.result(5)
+        self.assertEqual(self.batches, [[row(2)]])
+        coalescer.cancel(2) # already sent: nothing to drop
+        self.assertEqual(kept.result(0), row(2))
+
+class QueuedUpdateTest(unittest.TestCase):
+    def model(self, backend):
+        patcher = mock.patch("app.model.model.get_backend", return_value=backend) # what the shared coalescer sends through
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        model = TaskModel(page_size=10, backend=backend)
+        model.breaker = None
+        model.store = TaskStore(ttl=30)
+        model.task_limit = 0
+        model.load_tasks()
+        return model
+
+    # result of a queued update once the model has applied it (done callbacks run in order, the
+    # model's first)
+    def applied(self, future):
+        done = threading.Event()
+        future.add_done_callback(lambda f: done.set())
+        self.assertTrue(done.wait(5))
+        return future.result()
+
+    def test_task_deleted_elsewhere_is_not_recreated(self):
+        backend = MemoryBackend([{"text": f"task {i}", "priority": 1, "completed": False} for i in range(1, 4)], publish=False)
+        model = self.model(backend)
+        done = model.queue_update(2, "task 2", "high", True)
+        backend.delete([2]) # another process, before the batch is flushed
+        self.assertIs(self.applied(done), MISSING)
+        self.assertEqual([task["id"] for task in backend.fetch_page(None, 10)], [1, 3])
+        self.assertEqual([task["id"] for task in model.tasks], [1, 3])
+        self.assertEqual([task["id"] for task in model.store.cached(10)[0]], [1, 3])
+
+    def test_supabase_sends_one_update_that_skips_deleted_tasks(self):
+        client = FakeClient()
+        client.table("tasks").insert([{"text": f"task {i}", "priority": 1, "completed": False} for i in range(1, 4)]).execute()
+        patcher = mock.patch("app.model.backends.supabase.get_client", return_value=client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        model = self.model(SupabaseBackend())
+        client.requests.clear()
+        updates = [model.queue_update(task_id, f"task {task_id}", "high", True) for task_id in (1, 2, 3)]
+        client.table("tasks").delete().eq("id", 2).execute()
+        self.assertEqual(self.applied(updates[0])["completed"], True)
+        self.assertIs(self.applied(updates[1]), MISSING)
+        self.assertEqual(client.requests, [("tasks", "delete"), ("tasks", "update_tasks")])
+        self.assertEqual(sorted(row["id"] for row in client.rows()), [1, 3])
+        self.assertEqual([task["id"] for task in model.tasks], [1, 3])
+
+    def test_deleting_a_task_cancels_its_queued_update(self):
+        backend = MemoryBackend([{"text": "task 1", "priority": 1, "completed": False}], publish=False)
+        model = self.model(backend)
+        sent = []
+        with mock.patch.object(write_coalescer, "send_batch", sent.append):
+            done = model.queue_update(1, "task 1", "high", True)
+            model.delete_task(1)
+            self.assertIsNone(done.result(0))
+            time.sleep(write_coalescer.flush_interval + 0.1)
+        self.assertEqual(sent, [])
+        self.assertEqual((model.tasks, backend.count()), ([], 0))
+
+if __name__ == "__main__":
+    unittest.main()
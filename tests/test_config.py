@@ -0,0 +1,115 @@
+# tests/test_config.py
+import contextlib
+import io
+import json
+import os
+import stat
+import tempfile
+import time
+import unittest
+from unittest import mock
+from app.model import config
+from app.model.backends import supabase
+
+def ssm_response(url, key):
+    return {"Parameters": [{"Name": config.SSM_URL_PARAMETER, "Value": url}, {"Name": config.SSM_KEY_PARAMETER, "Value": key}]}
+
+class SupabaseSettingsTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache_path = os.path.join(directory.name, "cache", "secrets.json")
+        self.ssm = mock.Mock()
+        self.ssm.get_parameters.return_value = ssm_response("https://one.supabase.test", "key-1")
+        # a process that has not loaded its secrets yet
+        patcher = mock.patch.multiple(config, CONFIG_SOURCE="ssm", SECRETS_CACHE_PATH=self.cache_path, _ssm_client=self.ssm, _secrets=None, _refreshing=False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def restart(self):
+        config._secrets = None
+
+    def test_env_source(self):
+        config.CONFIG_SOURCE = "env"
+        with mock.patch.dict(os.environ, {"SUPABASE_URL": "https://local.supabase.test", "SUPABASE_KEY": "local-key"}):
+            self.assertEqual(config.get_supabase_settings(), ("https://local.supabase.test", "local-key"))
+        self.ssm.get_parameters.assert_not_called()
+        self.assertFalse(os.path.exists(self.cache_path))
+
+    def test_env_source_without_settings(self):
+        config.CONFIG_SOURCE = "env"
+        with mock.patch.dict(os.environ, {"SUPABASE_URL": "", "SUPABASE_KEY": ""}):
+            with self.assertRaises(Exception):
+                config.get_supabase_settings()
+
+    def test_first_use_fetches_both_secrets_in_one_call(self):
+        self.assertEqual(config.get_supabase_settings(), ("https://one.supabase.test", "key-1"))
+        self.assertEqual(config.get_supabase_settings(), ("https://one.supabase.test", "key-1"))
+        self.ssm.get_parameters.assert_called_once_with(Names=[config.SSM_URL_PARAMETER, config.SSM_KEY_PARAMETER], WithDecryption=True)
+
+    def test_secrets_are_cached_on_disk_for_the_owner_only(self):
+        config.get_supabase_settings()
+        self.assertEqual(stat.S_IMODE(os.stat(self.cache_path).st_mode), 0o600)
+        with open(self.cache_path) as f:
+            self.assertEqual(json.load(f)["key"], "key-1")
+
+    def test_restart_reads_the_disk_cache(self):
+        config.get_supabase_settings()
+        self.restart()
+        self.ssm.get_parameters.return_value = ssm_response("https://one.supabase.test", "key-2")
+        self.assertEqual(config.get_supabase_settings(), ("https://one.supabase.test", "key-1"))
+        self.assertEqual(self.ssm.get_parameters.call_count, 1)
+
+    def test_unreadable_disk_cache_is_a_miss(self):
+        os.makedirs(os.path.dirname(self.cache_path))
+        with open(self.cache_path, "w") as f:
+            f.write("{not json")
+        self.assertEqual(config.get_supabase_settings(), ("https://one.supabase.test", "key-1"))
+        self.assertEqual(self.ssm.get_parameters.call_count, 1)
+
+    def test_missing_parameter(self):
+        self.ssm.get_parameters.return_value = {"Parameters": [], "InvalidParameters": [config.SSM_KEY_PARAMETER]}
+        with self.assertRaises(Exception):
+            config.get_supabase_settings()
+
+    def wait_for_refresh(self):
+        deadline = time.monotonic() + 5
+        while config._refreshing and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertFalse(config._refreshing)
+
+    def test_expired_secrets_are_served_while_refreshed_in_the_background(self):
+        config.get_supabase_settings()
+        config._secrets["fetched_at"] -= config.SECRETS_TTL + 1
+        self.ssm.get_parameters.return_value = ssm_response("https://one.supabase.test", "key-2")
+        self.assertEqual(config.get_supabase_settings(), ("https://one.supabase.test", "key-1"))
+        self.wait_for_refresh()
+        self.assertEqual(config.get_supabase_settings(), ("https://one.supabase.test", "key-2"))
+        with open(self.cache_path) as f:
+            self.assertEqual(json.load(f)["key"], "key-2")
+
+    def test_failed_refresh_keeps_the_cached_secrets(self):
+        config.get_supabase_settings()
+        config._secrets["fetched_at"] -= config.SECRETS_TTL + 1
+        self.ssm.get_parameters.side_effect = ConnectionError("ssm unreachable")
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertEqual(config.get_supabase_settings(), ("https://one.supabase.test", "key-1"))
+            self.wait_for_refresh()
+        self.assertEqual(config.get_supabase_settings(), ("https://one.supabase.test", "key-1"))
+
+    def test_client_is_rebuilt_after_the_key_rotates(self):
+        patcher = mock.patch.multiple(supabase, _client=None, _client_settings=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        with mock.patch("app.model.backends.supabase.create_pooled_client", side_effect=lambda url, key: ("client", key)) as create:
+            self.assertEqual(supabase.get_client(), ("client", "key-1"))
+            self.assertEqual(supabase.get_client(), ("client", "key-1"))
+            config._secrets["fetched_at"] -= config.SECRETS_TTL + 1
+            self.ssm.get_parameters.return_value = ssm_response("https://one.supabase.test", "key-2")
+            supabase.get_client() # starts the refresh
+            self.wait_for_refresh()
+            self.assertEqual(supabase.get_client(), ("client", "key-2"))
+        self.assertEqual(create.call_count, 2)
+
+if __name__ == "__main__":
+    unittest.main()
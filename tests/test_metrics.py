@@ -0,0 +1,47 @@
+# tests/test_metrics.py
+import contextlib
+import io
+import threading
+import unittest
+from types import SimpleNamespace
+from app import metrics
+from app.model.model import PRIORITY_REVERSE_MAPPING
+from app.presenter.write_queue import WriteQueue
+from app.view.view import TaskView
+from tests.fakes import StubPage
+
+class HistogramTest(unittest.TestCase):
+    def test_buckets_are_cumulative(self):
+        histogram = metrics.Histogram("test_seconds", "test", buckets=(0.1, 1))
+        for value in (0.05, 0.5, 0.7, 3):
+            histogram.observe(value, op="x")
+        samples = {(name, dict(key).get("le")): value for name, key, value in histogram.samples()}
+        self.assertEqual(samples[("test_seconds_bucket", 0.1)], 1)
+        self.assertEqual(samples[("test_seconds_bucket", 1)], 3)
+        self.assertEqual(samples[("test_seconds_bucket", "+Inf")], 4)
+        self.assertEqual(samples[("test_seconds_count", None)], 4)
+        self.assertAlmostEqual(samples[("test_seconds_sum", None)], 4.25)
+
+    def test_acked_writes_are_observed(self):
+        before = sum(metrics.write_ack_seconds.counts.values())
+        acked = threading.Event()
+        queue = WriteQueue()
+        self.addCleanup(queue.close)
+        queue.submit(lambda: "saved", on_success=lambda result: acked.set())
+        self.assertTrue(acked.wait(5))
+        self.assertEqual(sum(metrics.write_ack_seconds.counts.values()), before + 1)
+        self.assertIn("write_queue_ack_seconds_bucket", metrics.render())
+
+class VirtualListUpdateTest(unittest.TestCase):
+    def test_scrolling_past_the_window_is_a_counted_page_update(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            view = TaskView(StubPage(), virtualized=True)
+        view.build()
+        view.bind_virtual_list({}, PRIORITY_REVERSE_MAPPING, lambda: None)
+        view.virtual_list.set_tasks([{"id": i, "text": f"task {i}", "priority": 1, "completed": False} for i in range(1, 501)])
+        before = metrics.page_updates.values[(("handler", "none"),)]
+        view.virtual_list.on_scroll(SimpleNamespace(pixels=200 * 56, viewport_dimension=560, max_scroll_extent=500 * 56))
+        self.assertEqual(metrics.page_updates.values[(("handler", "none"),)], before + 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+# tests/test_model.py
+import unittest
+from unittest import mock
+from app.model.backends import DuplicateTaskError
+from app.model.backends.memory import MemoryBackend
+from app.model.model import TaskModel, TaskLimitError
+from app.model.store import TaskStore
+
+def make_model(size, page_size=5, limit=0):
+    backend = MemoryBackend([{"text": f"task {i}", "priority": 1, "completed": False} for i in range(1, size + 1)], publish=False)
+    model = TaskModel(page_size=page_size, backend=backend)
+    model.breaker = None
+    model.store = TaskStore(ttl=30)
+    model.task_limit = limit
+    return model, backend
+
+class TaskLimitTest(unittest.TestCase):
+    def test_count_is_cached_between_adds(self):
+        model, backend = make_model(20, limit=23)
+        model.load_tasks()
+        with mock.patch.object(backend, "count", wraps=backend.count) as count:
+            model.add_task("a", "low")
+            model.add_tasks([("b", "low"), ("c", "low")])
+            with self.assertRaises(TaskLimitError):
+                model.add_task("d", "low")
+        self.assertEqual(count.call_count, 1)
+
+    def test_deletes_free_room(self):
+        model, backend = make_model(20, limit=20)
+        model.load_tasks()
+        with self.assertRaises(TaskLimitError):
+            model.add_task("a", "low")
+        model.delete_task(1)
+        model.add_task("a", "low")
+        self.assertEqual(backend.count(), 20)
+
+    def test_stale_count_is_refreshed(self):
+        model, backend = make_model(20, limit=21)
+        model.load_tasks()
+        model.add_task("a", "low")
+        backend.delete([2]) # another process
+        model.store.sized_at -= 60
+        model.add_task("b", "low")
+        self.assertEqual(backend.count(), 21)
+
+    def test_editing_a_task_deleted_elsewhere_frees_room(self):
+        model, backend = make_model(20, limit=20)
+        model.load_tasks()
+        with self.assertRaises(TaskLimitError):
+            model.add_task("a", "low")
+        backend.delete([3]) # another process; the cached count still includes it
+        self.assertIsNone(model.update_task(3, "task 3", "high", True))
+        self.assertEqual(model.store.known_size(), 19)
+        model.add_task("a", "low")
+        self.assertEqual(backend.count(), 20)
+
+    def test_fully_loaded_list_is_not_counted(self):
+        model, backend = make_model(3, limit=4)
+        model.load_tasks()
+        with mock.patch.object(backend, "count", side_effect=AssertionError("counted")):
+            model.add_task("a", "low")
+            with self.assertRaises(TaskLimitError):
+                model.add_task("b", "low")
+
+    def test_database_limit_is_a_task_limit_error(self):
+        model, backend = make_model(3)
+        model.load_tasks()
+        with mock.patch.object(backend, "insert", side_effect=Exception("{'code': '23514', 'message': 'task limit reached'}")):
+            with self.assertRaises(TaskLimitError):
+                model.add_task("a", "low")
+
+class DuplicateTextTest(unittest.TestCase):
+    def setUp(self):
+        self.model, self.backend = make_model(3)
+        self.model.load_tasks()
+
+    def test_loaded_text_is_rejected_without_a_write(self):
+        with mock.patch.object(self.backend, "insert", side_effect=AssertionError("written")), \
+                mock.patch.object(self.backend, "update", side_effect=AssertionError("written")):
+            with self.assertRaises(DuplicateTaskError):
+                self.model.add_task("task 2", "low")
+            with self.assertRaises(DuplicateTaskError):
+                self.model.update_task(1, "task 2", "low", False)
+
+    def test_match_ignores_case(self):
+        with self.assertRaises(DuplicateTaskError):
+            self.model.add_task("TASK 2", "low")
+        self.model.update_task(2, "Task 2", "low", False) # its own text is not a duplicate
+        self.assertEqual(self.model.get_task(2)["text"], "Task 2")
+
+    def test_stale_index_defers_to_the_backend(self):
+        self.backend.update([2], {"text": "renamed"}) # another process; this model is not told
+        self.model.store.loaded_at -= 60
+        self.assertEqual(self.model.add_task("task 2", "low")["text"], "task 2")
+        with self.assertRaises(DuplicateTaskError):
+            self.model.add_task("task 3", "low") # still taken: the backend rejects it
+
+if __name__ == "__main__":
+    unittest.main()
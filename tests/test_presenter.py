@@ -0,0 +1,278 @@
+# tests/test_presenter.py
+import asyncio
+import contextlib
+import io
+import random
+import sys
+import threading
+import time
+import unittest
+from unittest import mock
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from app.model.async_model import AsyncTaskModel
+from app.model.backends.memory import MemoryBackend
+from app.model.changes import task_feed
+from app.model.model import TaskModel
+from app.model.store import TaskStore, task_sort_key
+from app.presenter.async_presenter import AsyncTaskPresenter
+from app.presenter.presenter import TaskPresenter
+from tests.fakes import StubPage
+
+class PooledPage(StubPage):
+    """StubPage whose run_thread hands work to a thread pool, as ft.Page does."""
+
+    def __init__(self):
+        super().__init__()
+        self.executor = ThreadPoolExecutor(max_workers=8)
+
+    def run_thread(self, handler, *args, **kwargs):
+        self.executor.submit(handler, *args, **kwargs)
+
+def make_presenter(tasks, page_size, optimistic=False, page=None):
+    backend = MemoryBackend(tasks, publish=False)
+    model = TaskModel(page_size=page_size, backend=backend)
+    model.breaker = None
+    model.store = TaskStore(ttl=30) # not the process-wide store other tests share
+    with contextlib.redirect_stdout(io.StringIO()):
+        presenter = TaskPresenter(page or StubPage(), model=model, optimistic=optimistic)
+    presenter.view.build()
+    return presenter, backend
+
+# switch threads as often as possible so unguarded read-modify-write sequences interleave
+@contextlib.contextmanager
+def frequent_thread_switches():
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        yield
+    finally:
+        sys.setswitchinterval(interval)
+
+class ShowMoreTasksTest(unittest.TestCase):
+    def setUp(self):
+        tasks = [{"text": f"task {i}", "priority": 1, "completed": False} for i in range(1, 7)]
+        self.presenter, self.backend = make_presenter(tasks, page_size=3)
+        self.addCleanup(self.presenter.on_session_close, None)
+        self.presenter.load_tasks()
+
+    def shown(self):
+        return self.presenter.view.task_order()
+
+    def test_next_page_is_appended(self):
+        self.presenter.load_more_tasks()
+        self.assertEqual(self.shown(), [1, 2, 3, 4, 5, 6])
+
+    def test_store_reload_between_pages_is_reconciled(self):
+        self.assertEqual(self.shown(), [1, 2, 3])
+        # another process changes the list and the cached copy expires before the next page
+        self.backend.delete([1])
+        self.backend.insert([{"text": "urgent", "priority": 0, "completed": False}])
+        self.backend.update([2], {"completed": True})
+        self.presenter.model.store.loaded_at -= 60
+
+        self.presenter.load_more_tasks()
+
+        self.assertEqual(self.shown(), [task["id"] for task in self.presenter.model.tasks])
+        self.assertEqual(self.shown(), [7, 3, 4, 5, 6, 2])
+        self.assertTrue(self.presenter.view.get_task_row(2).data["task_checkbox"].value)
+
+    def test_search_results_are_not_paged(self):
+        self.presenter.searching = True
+        self.presenter.on_list_near_end()
+        self.assertEqual(len(self.presenter.model.tasks), 3)
+
+    def test_async_search_results_are_not_paged(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            presenter = AsyncTaskPresenter(StubPage())
+        self.addCleanup(presenter.on_session_close, None)
+        presenter.model.has_more = True
+        presenter.model.load_more_tasks = mock.AsyncMock(return_value=[])
+        presenter.searching = True
+        asyncio.run(presenter.on_list_near_end())
+        presenter.model.load_more_tasks.assert_not_awaited()
+
+        presenter.searching = False
+        asyncio.run(presenter.on_list_near_end())
+        presenter.model.load_more_tasks.assert_awaited_once()
+
+class ConcurrencyTest(unittest.TestCase):
+    def setUp(self):
+        tasks = [{"text": f"task {i}", "priority": i % 3, "completed": False} for i in range(1, 201)]
+        self.presenter, self.backend = make_presenter(tasks, page_size=500, optimistic=True)
+        self.addCleanup(self.presenter.on_session_close, None)
+        self.presenter.load_tasks()
+
+    def toggle(self, task_id):
+        row = self.presenter.view.get_task_row(task_id)
+        checkbox = row.data["task_checkbox"]
+        event = SimpleNamespace(control=SimpleNamespace(value=not checkbox.value))
+        self.presenter.toggle_task(event, row.data["task_label"], task_id)
+
+    def wait_for_writes(self):
+        deadline = time.monotonic() + 10
+        while self.presenter.write_queue.depth() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.presenter.write_queue.depth(), 0)
+
+    # the model's indexes agree with its list and the view shows the list in order
+    def assert_consistent(self):
+        model = self.presenter.model
+        ids = [task["id"] for task in model.tasks]
+        self.assertEqual(model.tasks, sorted(model.tasks, key=task_sort_key))
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(set(model.tasks_by_id), set(ids))
+        self.assertEqual({task_id for bucket in model.buckets.values() for task_id in bucket}, set(ids))
+        self.assertEqual(set(model.ids_by_text.values()), set(ids))
+        self.assertEqual(self.presenter.view.task_order(), ids)
+
+    # run workers at once, as page.run_thread's shared pool runs one session's handlers
+    def run_threads(self, *workers):
+        errors = []
+        def run(worker):
+            try:
+                worker()
+            except Exception as ex:
+                errors.append(ex)
+        threads = [threading.Thread(target=run, args=(worker,)) for worker in workers]
+        with frequent_thread_switches():
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.wait_for_writes()
+        self.assertEqual(errors, [])
+
+    def toggles(self, count, seed):
+        rng = random.Random(seed)
+        return lambda: [self.toggle(rng.randint(1, 200)) for _ in range(count)]
+
+    def test_write_callbacks_race_local_edits(self):
+        # toggles from two handler threads while the write queue thread applies their acks
+        self.run_threads(self.toggles(1000, 1), self.toggles(1000, 2))
+        self.assert_consistent()
+        saved = {row["id"]: row["completed"] for row in self.backend.fetch_page(None, 500)}
+        self.assertEqual({task["id"]: task["completed"] for task in self.presenter.model.tasks}, saved)
+
+    # another session's change to a task, as the realtime feed delivers it
+    @staticmethod
+    def publish(rng):
+        task_id = rng.randint(1, 200)
+        record = {"id": task_id, "text": f"task {task_id}", "priority": rng.randrange(3), "completed": rng.random() < 0.5, "user_id": None}
+        task_feed.publish("UPDATE", record, None)
+
+    def test_feed_changes_race_local_edits(self):
+        rng = random.Random(3)
+        self.run_threads(lambda: [self.publish(rng) for _ in range(1000)], self.toggles(1000, 1))
+        self.assert_consistent()
+
+    def test_feed_changes_apply_in_order(self):
+        page = PooledPage()
+        presenter, _ = make_presenter([{"text": "task 1", "priority": 1, "completed": False}], page_size=10, page=page)
+        self.addCleanup(presenter.on_session_close, None)
+        presenter.load_tasks()
+        applied, apply, rng = [], presenter.apply_task_change, random.Random(4)
+        def record(event_type, record, old_record):
+            time.sleep(rng.random() / 200) # handlers take varying time
+            applied.append(record["priority"])
+            apply(event_type, record, old_record)
+        presenter.apply_task_change = record
+        published = [0, 1, 2] * 50
+        with frequent_thread_switches():
+            for priority in published:
+                task_feed.publish("UPDATE", {"id": 1, "text": "task 1", "priority": priority, "completed": False, "user_id": None}, None)
+            page.executor.shutdown(wait=True)
+        self.assertEqual(applied, published)
+        self.assertEqual(presenter.model.get_task(1)["priority"], 2)
+        self.assertEqual(presenter.view.get_task_row(1).data["priority_label"].content.value, "low")
+
+class ScopedUpdateTest(unittest.TestCase):
+    def setUp(self):
+        tasks = [{"text": f"task {i}", "priority": 1, "completed": False} for i in range(1, 37)] # chunks of 8, 8, 8, 8, 4
+        self.presenter, _ = make_presenter(tasks, page_size=100)
+        self.addCleanup(self.presenter.on_session_close, None)
+        self.presenter.load_tasks()
+        self.view = self.presenter.view
+        self.chunks = list(self.view.task_list.controls)
+
+    def toggle(self, task_id, completed):
+        row = self.view.get_task_row(task_id)
+        self.view.page.sent.clear()
+        self.presenter.toggle_task(SimpleNamespace(control=SimpleNamespace(value=completed)), row.data["task_label"], task_id)
+        return row
+
+    def test_toggle_in_place_sends_only_its_row(self):
+        row = self.toggle(36, True) # the last task stays last
+        self.assertEqual(self.view.page.sent, [(row,)])
+
+    def test_moved_row_sends_the_chunks_it_left_and_joined(self):
+        row = self.toggle(2, True) # completed tasks go last
+        self.assertEqual(len(self.view.page.sent), 1)
+        self.assertEqual({id(control) for control in self.view.page.sent[0]}, {id(row), id(self.chunks[0]), id(self.chunks[-1])})
+        self.assertEqual(self.view.task_order(), [1, *range(3, 37), 2])
+        self.assertEqual(self.view.task_list.controls, self.chunks)
+
+    def test_controls_inside_a_dirty_row_go_out_with_it(self):
+        row = self.view.get_task_row(5)
+        self.view.page.sent.clear()
+        self.view.mark_dirty(row.data["task_label"], row, row.data["priority_label"].content)
+        self.view.flush()
+        self.assertEqual(self.view.page.sent, [(row,)])
+
+    def test_full_chunk_is_split(self):
+        callbacks = self.presenter.row_callbacks
+        for task_id in range(100, 110):
+            self.view.insert_task_row(1, self.view.create_task_row(task_id, f"new {task_id}", False, "med", callbacks))
+        self.view.flush()
+        self.assertEqual(self.view.task_order(), [1, *range(109, 99, -1), *range(2, 37)])
+        self.assertEqual([len(chunk.controls) for chunk in self.view.task_list.controls], [10, 8, 8, 8, 8, 4])
+
+class VanishedTaskTest(unittest.TestCase):
+    # a feed DELETE removed task 2 from the model before the toggle handler on its row ran
+    def toggle_removed_task(self, presenter):
+        self.addCleanup(presenter.on_session_close, None)
+        presenter.load_tasks()
+        row = presenter.view.get_task_row(2)
+        presenter.model.apply_change("DELETE", None, presenter.model.get_task(2))
+        event = SimpleNamespace(control=SimpleNamespace(value=True))
+        with contextlib.redirect_stdout(io.StringIO()):
+            return presenter.toggle_task(event, row.data["task_label"], 2)
+
+    def assert_row_dropped(self, presenter, backend):
+        self.assertIsNone(presenter.view.get_task_row(2))
+        self.assertEqual(presenter.view.task_order(), [1, 3])
+        self.assertTrue(presenter.view.error_warning.open)
+        self.assertFalse(any(row["completed"] for row in backend.fetch_page(None, 10)))
+
+    def tasks(self):
+        return [{"text": f"task {i}", "priority": 1, "completed": False} for i in range(1, 4)]
+
+    def test_optimistic_toggle(self):
+        presenter, backend = make_presenter(self.tasks(), page_size=10, optimistic=True)
+        self.toggle_removed_task(presenter)
+        self.assertEqual(presenter.write_queue.depth(), 0)
+        self.assert_row_dropped(presenter, backend)
+
+    def test_toggle(self):
+        presenter, backend = make_presenter(self.tasks(), page_size=10)
+        self.toggle_removed_task(presenter)
+        self.assert_row_dropped(presenter, backend)
+
+    def test_async_toggle(self):
+        backend = MemoryBackend(self.tasks(), publish=False)
+        with contextlib.redirect_stdout(io.StringIO()):
+            presenter = AsyncTaskPresenter(StubPage())
+        presenter.model = AsyncTaskModel(page_size=10, backend=backend)
+        presenter.model.breaker = None
+        presenter.model.store = TaskStore(ttl=30)
+        presenter.view.build()
+        self.addCleanup(presenter.on_session_close, None)
+        asyncio.run(presenter.load_tasks())
+        row = presenter.view.get_task_row(2)
+        presenter.model.apply_change("DELETE", None, presenter.model.get_task(2))
+        with contextlib.redirect_stdout(io.StringIO()):
+            asyncio.run(presenter.toggle_task(SimpleNamespace(control=SimpleNamespace(value=True)), row.data["task_label"], 2))
+        self.assert_row_dropped(presenter, backend)
+
+if __name__ == "__main__":
+    unittest.main()
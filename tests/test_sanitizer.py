@@ -0,0 +1,37 @@
+# tests/test_sanitizer.py
+import unittest
+from unittest import mock
+import bleach
+from app.model import sanitizer
+from app.model.sanitizer import sanitize, sanitize_many
+
+SAMPLES = [
+    "buy milk", "Ünïcödé ✓ tâsk", "tab\tand\nnewline", "", "  spaced  ", "a & b", "<b>bold</b>",
+    "<script>alert(1)</script>", "x < y > z", "bell\x07", "null\x00byte", "carriage\rreturn",
+    "form\x0cfeed", "escape\x1b[31m", "&amp; already", "quote \" and ' marks", "emoji 🎉",
+]
+
+class SanitizeTest(unittest.TestCase):
+    def test_same_result_as_bleach(self):
+        for text in SAMPLES + [chr(code) for code in range(0x80)]:
+            self.assertEqual(sanitize(text), bleach.clean(text), repr(text))
+
+    def test_plain_text_skips_the_parser(self):
+        with mock.patch.object(sanitizer, "_clean", side_effect=AssertionError("parsed")):
+            self.assertEqual(sanitize("buy milk at 5pm, then call mom (urgent)!"), "buy milk at 5pm, then call mom (urgent)!")
+
+    def test_markup_is_cleaned_once(self):
+        text = "<i>unique text for the cache test</i>"
+        with mock.patch.object(sanitizer.bleach, "clean", wraps=bleach.clean) as clean:
+            first, second = sanitize(text), sanitize(text)
+        self.assertEqual(first, second)
+        self.assertEqual(clean.call_count, 1)
+
+    def test_batch_keeps_order_and_cleans_each_distinct_text_once(self):
+        texts = ["<a>", "plain", "<a>", "b & c", "plain"]
+        with mock.patch.object(sanitizer, "sanitize", wraps=sanitize) as clean:
+            self.assertEqual(sanitize_many(texts), [bleach.clean(text) for text in texts])
+        self.assertEqual(clean.call_count, 3)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+# tests/test_scheduler.py
+import contextlib
+import io
+import threading
+import time
+import unittest
+from app.scheduler import Scheduler
+
+class SchedulerTest(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = Scheduler(name="test-scheduler")
+        self.fired = []
+        self.lock = threading.Lock()
+
+    def record(self, value, done=None):
+        with self.lock:
+            self.fired.append(value)
+        if done is not None:
+            done.set()
+
+    def test_calls_fire_in_order_of_their_deadline(self):
+        done = threading.Event()
+        self.scheduler.call_later(0.06, self.record, "last", done)
+        self.scheduler.call_later(0.02, self.record, "first")
+        self.scheduler.call_later(0.04, self.record, "second")
+        self.assertTrue(done.wait(2))
+        self.assertEqual(self.fired, ["first", "second", "last"])
+        self.assertEqual(self.scheduler.stats(), {"pending": 0, "fired": 3, "coalesced": 0, "cancelled": 0})
+
+    def test_a_call_with_the_same_key_replaces_the_pending_one(self):
+        done = threading.Event()
+        started = time.monotonic()
+        self.scheduler.call_later(0.02, self.record, "stale", key="banner")
+        self.scheduler.call_later(0.08, self.record, "fresh", done, key="banner")
+        self.assertEqual(self.scheduler.pending_count(), 1)
+        self.assertTrue(done.wait(2))
+        self.assertEqual(self.fired, ["fresh"])
+        self.assertGreaterEqual(time.monotonic() - started, 0.08) # pushed back, not fired at the first deadline
+        self.assertEqual(self.scheduler.stats()["coalesced"], 1)
+
+    def test_cancelled_calls_never_fire(self):
+        done = threading.Event()
+        handle = self.scheduler.call_later(0.02, self.record, "by handle")
+        self.scheduler.call_later(0.02, self.record, "by key", key="search")
+        self.scheduler.call_later(0.05, self.record, "kept", done)
+        self.assertTrue(self.scheduler.cancel(handle))
+        self.assertTrue(self.scheduler.cancel(key="search"))
+        self.assertFalse(self.scheduler.cancel(handle)) # already cancelled
+        self.assertFalse(self.scheduler.cancel(key="missing"))
+        self.assertTrue(done.wait(2))
+        self.assertEqual(self.fired, ["kept"])
+        self.assertEqual(self.scheduler.stats()["cancelled"], 2)
+
+    def test_cancel_owner_drops_only_that_owners_calls(self):
+        done = threading.Event()
+        gone, other = object(), object()
+        for i in range(3):
+            self.scheduler.call_later(0.02, self.record, f"gone {i}", owner=gone)
+        self.scheduler.call_later(0.04, self.record, "other", done, owner=other)
+        self.assertEqual(self.scheduler.cancel_owner(gone), 3)
+        self.assertEqual(self.scheduler.cancel_owner(gone), 0)
+        self.assertTrue(done.wait(2))
+        self.assertEqual(self.fired, ["other"])
+        self.assertEqual(self.scheduler.by_owner, {})
+
+    def test_a_failing_callback_does_not_stop_the_worker(self):
+        done = threading.Event()
+        def fail():
+            raise RuntimeError("boom")
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            self.scheduler.call_later(0, fail)
+            self.scheduler.call_later(0.02, self.record, "after", done)
+            self.assertTrue(done.wait(2))
+        self.assertIn("boom", output.getvalue())
+        self.assertEqual(self.fired, ["after"])
+
+    def test_one_thread_serves_every_call(self):
+        done = threading.Event()
+        threads = []
+        self.scheduler.call_later(0, lambda: threads.append(threading.current_thread()))
+        self.scheduler.call_later(0.02, lambda: (threads.append(threading.current_thread()), done.set()))
+        self.assertTrue(done.wait(2))
+        self.assertIs(threads[0], threads[1])
+        self.assertEqual(threads[0].name, "test-scheduler")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+# tests/test_search.py
+import random
+import unittest
+from unittest import mock
+from app.model.backends.memory import MemoryBackend
+from app.model.backends.supabase import SupabaseBackend
+from app.model.model import TaskModel
+from app.model.search import TaskSearchIndex, matches, to_tsquery, tokenize
+from app.model.store import TaskStore
+from tests.fakes import FakeClient
+
+TEXTS = ["Groceries: milk, eggs", "Call mom", "milkshake_recipe", "Gross margin report", "email Mike", "mow lawn"]
+
+def tasks(texts):
+    return [{"id": i, "text": text} for i, text in enumerate(texts, 1)]
+
+def make_model(backend, page_size=5):
+    model = TaskModel(page_size=page_size, backend=backend)
+    model.breaker = None
+    model.store = TaskStore(ttl=30)
+    return model
+
+class SearchRulesTest(unittest.TestCase):
+    def test_tokenize_splits_like_the_simple_parser(self):
+        self.assertEqual(tokenize("Groceries: milk_shake, 2 EGGS!"), ["groceries", "milk", "shake", "2", "eggs"])
+
+    def test_every_query_word_must_start_a_word(self):
+        self.assertTrue(matches("Groceries: milk", tokenize("gro mil")))
+        self.assertTrue(matches("Groceries: milk", tokenize("MILK")))
+        self.assertFalse(matches("Groceries: milk", tokenize("gro ilk")))
+        self.assertFalse(matches("Groceries: milk", tokenize("gro eggs")))
+
+    def test_tsquery_is_a_conjunction_of_prefixes(self):
+        self.assertEqual(to_tsquery(tokenize("Gro mil")), "gro:* & mil:*")
+
+class TaskSearchIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = TaskSearchIndex()
+        self.index.rebuild(tasks(TEXTS))
+
+    def expected(self, query, texts=TEXTS):
+        return {task["id"] for task in tasks(texts) if matches(task["text"], tokenize(query))}
+
+    def test_prefix_lookups_agree_with_matches(self):
+        for query in ["m", "mi", "milk", "gro", "gro mil", "mo", "m mo", "recipe", "x", "milk milk"]:
+            self.assertEqual(self.index.match(tokenize(query)), self.expected(query), query)
+
+    def test_intersecting_and_verifying_agree(self):
+        rng = random.Random(7)
+        words = ["alpha", "alps", "beta", "bet", "gamma", "game", "delta", "del"]
+        texts = [" ".join(rng.sample(words, 3)) for _ in range(600)]
+        self.index.rebuild(tasks(texts))
+        for query in ["al", "al be", "game del", "alps bet ga", "de a"]:
+            verified = self.index.match(tokenize(query))
+            with mock.patch.object(TaskSearchIndex, "VERIFY_BELOW", 0):
+                intersected = self.index.match(tokenize(query))
+            self.assertEqual(verified, intersected, query)
+            self.assertEqual(verified, self.expected(query, texts), query)
+
+    def test_added_and_removed_tasks(self):
+        self.index.add({"id": 10, "text": "milk the cows"})
+        self.assertEqual(self.index.match(["cow"]), {10})
+        self.index.remove(10)
+        self.index.remove(1)
+        self.assertEqual(self.index.match(["cow"]), set())
+        self.assertEqual(self.index.match(["gro"]), {4})
+        self.assertNotIn("cows", self.index.vocabulary)
+        self.assertNotIn("groceries", self.index.vocabulary)
+        self.assertEqual(self.index.vocabulary, sorted(self.index.postings))
+
+class ModelSearchTest(unittest.TestCase):
+    def test_loaded_list_is_searched_in_memory(self):
+        backend = MemoryBackend([{"text": text, "priority": 2, "completed": False} for text in TEXTS], publish=False)
+        model = make_model(backend, page_size=10)
+        model.load_tasks()
+        with mock.patch.object(backend, "search", side_effect=AssertionError("searched the backend")):
+            self.assertEqual([task["text"] for task in model.search("mi")], ["Groceries: milk, eggs", "milkshake_recipe", "email Mike"])
+            self.assertEqual(model.search("mi", priority="high"), [])
+
+    def test_index_follows_edits(self):
+        model = make_model(MemoryBackend([{"text": f"task {i}", "priority": 1, "completed": False} for i in range(1, 4)], publish=False))
+        model.load_tasks()
+        self.assertEqual(model.search("task"), model.tasks)
+        task = model.add_task("buy milk", "high")
+        model.update_task(1, "sell milk", "low", True)
+        model.delete_task(2)
+        self.assertEqual([t["text"] for t in model.search("milk")], ["buy milk", "sell milk"])
+        self.assertEqual([t["text"] for t in model.search("milk", completed=True)], ["sell milk"])
+        self.assertEqual([t["text"] for t in model.search("task")], ["task 3"])
+        self.assertEqual(model.search("buy")[0]["id"], task["id"])
+
+class SupabaseSearchTest(unittest.TestCase):
+    def setUp(self):
+        self.client = FakeClient()
+        patcher = mock.patch("app.model.backends.supabase.get_client", return_value=self.client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        rows = [{"text": text, "priority": i % 3, "completed": i % 2 == 0, "user_id": None} for i, text in enumerate(TEXTS * 3)]
+        for i, row in enumerate(rows):
+            row["text"] += f" {i}"
+        self.client.table("tasks").insert(rows).execute()
+        self.model = make_model(SupabaseBackend())
+        self.model.load_tasks()
+
+    def test_partially_loaded_list_is_searched_by_postgres(self):
+        self.assertTrue(self.model.has_more)
+        results = self.model.search("Gro MIL", completed=True)
+        self.assertEqual(self.client.tsqueries, ["gro:* & mil:*"])
+        self.assertEqual([task["text"] for task in results], ["Groceries: milk, eggs 0", "Groceries: milk, eggs 6", "Groceries: milk, eggs 12"])
+        self.assertEqual(self.model.search("gro mil", completed=False), [])
+
+    def test_results_match_the_in_memory_search(self):
+        loaded = make_model(self.model.backend, page_size=100)
+        loaded.load_tasks()
+        self.assertFalse(loaded.has_more)
+        for query in ["m", "mo", "mi", "gross", "call 1"]:
+            self.assertEqual([task["id"] for task in self.model.search(query)], [task["id"] for task in loaded.search(query)], query)
+
+if __name__ == "__main__":
+    unittest.main()
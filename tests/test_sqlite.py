@@ -0,0 +1,48 @@
+# tests/test_sqlite.py
+import os
+import sqlite3
+import tempfile
+import unittest
+from app.model.backends.base import DuplicateTaskError
+from app.model.backends.sqlite import SQLiteBackend
+
+def task(text):
+    return {"text": text, "priority": 1, "completed": False}
+
+class TextKeyTest(unittest.TestCase):
+    def setUp(self):
+        self.backend = SQLiteBackend(":memory:", publish=False)
+
+    def test_lists_whose_user_and_text_join_the_same_way_are_distinct(self):
+        # with ":" as the separator both keys were "a:b:c"
+        self.backend.for_user("a").insert([task("b:c")])
+        self.backend.for_user("a:b").insert([task("C")])
+        self.assertEqual(self.backend.for_user("a:b").existing_texts(["c", "b:c"]), {"c"})
+        with self.assertRaises(DuplicateTaskError):
+            self.backend.for_user("a").insert([task("B:C")])
+
+    def test_shared_list_text_does_not_collide_with_a_users(self):
+        self.backend.insert([task("u1:milk")])
+        self.backend.for_user("u1").insert([task("milk")])
+        self.assertEqual(self.backend.existing_texts(["milk", "u1:milk"]), {"u1:milk"})
+
+    def test_keys_of_older_files_are_migrated(self):
+        path = os.path.join(tempfile.mkdtemp(), "tasks.db")
+        SQLiteBackend(path, publish=False).db.close()
+        db = sqlite3.connect(path)
+        with db:
+            db.execute("insert into tasks (text, text_key, priority, completed, user_id) values ('Milk', 'a:b:milk', 1, 0, 'a:b')")
+            db.execute("insert into tasks (text, text_key, priority, completed, user_id) values ('Bread', 'bread', 1, 0, null)")
+        db.close()
+        backend = SQLiteBackend(path, publish=False)
+        self.addCleanup(backend.db.close)
+        self.assertEqual(backend.for_user("a:b").existing_texts(["milk"]), {"milk"})
+        self.assertEqual(backend.existing_texts(["bread"]), {"bread"})
+        with self.assertRaises(DuplicateTaskError):
+            backend.for_user("a:b").insert([task("MILK")])
+        reopened = SQLiteBackend(path, publish=False) # the migrated keys are left alone
+        self.addCleanup(reopened.db.close)
+        self.assertEqual(reopened.for_user("a:b").existing_texts(["milk"]), {"milk"})
+
+if __name__ == "__main__":
+    unittest.main()
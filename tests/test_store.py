@@ -0,0 +1,215 @@
+# tests/test_store.py
+import asyncio
+import collections
+import contextlib
+import datetime
+import gc
+import io
+import threading
+import unittest
+import weakref
+from unittest import mock
+from app.model import store as store_module
+from app.model.backends.supabase import SupabaseBackend
+from app.model.model import TaskModel
+from app.model.store import TaskStore, store_for, stores_for_change
+from tests.fakes import FakeClient
+
+def task(task_id, priority=1, completed=False):
+    return {"id": task_id, "text": f"task {task_id}", "priority": priority, "completed": completed}
+
+class Table:
+    """fetch_page over a list of tasks, counting calls; `gate` (an Event) holds every call until set."""
+
+    def __init__(self, tasks):
+        self.tasks = tasks
+        self.calls = 0
+        self.gate = None
+        self.started = threading.Event()
+
+    def fetch_page(self, after, limit):
+        self.calls += 1
+        self.started.set()
+        if self.gate is not None:
+            self.gate.wait(5)
+        rows = sorted(self.tasks, key=lambda t: (t["completed"], t["priority"], t["id"]))
+        if after is not None:
+            rows = [row for row in rows if (row["completed"], row["priority"], row["id"]) > (after["completed"], after["priority"], after["id"])]
+        return [dict(row) for row in rows[:limit]]
+
+    async def fetch_page_async(self, after, limit):
+        await asyncio.sleep(0.01)
+        return self.fetch_page(after, limit)
+
+class GetTasksTest(unittest.TestCase):
+    def setUp(self):
+        self.table = Table([task(i) for i in range(1, 6)])
+        self.store = TaskStore(ttl=30)
+
+    def load_in_background(self, count=10):
+        results = []
+        thread = threading.Thread(target=lambda: results.append(self.store.get_tasks(self.table.fetch_page, count, 10)))
+        thread.start()
+        self.assertTrue(self.table.started.wait(5))
+        return thread, results
+
+    def test_writes_and_cached_reads_do_not_wait_for_a_load(self):
+        self.store.get_tasks(self.table.fetch_page, 10, 10)
+        self.store.loaded_at -= 60
+        self.table.gate = threading.Event()
+        thread, _ = self.load_in_background()
+
+        done = threading.Event()
+        def write():
+            self.store.put(task(9, priority=0))
+            self.store.cached(10)
+            done.set()
+        threading.Thread(target=write).start()
+        self.assertTrue(done.wait(1), "the store's lock was held across fetch_page")
+        self.table.gate.set()
+        thread.join(5)
+
+    def test_concurrent_callers_share_one_load(self):
+        self.table.gate = threading.Event()
+        threads = [threading.Thread(target=self.store.get_tasks, args=(self.table.fetch_page, 10, 10)) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        self.assertTrue(self.table.started.wait(5))
+        self.table.gate.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(self.table.calls, 1)
+        self.assertEqual(self.store.misses, 1)
+
+    def test_writes_made_during_a_load_are_kept(self):
+        self.table.gate = threading.Event()
+        thread, results = self.load_in_background()
+        # written after the page was read: the load's rows don't have it
+        self.store.put(task(9, priority=0))
+        self.store.put(dict(task(2), completed=True))
+        self.store.discard(3)
+        self.table.gate.set()
+        thread.join(5)
+
+        self.assertEqual([t["id"] for t in results[0][0]], [9, 1, 4, 5, 2])
+        self.assertEqual(self.table.calls, 1)
+
+    def test_failed_reload_keeps_the_list(self):
+        self.store.get_tasks(self.table.fetch_page, 10, 10)
+        self.store.loaded_at -= 60
+        def unreachable(after, limit):
+            raise ConnectionError("unreachable")
+        with self.assertRaises(ConnectionError):
+            self.store.get_tasks(unreachable, 10, 10)
+        self.assertEqual(len(self.store.cached(10)[0]), 5)
+        self.assertEqual(len(self.store.get_tasks(self.table.fetch_page, 10, 10)[0]), 5)
+
+    def test_load_dropped_by_invalidate_is_not_cached(self):
+        self.table.gate = threading.Event()
+        thread, results = self.load_in_background()
+        self.store.invalidate()
+        self.table.tasks.append(task(6))
+        self.table.gate.set()
+        thread.join(5)
+        self.assertEqual(len(results[0][0]), 6)
+        self.assertEqual(self.table.calls, 2)
+
+    def test_uncached_store_loads_once_per_call(self):
+        store = TaskStore(ttl=0)
+        self.assertEqual(len(store.get_tasks(self.table.fetch_page, 4, 2)[0]), 4)
+        self.assertEqual(self.table.calls, 2)
+
+    def test_async_callers_share_one_load(self):
+        async def load_together():
+            return await asyncio.gather(*[self.store.get_tasks_async(self.table.fetch_page_async, 3, 3) for _ in range(5)])
+        results = asyncio.run(load_together())
+        self.assertEqual([[t["id"] for t in tasks] for tasks, _ in results], [[1, 2, 3]] * 5)
+        self.assertEqual(self.table.calls, 1)
+
+class DeltaRefreshTest(unittest.TestCase):
+    def setUp(self):
+        self.client = FakeClient()
+        self.client.table("tasks").insert([{"text": f"task {i}", "priority": 1, "completed": False} for i in range(1, 6)]).execute()
+        patcher = mock.patch("app.model.backends.supabase.get_client", return_value=self.client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.model = TaskModel(page_size=10, backend=SupabaseBackend())
+        self.model.breaker = None
+        self.model.store = TaskStore(ttl=30)
+        self.model.task_limit = 0
+        self.model.delta_sync = True
+
+    # changes made by another process a minute after the load, past the overlap re-read
+    def change_elsewhere(self):
+        self.client.clock += datetime.timedelta(minutes=1)
+        self.client.table("tasks").update({"completed": True}).eq("id", 2).execute()
+        self.client.table("tasks").insert([{"text": "task 6", "priority": 0, "completed": False}]).execute()
+        self.client.table("tasks").delete().eq("id", 3).execute()
+        self.client.table("task_tombstones").insert([{"id": 3, "deleted_at": self.client.now()}]).execute() # the delete trigger
+        self.model.store.loaded_at -= 60
+
+    def reload(self):
+        self.client.requests.clear()
+        with mock.patch.object(self.model, "fetch_page", wraps=self.model.fetch_page) as fetch_page:
+            self.model.load_tasks()
+        return fetch_page.call_count
+
+    def assert_matches_backend(self):
+        self.assertEqual(self.model.store.cached(100)[0], SupabaseBackend().fetch_page(None, 100, "id,text,priority,completed"))
+
+    def test_stale_list_is_refreshed_from_its_changes(self):
+        self.model.load_tasks()
+        self.change_elsewhere()
+        self.assertEqual(self.reload(), 0)
+        self.assertEqual(self.client.requests, [("tasks", "select"), ("task_tombstones", "select")])
+        self.assertEqual(self.model.store.refreshes, 1)
+        self.assertEqual([task["id"] for task in self.model.tasks], [6, 1, 4, 5, 2])
+        self.assert_matches_backend()
+
+    def test_missing_tombstone_table_reloads_the_list(self):
+        self.model.load_tasks()
+        self.change_elsewhere()
+        with mock.patch("app.model.backends.supabase.tombstones_query", side_effect=Exception('relation "public.task_tombstones" does not exist')), \
+                contextlib.redirect_stdout(io.StringIO()):
+            self.assertEqual(self.reload(), 1)
+        self.assertEqual(self.model.store.refreshes, 0)
+        self.assert_matches_backend()
+
+    def test_list_without_a_watermark_is_reloaded(self):
+        with mock.patch("app.model.backends.supabase.watermark_queries", side_effect=Exception("timeout")), \
+                contextlib.redirect_stdout(io.StringIO()):
+            self.model.load_tasks()
+        self.assertIsNone(self.model.store.watermark)
+        self.change_elsewhere()
+        with mock.patch.object(self.model, "fetch_changes", side_effect=AssertionError("delta fetched")):
+            self.assertEqual(self.reload(), 1)
+        self.assertEqual(self.model.store.refreshes, 0)
+        self.assertIsNotNone(self.model.store.watermark)
+        self.assert_matches_backend()
+
+class StoreForTest(unittest.TestCase):
+    def setUp(self):
+        # a registry of two idle lists, not the one other tests share
+        for name, value in (("_live_stores", weakref.WeakValueDictionary()), ("_user_stores", collections.OrderedDict()), ("TASK_STORE_USERS", 2)):
+            patcher = mock.patch.object(store_module, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_store_of_an_open_session_is_not_evicted(self):
+        held = store_for("a") # an open session's model keeps its store
+        for user_id in ("b", "c", "d"):
+            store_for(user_id)
+        self.assertNotIn("a", store_module._user_stores)
+        self.assertIs(store_for("a"), held)
+        self.assertEqual(stores_for_change({"id": 1, "user_id": "a"}), [held])
+
+    def test_idle_lists_past_the_limit_are_dropped(self):
+        store_for("a")
+        store_for("b")
+        store_for("c")
+        gc.collect()
+        self.assertEqual(stores_for_change({"id": 1, "user_id": "a"}), [])
+        self.assertEqual(list(store_module._user_stores), ["b", "c"])
+
+if __name__ == "__main__":
+    unittest.main()
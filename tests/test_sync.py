@@ -0,0 +1,190 @@
+# tests/test_sync.py
+import contextlib
+import io
+import unittest
+from unittest import mock
+from app.model.replica import TaskReplica, is_temp_id
+from app.model.sync import SyncEngine
+from tests.fakes import FakeClient
+
+def seed(client, *rows):
+    client.table("tasks").insert([dict({"priority": 1, "completed": False, "user_id": None}, **row) for row in rows]).execute()
+
+class SyncEngineTest(unittest.TestCase):
+    def setUp(self):
+        self.client = FakeClient()
+        for target in ("app.model.sync.get_client", "app.model.backends.supabase.get_client"): # pulls, and writes via SupabaseBackend
+            patcher = mock.patch(target, return_value=self.client)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.replica = TaskReplica(":memory:")
+        self.engine = SyncEngine(self.replica, batch_size=2)
+
+    def texts(self):
+        return sorted(task["text"] for task in self.replica.fetch_page(None, 100))
+
+class SyncScopeTest(SyncEngineTest):
+    def setUp(self):
+        super().setUp()
+        seed(self.client, {"text": "shared 1"}, {"text": "mine", "user_id": "u1"}, {"text": "shared 2"}, {"text": "theirs", "user_id": "u2"})
+
+    def test_pull_copies_only_the_replicas_list(self):
+        self.engine.pull()
+        self.assertEqual(self.texts(), ["shared 1", "shared 2"])
+
+    def test_pull_for_a_user(self):
+        engine = SyncEngine(TaskReplica(":memory:"), user_id="u1")
+        engine.pull()
+        self.assertEqual([task["text"] for task in engine.replica.fetch_page(None, 100)], ["mine"])
+
+    def test_feed_events_of_other_users_are_dropped(self):
+        self.engine.pull()
+        self.engine.on_remote_change("INSERT", {"id": 50, "text": "private", "priority": 0, "completed": False, "user_id": "u2"}, None)
+        self.engine.on_remote_change("INSERT", {"id": 51, "text": "shared 3", "priority": 0, "completed": False, "user_id": None}, None)
+        self.engine.on_remote_change("DELETE", None, {"id": 1, "user_id": "u2"})
+        self.assertEqual(self.texts(), ["shared 1", "shared 2", "shared 3"])
+        self.engine.on_remote_change("DELETE", None, {"id": 1}) # realtime deletes carry only the id
+        self.assertEqual(self.texts(), ["shared 2", "shared 3"])
+
+    def test_reconcile_drops_rows_deleted_while_away(self):
+        self.engine.pull()
+        self.client.table("tasks").delete().eq("id", 3).execute()
+        self.engine.reconciled = False
+        self.engine.pull()
+        self.assertEqual(self.texts(), ["shared 1"])
+
+    def test_pushed_rows_are_stamped_with_the_user(self):
+        engine = SyncEngine(TaskReplica(":memory:"), user_id="u1")
+        engine.pull()
+        engine.replica.add_local([{"text": "offline", "priority": 0, "completed": False}])
+        engine.push()
+        self.assertEqual([row["user_id"] for row in self.client.rows() if row["text"] == "offline"], ["u1"])
+
+class OutboxPushTest(SyncEngineTest):
+    def setUp(self):
+        super().setUp()
+        seed(self.client, {"text": "on server"})
+        self.engine.pull()
+
+    def requests(self, op):
+        return sum(1 for table, request_op in self.client.requests if request_op == op)
+
+    def test_local_adds_get_server_ids(self):
+        local = self.replica.add_local([{"text": f"offline {i}", "priority": 1, "completed": False} for i in range(3)])
+        self.assertTrue(all(is_temp_id(task["id"]) for task in local))
+        self.client.requests.clear()
+        self.engine.push()
+        self.assertEqual(self.requests("insert"), 2) # batch_size rows per request
+        self.assertEqual(self.replica.pending_count(), 0)
+        ids = sorted(task["id"] for task in self.replica.fetch_page(None, 100))
+        self.assertEqual(ids, sorted(row["id"] for row in self.client.rows()))
+        self.assertFalse(any(is_temp_id(task_id) for task_id in ids))
+
+    def test_edits_before_a_push_go_out_once(self):
+        task = self.replica.add_local([{"text": "draft", "priority": 2, "completed": False}])[0]
+        self.replica.update_local([task["id"]], {"text": "final", "completed": True})
+        self.client.requests.clear()
+        self.engine.push()
+        self.assertEqual(self.client.requests, [("tasks", "insert")])
+        self.assertEqual([(row["text"], row["completed"]) for row in self.client.rows() if row["text"] != "on server"], [("final", True)])
+
+    def test_task_added_and_deleted_offline_is_never_sent(self):
+        task = self.replica.add_local([{"text": "gone", "priority": 2, "completed": False}])[0]
+        self.replica.delete_local([task["id"]])
+        self.client.requests.clear()
+        self.engine.push()
+        self.assertEqual(self.client.requests, [])
+
+    def test_updates_and_deletes_of_server_rows(self):
+        server = self.replica.fetch_page(None, 1)[0]
+        self.replica.add_local([{"text": "other", "priority": 0, "completed": False}])
+        self.engine.push()
+        self.replica.update_local([server["id"]], {"completed": True})
+        pushed = next(row["id"] for row in self.client.rows() if row["text"] == "other")
+        self.replica.delete_local([pushed])
+        self.engine.push()
+        self.assertEqual([(row["text"], row["completed"]) for row in self.client.rows()], [("on server", True)])
+        self.assertEqual(self.replica.pending_count(), 0)
+
+    def test_failed_push_keeps_the_outbox(self):
+        self.replica.add_local([{"text": "offline", "priority": 1, "completed": False}])
+        self.client.fail = ConnectionError("offline")
+        with self.assertRaises(ConnectionError):
+            self.engine.push()
+        self.assertEqual(self.replica.pending_count(), 1)
+        self.client.fail = None
+        self.engine.push()
+        self.assertEqual(self.replica.pending_count(), 0)
+        self.assertEqual(len(self.client.rows()), 2)
+
+    def test_text_taken_elsewhere_drops_only_that_task(self):
+        self.replica.add_local([{"text": "mine", "priority": 1, "completed": False}, {"text": "Taken", "priority": 1, "completed": False}])
+        seed(self.client, {"text": "taken"})
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.engine.push()
+        self.assertEqual(sorted(row["text"] for row in self.client.rows()), ["mine", "on server", "taken"])
+        self.assertEqual(self.texts(), ["mine", "on server"])
+        self.assertEqual(self.replica.pending_count(), 0)
+
+    def test_edit_of_a_task_deleted_elsewhere_does_not_recreate_it(self):
+        seed(self.client, {"text": "kept"}, {"text": "gone"})
+        self.engine.pull()
+        gone, kept = sorted(self.client.rows()[1:], key=lambda row: row["text"])
+        self.replica.update_local([kept["id"], gone["id"]], {"completed": True})
+        self.client.table("tasks").delete().eq("id", gone["id"]).execute() # another session, while offline
+        self.client.requests.clear()
+        with mock.patch("app.model.sync.task_feed") as feed:
+            self.engine.push()
+        self.assertEqual(self.client.requests, [("tasks", "update_tasks")])
+        self.assertEqual(sorted(row["text"] for row in self.client.rows()), ["kept", "on server"])
+        self.assertEqual(self.texts(), ["kept", "on server"])
+        self.assertTrue(self.replica.get(kept["id"])["completed"])
+        self.assertEqual(self.replica.pending_count(), 0)
+        published = [(call.args[0], (call.args[1] or call.args[2])["id"]) for call in feed.publish.call_args_list]
+        self.assertEqual(published, [("UPDATE", kept["id"]), ("DELETE", gone["id"])])
+
+    def test_edit_to_a_taken_text_is_rolled_back(self):
+        server = self.replica.fetch_page(None, 1)[0]
+        self.replica.update_local([server["id"]], {"text": "Taken"})
+        seed(self.client, {"text": "taken"}) # added elsewhere before the edit got through
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.engine.push()
+        self.assertEqual(self.texts(), ["on server"]) # refetched as supabase has it
+        self.assertEqual(self.replica.pending_count(), 0)
+
+class PullTest(SyncEngineTest):
+    def test_local_change_wins_until_pushed(self):
+        seed(self.client, {"text": "shared"})
+        self.engine.pull()
+        task_id = self.client.rows()[0]["id"]
+        self.replica.update_local([task_id], {"priority": 0})
+        self.client.table("tasks").update({"text": "renamed elsewhere"}).eq("id", task_id).execute()
+        self.engine.pull()
+        self.assertEqual(self.replica.get(task_id)["text"], "shared")
+        self.engine.sync_now()
+        # last writer wins: the pushed row replaces the remote edit
+        self.assertEqual((self.client.rows()[0]["text"], self.client.rows()[0]["priority"]), ("shared", 0))
+        self.assertEqual(self.replica.get(task_id)["priority"], 0)
+
+    def test_only_later_pulls_publish_changes(self):
+        seed(self.client, *[{"text": f"task {i}"} for i in range(3)])
+        with mock.patch("app.model.sync.task_feed") as feed:
+            self.engine.pull()
+            self.assertFalse(feed.publish.called) # the first pull fills the replica quietly
+            seed(self.client, {"text": "new"})
+            self.engine.pull()
+        self.assertEqual([call.args[1]["text"] for call in feed.publish.call_args_list], ["new"])
+        self.assertIn("new", self.texts())
+
+    def test_reconcile_keeps_tasks_with_local_changes(self):
+        seed(self.client, {"text": "a"}, {"text": "b"})
+        self.engine.pull()
+        a, b = sorted(self.client.rows(), key=lambda row: row["text"])
+        self.replica.update_local([a["id"]], {"completed": True})
+        self.client.table("tasks").delete().in_("id", [a["id"], b["id"]]).execute()
+        self.engine.reconciled = False
+        self.engine.pull()
+        self.assertEqual(self.texts(), ["a"])
+
+if __name__ == "__main__":
+    unittest.main()
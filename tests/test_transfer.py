@@ -0,0 +1,84 @@
+# tests/test_transfer.py
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+from app.model.backends.supabase import SupabaseBackend
+from app.model.model import TaskModel
+from app.model.store import TaskStore
+from app.model.transfer import import_tasks
+from tests.fakes import FakeClient
+
+class ImportTasksTest(unittest.TestCase):
+    def setUp(self):
+        self.client = FakeClient()
+        patcher = mock.patch("app.model.backends.supabase.get_client", return_value=self.client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "tasks.jsonl")
+
+    def model(self, user_id=None):
+        model = TaskModel(backend=SupabaseBackend(), user_id=user_id)
+        model.breaker = None
+        model.task_limit = 0
+        model.store = TaskStore(ttl=30)
+        return model
+
+    def write(self, texts):
+        with open(self.path, "w", encoding="utf-8") as f:
+            for text in texts:
+                f.write(json.dumps({"text": text, "priority": "low"}) + "\n")
+
+    def inserts(self):
+        return sum(1 for table, op in self.client.requests if op == "insert")
+
+    def test_reimport_skips_every_row_without_rejected_inserts(self):
+        self.write(f"task {i}" for i in range(2000))
+        self.assertEqual(import_tasks(self.path, self.model())["imported"], 2000)
+        self.client.requests.clear()
+
+        counts = import_tasks(self.path, self.model())
+        self.assertEqual(counts, {"read": 2000, "imported": 0, "duplicates": 2000, "invalid": 0})
+        self.assertEqual(self.inserts(), 0)
+        self.assertLessEqual(len(self.client.requests), 20) # one lookup per 100 texts
+        self.assertEqual(len(self.client.rows()), 2000)
+
+    def test_existing_texts_are_matched_ignoring_case(self):
+        self.write(["Buy milk", "walk dog"])
+        import_tasks(self.path, self.model())
+        self.write(["BUY MILK", "feed cat", "Walk Dog", "call mom"])
+        self.client.requests.clear()
+
+        counts = import_tasks(self.path, self.model())
+        self.assertEqual((counts["imported"], counts["duplicates"]), (2, 2))
+        self.assertEqual(self.inserts(), 1)
+        self.assertEqual(sorted(row["text"] for row in self.client.rows()), ["Buy milk", "call mom", "feed cat", "walk dog"])
+
+    def test_texts_in_another_users_list_are_not_duplicates(self):
+        self.write(["shared"])
+        import_tasks(self.path, self.model(user_id="u1"))
+
+        counts = import_tasks(self.path, self.model(user_id="u2"))
+        self.assertEqual((counts["imported"], counts["duplicates"]), (1, 0))
+
+    def test_a_task_added_after_the_lookup_is_skipped_on_retry(self):
+        self.write(["one", "two", "three"])
+        model = self.model()
+        new_items = model.new_items
+
+        def added_concurrently(items):
+            fresh = new_items(items)
+            if not self.client.rows():
+                self.client.table("tasks").insert({"text": "Two", "priority": 2, "completed": False}).execute()
+            return fresh
+
+        model.new_items = added_concurrently
+        counts = import_tasks(self.path, model)
+        self.assertEqual((counts["imported"], counts["duplicates"]), (2, 1))
+        self.assertEqual(sorted(row["text"] for row in self.client.rows()), ["Two", "one", "three"])
+
+if __name__ == "__main__":
+    unittest.main()
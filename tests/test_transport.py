@@ -0,0 +1,107 @@
+# tests/test_transport.py
+import asyncio
+import threading
+import time
+import unittest
+import httpx
+from app.model.transport import AsyncLimitedClient, LimitedClient, RequestLimiter, request_deadline
+
+class RequestLimiterTest(unittest.TestCase):
+    def hold_slot(self, limiter):
+        taken, release = threading.Event(), threading.Event()
+        def hold():
+            with limiter.slot():
+                taken.set()
+                release.wait(5)
+        thread = threading.Thread(target=hold)
+        thread.start()
+        self.assertTrue(taken.wait(5))
+        self.addCleanup(thread.join, 5)
+        self.addCleanup(release.set)
+        return release
+
+    def test_requests_over_the_cap_are_rejected_after_the_queue_timeout(self):
+        limiter = RequestLimiter("test", size=1, queue_timeout=0.05)
+        self.hold_slot(limiter)
+        started = time.monotonic()
+        with self.assertRaises(httpx.PoolTimeout):
+            with limiter.slot():
+                self.fail("ran without a slot")
+        self.assertGreaterEqual(time.monotonic() - started, 0.05)
+        self.assertEqual(limiter.stats(), {"in_flight": 1, "waiting": 0, "sent": 1, "rejected": 1})
+
+    def test_a_deadline_shortens_the_wait(self):
+        limiter = RequestLimiter("test", size=1, queue_timeout=5)
+        self.hold_slot(limiter)
+        started = time.monotonic()
+        with self.assertRaises(httpx.PoolTimeout):
+            with limiter.slot(0.05):
+                pass
+        self.assertLess(time.monotonic() - started, 1)
+
+    def test_a_freed_slot_is_handed_to_a_waiting_request(self):
+        limiter = RequestLimiter("test", size=1, queue_timeout=5)
+        release = self.hold_slot(limiter)
+        threading.Timer(0.05, release.set).start()
+        with limiter.slot():
+            self.assertEqual(limiter.stats()["in_flight"], 1)
+        self.assertEqual(limiter.stats(), {"in_flight": 0, "waiting": 0, "sent": 2, "rejected": 0})
+
+    def test_async_requests_over_the_cap_are_rejected(self):
+        limiter = RequestLimiter("test", size=2, queue_timeout=0.05)
+        async def request(delay):
+            async with limiter.async_slot():
+                await asyncio.sleep(delay)
+        async def burst():
+            return await asyncio.gather(request(0.3), request(0.3), request(0), return_exceptions=True)
+        results = asyncio.run(burst())
+        self.assertEqual([type(result) for result in results], [type(None), type(None), httpx.PoolTimeout])
+        self.assertEqual(limiter.stats(), {"in_flight": 0, "waiting": 0, "sent": 2, "rejected": 1})
+
+    def test_no_cap(self):
+        limiter = RequestLimiter("test", size=0)
+        with limiter.slot(), limiter.slot():
+            self.assertEqual(limiter.stats()["in_flight"], 2)
+
+class LimitedClientTest(unittest.TestCase):
+    def setUp(self):
+        self.sent = []
+        def handle(request):
+            self.sent.append(request.extensions["timeout"])
+            return httpx.Response(200, json=[])
+        self.limiter = RequestLimiter("test", size=4)
+        self.client = LimitedClient(self.limiter, transport=httpx.MockTransport(handle), timeout=httpx.Timeout(10, connect=5))
+        self.addCleanup(self.client.close)
+
+    def test_each_request_takes_a_slot(self):
+        self.client.get("http://supabase.test/rest/v1/tasks")
+        self.client.get("http://supabase.test/rest/v1/tasks")
+        self.assertEqual(self.sent[0], {"connect": 5, "read": 10, "write": 10, "pool": 10})
+        self.assertEqual(self.limiter.stats(), {"in_flight": 0, "waiting": 0, "sent": 2, "rejected": 0})
+
+    def with_deadline(self, seconds, send):
+        token = request_deadline.set(time.monotonic() + seconds)
+        try:
+            return send()
+        finally:
+            request_deadline.reset(token)
+
+    def test_timeouts_are_cut_to_the_time_left(self):
+        self.with_deadline(2, lambda: self.client.get("http://supabase.test/rest/v1/tasks"))
+        self.assertTrue(all(0 < value <= 2 for value in self.sent[0].values()), self.sent[0])
+
+    def test_request_past_its_deadline_is_not_sent(self):
+        with self.assertRaises(httpx.TimeoutException):
+            self.with_deadline(-1, lambda: self.client.get("http://supabase.test/rest/v1/tasks"))
+        self.assertEqual(self.sent, [])
+        self.assertEqual(self.limiter.stats()["sent"], 0)
+
+    def test_async_client_takes_a_slot_per_request(self):
+        async def send():
+            async with AsyncLimitedClient(self.limiter, transport=httpx.MockTransport(lambda request: httpx.Response(204))) as client:
+                return await client.get("http://supabase.test/rest/v1/tasks")
+        self.assertEqual(asyncio.run(send()).status_code, 204)
+        self.assertEqual(self.limiter.stats(), {"in_flight": 0, "waiting": 0, "sent": 1, "rejected": 0})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+# tests/test_virtual_list.py
+import contextlib
+import io
+import unittest
+from types import SimpleNamespace
+from app.model.model import PRIORITY_REVERSE_MAPPING
+from app.view.view import VIRTUAL_ROW_HEIGHT, TaskView
+from tests.fakes import StubPage
+
+TASKS = [{"id": i, "text": f"task {i}", "priority": i % 3, "completed": i % 2 == 0} for i in range(1, 501)]
+
+class VirtualTaskListTest(unittest.TestCase):
+    def setUp(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.view = TaskView(StubPage(), virtualized=True)
+        self.view.build()
+        self.near_end = []
+        self.view.bind_virtual_list({}, PRIORITY_REVERSE_MAPPING, lambda: self.near_end.append(self.list.first_visible))
+        self.list = self.view.virtual_list
+        self.created = []
+        create_row = self.list.create_row
+        def counted_create_row():
+            self.created.append(create_row())
+            return self.created[-1]
+        self.list.create_row = counted_create_row
+        self.list.set_tasks(TASKS)
+
+    def scroll_to(self, row):
+        self.list.on_scroll(SimpleNamespace(pixels=row * VIRTUAL_ROW_HEIGHT, viewport_dimension=10 * VIRTUAL_ROW_HEIGHT,
+                                            max_scroll_extent=len(self.list.tasks) * VIRTUAL_ROW_HEIGHT))
+
+    def assert_window_shows_its_tasks(self):
+        for offset, task_row in enumerate(self.list.rows):
+            task = self.list.tasks[self.list.start + offset]
+            self.assertEqual(task_row.data["task_id"], task["id"])
+            self.assertEqual(task_row.data["task_label"].value, task["text"])
+            self.assertEqual(task_row.data["task_checkbox"].value, task["completed"])
+            self.assertEqual(task_row.data["priority_label"].content.value, PRIORITY_REVERSE_MAPPING[task["priority"]])
+            self.assertIs(self.view.get_task_row(task["id"]), task_row)
+        self.assertEqual(len(self.list.rows_by_id), len(self.list.rows))
+
+    def test_scrolling_through_the_list_reuses_a_fixed_pool_of_rows(self):
+        for row in range(0, 500, 7):
+            self.scroll_to(row)
+            self.assert_window_shows_its_tasks()
+            self.assertLessEqual(len(self.list.rows) + len(self.list.pool), 30) # 10 visible + 10 overscan each side
+        self.assertEqual(len(self.created), 30)
+        for row in range(500, -1, -13): # and back up
+            self.scroll_to(row)
+            self.assert_window_shows_its_tasks()
+        self.assertEqual(len(self.created), 30)
+
+    def test_spacers_stand_in_for_the_rows_outside_the_window(self):
+        self.scroll_to(250)
+        self.assertEqual(self.list.start, 240)
+        self.assertEqual(len(self.list.rows), 30)
+        self.assertEqual(self.list.top_spacer.height, 240 * VIRTUAL_ROW_HEIGHT)
+        self.assertEqual(self.list.bottom_spacer.height, 230 * VIRTUAL_ROW_HEIGHT)
+        self.assertEqual(self.list.list_view.controls, [self.list.top_spacer, *self.list.rows, self.list.bottom_spacer])
+
+    def test_scrolling_within_the_window_does_not_rebind(self):
+        self.scroll_to(250)
+        updates = self.view.page.updates
+        self.scroll_to(245)
+        self.assertEqual(self.view.page.updates, updates)
+        self.assertEqual(self.list.start, 240)
+
+    def test_near_end_is_reported_close_to_the_last_task(self):
+        self.scroll_to(400)
+        self.assertEqual(self.near_end, [])
+        self.scroll_to(485)
+        self.assertEqual(self.near_end, [485])
+
+    def test_rows_show_new_tasks_after_the_list_changes(self):
+        self.scroll_to(100)
+        self.list.set_tasks(TASKS[::-1])
+        self.assert_window_shows_its_tasks()
+        self.list.set_tasks(TASKS[:50]) # shorter than the scroll position
+        self.assertEqual((len(self.list.rows), self.list.bottom_spacer.height), (0, 0))
+        self.assertEqual(len(self.list.pool), 30)
+        self.scroll_to(30)
+        self.assert_window_shows_its_tasks()
+        self.assertEqual(self.list.bottom_spacer.height, 0)
+        self.assertEqual(len(self.created), 30)
+
+if __name__ == "__main__":
+    unittest.main()